@@ -20,6 +20,10 @@ config = context.config
 # Interpret the config file for Python logging.
 fileConfig(config.config_file_name)
 
+# Same override the app uses (backend/app/database.py)
+if os.environ.get("DATABASE_URL"):
+    config.set_main_option("sqlalchemy.url", os.environ["DATABASE_URL"])
+
 # add your model's MetaData object here for 'autogenerate' support
 target_metadata = SQLModel.metadata
 
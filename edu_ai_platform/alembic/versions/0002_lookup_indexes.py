@@ -0,0 +1,78 @@
+"""lookup indexes and hashed refresh-token key
+
+Revision ID: 0002_lookup_indexes
+Revises: 0001_initial
+Create Date: 2026-10-18 00:00:00.000000
+"""
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0002_lookup_indexes'
+down_revision = '0001_initial'
+branch_labels = None
+depends_on = None
+
+
+def _backfill_token_hashes():
+    conn = op.get_bind()
+    rows = conn.execute(sa.text('SELECT id, token, revoked FROM refreshtoken ORDER BY id')).fetchall()
+    seen = {}
+    dupes = []
+    for row_id, token, revoked in rows:
+        digest = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        if digest in seen:
+            # collapse duplicate tokens into one row; it stays usable if any copy was
+            kept_id, kept_revoked = seen[digest]
+            seen[digest] = (kept_id, bool(kept_revoked) and bool(revoked))
+            dupes.append(row_id)
+            continue
+        seen[digest] = (row_id, revoked)
+    if dupes:
+        conn.execute(sa.text('DELETE FROM refreshtoken WHERE id = :id'), [{'id': i} for i in dupes])
+    if seen:
+        conn.execute(
+            sa.text('UPDATE refreshtoken SET token_hash = :h, revoked = :r WHERE id = :id'),
+            [{'h': h, 'r': r, 'id': i} for h, (i, r) in seen.items()],
+        )
+
+
+def _dedupe_students():
+    # keep the first row per student_id (the one unordered lookups returned), taking a
+    # class_id from the newest duplicate that has one if the kept row has none
+    op.execute(
+        'UPDATE student SET class_id = (SELECT d.class_id FROM student d WHERE d.student_id = student.student_id '
+        'AND d.class_id IS NOT NULL ORDER BY d.id DESC LIMIT 1) '
+        'WHERE class_id IS NULL AND id IN '
+        '(SELECT min(id) FROM student WHERE student_id IS NOT NULL GROUP BY student_id HAVING count(*) > 1)'
+    )
+    op.execute(
+        'DELETE FROM student WHERE student_id IS NOT NULL AND id NOT IN '
+        '(SELECT min(id) FROM student WHERE student_id IS NOT NULL GROUP BY student_id)'
+    )
+
+
+def upgrade():
+    with op.batch_alter_table('refreshtoken') as batch:
+        batch.add_column(sa.Column('token_hash', sa.String(), nullable=True))
+    _backfill_token_hashes()
+    op.create_index('ux_refreshtoken_token_hash', 'refreshtoken', ['token_hash'], unique=True)
+    _dedupe_students()
+    op.create_index('ux_student_student_id', 'student', ['student_id'], unique=True)
+    op.create_index('ix_student_class_id', 'student', ['class_id'])
+    op.create_index('ix_lesson_item_id', 'lesson', ['item_id'])
+    op.create_index('ix_assignment_student_item', 'assignment', ['student_id', 'item_id'])
+    op.create_index('ix_studentresponse_student_submitted', 'studentresponse', ['student_id', 'submitted_at'])
+
+
+def downgrade():
+    op.drop_index('ix_studentresponse_student_submitted', table_name='studentresponse')
+    op.drop_index('ix_assignment_student_item', table_name='assignment')
+    op.drop_index('ix_lesson_item_id', table_name='lesson')
+    op.drop_index('ix_student_class_id', table_name='student')
+    op.drop_index('ux_student_student_id', table_name='student')
+    op.drop_index('ux_refreshtoken_token_hash', table_name='refreshtoken')
+    with op.batch_alter_table('refreshtoken') as batch:
+        batch.drop_column('token_hash')
@@ -0,0 +1,42 @@
+"""refresh-token jti key
+
+Revision ID: 0003_refresh_token_jti
+Revises: 0002_lookup_indexes
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+import jwt
+
+# revision identifiers, used by Alembic.
+revision = '0003_refresh_token_jti'
+down_revision = '0002_lookup_indexes'
+branch_labels = None
+depends_on = None
+
+
+def _backfill_jti():
+    conn = op.get_bind()
+    updates = []
+    for row_id, token in conn.execute(sa.text('SELECT id, token FROM refreshtoken')).fetchall():
+        try:
+            claims = jwt.decode(token, options={'verify_signature': False})
+        except jwt.PyJWTError:
+            continue
+        if claims.get('jti'):
+            updates.append({'jti': claims['jti'], 'id': row_id})
+    if updates:
+        conn.execute(sa.text('UPDATE refreshtoken SET jti = :jti WHERE id = :id'), updates)
+
+
+def upgrade():
+    with op.batch_alter_table('refreshtoken') as batch:
+        batch.add_column(sa.Column('jti', sa.String(), nullable=True))
+    _backfill_jti()
+    op.create_index('ux_refreshtoken_jti', 'refreshtoken', ['jti'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ux_refreshtoken_jti', table_name='refreshtoken')
+    with op.batch_alter_table('refreshtoken') as batch:
+        batch.drop_column('jti')
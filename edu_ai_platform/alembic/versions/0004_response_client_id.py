@@ -0,0 +1,26 @@
+"""client-supplied response ids for idempotent batch sync
+
+Revision ID: 0004_response_client_id
+Revises: 0003_refresh_token_jti
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0004_response_client_id'
+down_revision = '0003_refresh_token_jti'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('studentresponse') as batch:
+        batch.add_column(sa.Column('client_id', sa.String(), nullable=True))
+    op.create_index('ux_studentresponse_client_id', 'studentresponse', ['client_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ux_studentresponse_client_id', table_name='studentresponse')
+    with op.batch_alter_table('studentresponse') as batch:
+        batch.drop_column('client_id')
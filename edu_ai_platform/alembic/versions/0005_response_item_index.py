@@ -0,0 +1,21 @@
+"""index responses by item for re-scoring
+
+Revision ID: 0005_response_item_index
+Revises: 0004_response_client_id
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0005_response_item_index'
+down_revision = '0004_response_client_id'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_studentresponse_item_id', 'studentresponse', ['item_id'])
+
+
+def downgrade():
+    op.drop_index('ix_studentresponse_item_id', table_name='studentresponse')
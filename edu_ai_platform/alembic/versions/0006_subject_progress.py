@@ -0,0 +1,39 @@
+"""per-(student, subject) progress summaries
+
+Revision ID: 0006_subject_progress
+Revises: 0005_response_item_index
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0006_subject_progress'
+down_revision = '0005_response_item_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'subjectprogress',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('student_id', sa.String(), nullable=False),
+        sa.Column('subject', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('correct', sa.Integer(), nullable=False),
+        sa.Column('last_submitted_at', sa.String(), nullable=True),
+    )
+    op.create_index('ux_subjectprogress_student_subject', 'subjectprogress', ['student_id', 'subject'], unique=True)
+    # backfill; same query as backend.app.progress.rebuild()
+    op.execute(
+        'INSERT INTO subjectprogress (student_id, subject, attempts, correct, last_submitted_at) '
+        'SELECT r.student_id, l.subject, count(*), coalesce(sum(CASE WHEN r.correct THEN 1 ELSE 0 END), 0), max(r.submitted_at) '
+        'FROM studentresponse r JOIN lesson l ON l.id = (SELECT max(l2.id) FROM lesson l2 WHERE l2.item_id = r.item_id) '
+        'WHERE l.subject IS NOT NULL GROUP BY r.student_id, l.subject'
+    )
+
+
+def downgrade():
+    op.drop_index('ux_subjectprogress_student_subject', table_name='subjectprogress')
+    op.drop_table('subjectprogress')
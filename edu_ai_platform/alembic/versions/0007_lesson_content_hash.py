@@ -0,0 +1,33 @@
+"""lesson grade, content hash and (source, item_id) key for incremental ingestion
+
+Revision ID: 0007_lesson_content_hash
+Revises: 0006_subject_progress
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0007_lesson_content_hash'
+down_revision = '0006_subject_progress'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('lesson') as batch:
+        batch.add_column(sa.Column('grade', sa.Integer(), nullable=True))
+        batch.add_column(sa.Column('content_hash', sa.String(), nullable=True))
+    # keep the newest row per (source, item_id), matching the "last wins" lookups
+    op.execute(
+        'DELETE FROM lesson WHERE source IS NOT NULL AND id NOT IN '
+        '(SELECT max(id) FROM lesson WHERE source IS NOT NULL GROUP BY source, item_id)'
+    )
+    op.create_index('ux_lesson_source_item', 'lesson', ['source', 'item_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ux_lesson_source_item', table_name='lesson')
+    with op.batch_alter_table('lesson') as batch:
+        batch.drop_column('content_hash')
+        batch.drop_column('grade')
@@ -0,0 +1,30 @@
+"""lesson options and updated_at for the search index
+
+Revision ID: 0008_lesson_search_columns
+Revises: 0007_lesson_content_hash
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0008_lesson_search_columns'
+down_revision = '0007_lesson_content_hash'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('lesson') as batch:
+        batch.add_column(sa.Column('options', sa.String(), nullable=True))
+        batch.add_column(sa.Column('updated_at', sa.String(), nullable=True))
+    op.create_index('ix_lesson_updated_at', 'lesson', ['updated_at'])
+    # force the next ingestion to rewrite existing items so options get filled in
+    op.execute('UPDATE lesson SET content_hash = NULL')
+
+
+def downgrade():
+    op.drop_index('ix_lesson_updated_at', table_name='lesson')
+    with op.batch_alter_table('lesson') as batch:
+        batch.drop_column('updated_at')
+        batch.drop_column('options')
@@ -0,0 +1,23 @@
+"""(student_id, id) indexes for per-student keyset pages and exports
+
+Revision ID: 0009_student_id_keyset_indexes
+Revises: 0008_lesson_search_columns
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0009_student_id_keyset_indexes'
+down_revision = '0008_lesson_search_columns'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_assignment_student_id', 'assignment', ['student_id', 'id'])
+    op.create_index('ix_studentresponse_student_id', 'studentresponse', ['student_id', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_studentresponse_student_id', table_name='studentresponse')
+    op.drop_index('ix_assignment_student_id', table_name='assignment')
@@ -0,0 +1,294 @@
+"""
+Rasch (1PL IRT) ability and difficulty estimates for adaptive item selection.
+
+Parameters live in flat NumPy arrays: `theta[s]` per student and `beta[i]`
+per item, with dicts mapping student_id / item_id to array positions.
+fit() runs vectorized Newton steps over every stored response (nightly, or
+on demand); observe() applies an Elo-style online step per new response so
+estimates move between refits, and sync_lessons() makes lessons ingested
+since the fit selectable (at difficulty 0) without waiting for it. next_item() picks the lesson whose
+difficulty is closest to the student's ability, which maximizes the
+Rasch item information p * (1 - p).
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlmodel import select
+
+from .arrays import KeyIndex, grow
+from .background import start_periodic
+from .database import get_session, iter_batches
+from .models import Assignment, Lesson, StudentResponse
+
+FIT_ITERATIONS = 30
+# Gaussian prior on theta/beta: keeps all-correct / all-wrong estimates finite
+PRIOR_PRECISION = 0.1
+CLIP = 4.0
+# online step size decays with the number of observations: K / (1 + n / ELO_DECAY)
+ELO_K = 0.4
+ELO_DECAY = 20.0
+REFIT_SECONDS = int(os.environ.get("ABILITY_REFIT_SECONDS", 24 * 3600))
+LESSON_SYNC_SECONDS = float(os.environ.get("ABILITY_LESSON_SYNC_SECONDS", 5))
+# re-read this much before the last seen Lesson.updated_at (writes from slow transactions)
+LESSON_SYNC_OVERLAP_SECONDS = 5
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def fit_rasch(students: np.ndarray, items: np.ndarray, correct: np.ndarray, n_students: int, n_items: int,
+              iterations: int = FIT_ITERATIONS) -> Tuple[np.ndarray, np.ndarray]:
+    """Joint maximum-a-posteriori Rasch fit.
+
+    `students` / `items` are integer codes per response and `correct` is 0/1.
+    Each iteration is one diagonal Newton step for all parameters at once.
+    """
+    theta = np.zeros(n_students)
+    beta = np.zeros(n_items)
+    y = correct.astype(np.float64)
+    for _ in range(iterations):
+        p = _sigmoid(theta[students] - beta[items])
+        resid = y - p
+        info = p * (1.0 - p)
+        theta += (np.bincount(students, resid, n_students) - PRIOR_PRECISION * theta) / (
+            np.bincount(students, info, n_students) + PRIOR_PRECISION)
+        np.clip(theta, -CLIP, CLIP, out=theta)
+        p = _sigmoid(theta[students] - beta[items])
+        resid = y - p
+        info = p * (1.0 - p)
+        beta -= (np.bincount(items, resid, n_items) + PRIOR_PRECISION * beta) / (
+            np.bincount(items, info, n_items) + PRIOR_PRECISION)
+        np.clip(beta, -CLIP, CLIP, out=beta)
+    return theta, beta
+
+
+class AbilityModel:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fit_lock = threading.Lock()
+        self.students = KeyIndex()
+        self.items = KeyIndex()
+        self.theta = np.zeros(0, dtype=np.float32)
+        self.beta = np.zeros(0, dtype=np.float32)
+        self.student_n = np.zeros(0, dtype=np.int32)
+        self.item_n = np.zeros(0, dtype=np.int32)
+        # per item: is it a lesson (selectable), and its subject code
+        self.is_lesson = np.zeros(0, dtype=bool)
+        self.item_subject = np.zeros(0, dtype=np.int16)
+        self.subjects = KeyIndex()
+        self.fitted_at: Optional[float] = None
+        self.stats: Dict[str, Any] = {}
+        self._journal: Optional[List[Tuple[str, str, bool]]] = None
+        # newest Lesson.updated_at seen by the last fit or lesson sync
+        self.lesson_watermark: Optional[str] = None
+        self._lessons_checked = 0.0
+
+    # ---- fitting -------------------------------------------------------
+
+    def refit(self) -> Dict[str, Any]:
+        """Full refit from the response table; swaps the arrays in atomically."""
+        with self._fit_lock:
+            return self._refit()
+
+    def ensure_fitted(self) -> None:
+        if self.fitted_at is None:
+            with self._fit_lock:
+                if self.fitted_at is None:
+                    self._refit()
+
+    def _refit(self) -> Dict[str, Any]:
+        with self._lock:
+            # responses observed while the fit runs are replayed onto the new
+            # arrays; one that also made it into the read gets one extra Elo step
+            self._journal = []
+        try:
+            started = time.perf_counter()
+            state = self._build()
+            with self._lock:
+                for name, value in state.items():
+                    setattr(self, name, value)
+                journal, self._journal = self._journal, None
+                for student_id, item_id, correct in journal:
+                    self._observe(student_id, item_id, correct)
+                self.stats["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                self.fitted_at = time.time()
+                self._lessons_checked = time.monotonic()  # the fit read every lesson
+                return dict(self.stats)
+        finally:
+            with self._lock:
+                self._journal = None
+
+    def _build(self) -> Dict[str, Any]:
+        students, items, subjects = KeyIndex(), KeyIndex(), KeyIndex()
+        lesson_subjects: Dict[str, Optional[str]] = {}
+        watermark: Optional[str] = None
+        with get_session() as sess:
+            for item_id, subject, updated_at in sess.exec(
+                    select(Lesson.item_id, Lesson.subject, Lesson.updated_at).order_by(Lesson.id)).all():
+                lesson_subjects[item_id] = subject  # newest lesson row wins
+                if updated_at and (watermark is None or updated_at > watermark):
+                    watermark = updated_at
+        for item_id in lesson_subjects:
+            items.add(item_id)
+
+        s_codes: List[np.ndarray] = []
+        i_codes: List[np.ndarray] = []
+        ys: List[np.ndarray] = []
+        stmt = select(StudentResponse.id, StudentResponse.student_id, StudentResponse.item_id,
+                      StudentResponse.correct).where(StudentResponse.correct.is_not(None))
+        for rows in iter_batches(stmt, StudentResponse.id):
+            s_codes.append(np.fromiter((students.add(r[1]) for r in rows), dtype=np.int32, count=len(rows)))
+            i_codes.append(np.fromiter((items.add(r[2]) for r in rows), dtype=np.int32, count=len(rows)))
+            ys.append(np.fromiter((bool(r[3]) for r in rows), dtype=bool, count=len(rows)))
+
+        s = np.concatenate(s_codes) if s_codes else np.zeros(0, dtype=np.int32)
+        i = np.concatenate(i_codes) if i_codes else np.zeros(0, dtype=np.int32)
+        y = np.concatenate(ys) if ys else np.zeros(0, dtype=bool)
+        theta, beta = fit_rasch(s, i, y, len(students), len(items))
+
+        is_lesson = np.zeros(len(items), dtype=bool)
+        item_subject = np.full(len(items), -1, dtype=np.int16)
+        for item_id, subject in lesson_subjects.items():
+            pos = items.pos[item_id]
+            is_lesson[pos] = True
+            if subject is not None:
+                item_subject[pos] = subjects.add(subject)
+        return {
+            "students": students,
+            "items": items,
+            "subjects": subjects,
+            "theta": theta.astype(np.float32),
+            "beta": beta.astype(np.float32),
+            "student_n": np.bincount(s, minlength=len(students)).astype(np.int32),
+            "item_n": np.bincount(i, minlength=len(items)).astype(np.int32),
+            "is_lesson": is_lesson,
+            "item_subject": item_subject,
+            "lesson_watermark": watermark,
+            "stats": {"responses": int(len(y)), "students": len(students), "items": len(items), "lessons": int(is_lesson.sum())},
+        }
+
+    # ---- online updates ------------------------------------------------
+
+    def _observe(self, student_id: str, item_id: str, correct: bool) -> None:
+        s = self.students.add(student_id)
+        i = self.items.add(item_id)
+        if s >= len(self.theta):
+            self.theta = grow(self.theta, s + 1)
+            self.student_n = grow(self.student_n, s + 1)
+        if i >= len(self.beta):
+            self.beta = grow(self.beta, i + 1)
+            self.item_n = grow(self.item_n, i + 1)
+            self.is_lesson = grow(self.is_lesson, i + 1, False)
+            self.item_subject = grow(self.item_subject, i + 1, -1)
+        resid = float(correct) - 1.0 / (1.0 + np.exp(-(float(self.theta[s]) - float(self.beta[i]))))
+        self.theta[s] = np.clip(self.theta[s] + ELO_K / (1 + self.student_n[s] / ELO_DECAY) * resid, -CLIP, CLIP)
+        self.beta[i] = np.clip(self.beta[i] - ELO_K / (1 + self.item_n[i] / ELO_DECAY) * resid, -CLIP, CLIP)
+        self.student_n[s] += 1
+        self.item_n[i] += 1
+
+    def observe(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Elo step for newly stored responses (dicts with student_id, item_id, correct)."""
+        with self._lock:
+            for r in rows:
+                if r.get("correct") is None:
+                    continue
+                if self._journal is not None:
+                    self._journal.append((r["student_id"], r["item_id"], bool(r["correct"])))
+                if self.fitted_at is not None:  # otherwise the first fit reads it from the table
+                    self._observe(r["student_id"], r["item_id"], bool(r["correct"]))
+
+    def add_lessons(self, lessons: Iterable[Tuple[str, Optional[str]]]) -> None:
+        """Make new (item_id, subject) lessons selectable without a refit."""
+        with self._lock:
+            for item_id, subject in lessons:
+                i = self.items.add(item_id)
+                if i >= len(self.beta):
+                    self.beta = grow(self.beta, i + 1)
+                    self.item_n = grow(self.item_n, i + 1)
+                    self.is_lesson = grow(self.is_lesson, i + 1, False)
+                    self.item_subject = grow(self.item_subject, i + 1, -1)
+                self.is_lesson[i] = True
+                self.item_subject[i] = -1 if subject is None else self.subjects.add(subject)
+
+    def sync_lessons(self) -> int:
+        """add_lessons() for lessons ingested or edited since the last fit or sync
+        (by Lesson.updated_at, which ingestion sets); returns how many were read."""
+        since = self.lesson_watermark
+        stmt = select(Lesson.item_id, Lesson.subject, Lesson.updated_at).where(Lesson.updated_at.is_not(None))
+        if since is not None:
+            since = (datetime.fromisoformat(since) - timedelta(seconds=LESSON_SYNC_OVERLAP_SECONDS)).isoformat()
+            stmt = stmt.where(Lesson.updated_at >= since)
+        with get_session() as sess:
+            rows = sess.exec(stmt.order_by(Lesson.id)).all()
+        if rows:
+            self.add_lessons((item_id, subject) for item_id, subject, _ in rows)
+            latest = max(r[2] for r in rows)
+            with self._lock:
+                if self.lesson_watermark is None or latest > self.lesson_watermark:
+                    self.lesson_watermark = latest
+        return len(rows)
+
+    def maybe_sync_lessons(self) -> None:
+        """sync_lessons() at most every ABILITY_LESSON_SYNC_SECONDS."""
+        now = time.monotonic()
+        if now - self._lessons_checked >= LESSON_SYNC_SECONDS:
+            self._lessons_checked = now
+            self.sync_lessons()
+
+    # ---- selection -----------------------------------------------------
+
+    def ability(self, student_id: str) -> float:
+        s = self.students.pos.get(student_id)
+        return 0.0 if s is None else float(self.theta[s])
+
+    def next_item(self, student_id: str, exclude: Set[str] = frozenset(), subject: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Most informative lesson for the student, skipping `exclude` item_ids."""
+        with self._lock:
+            n = len(self.items)
+            theta = self.ability(student_id)
+            mask = self.is_lesson[:n].copy()
+            if subject is not None:
+                code = self.subjects.pos.get(subject)
+                if code is None:
+                    return None
+                mask &= self.item_subject[:n] == code
+            skip = [self.items.pos[i] for i in exclude if i in self.items.pos]
+            if skip:
+                mask[skip] = False
+            if not mask.any():
+                return None
+            distance = np.where(mask, np.abs(self.beta[:n] - theta), np.inf)
+            best = int(np.argmin(distance))
+            beta = float(self.beta[best])
+            code = int(self.item_subject[best])
+            item_id = self.items.keys[best]
+            subject_name = self.subjects.keys[code] if code >= 0 else None
+        p = float(_sigmoid(theta - beta))
+        return {
+            "item_id": item_id,
+            "subject": subject_name,
+            "ability": round(theta, 4),
+            "difficulty": round(beta, 4),
+            "p_correct": round(p, 4),
+            "information": round(p * (1 - p), 4),
+        }
+
+
+MODEL = AbilityModel()
+
+
+def seen_items(sess, student_id: str) -> Set[str]:
+    """Items already assigned to or answered by the student (both index-backed)."""
+    assigned = sess.exec(select(Assignment.item_id).where(Assignment.student_id == student_id)).all()
+    answered = sess.exec(select(StudentResponse.item_id).where(StudentResponse.student_id == student_id)).all()
+    return set(assigned) | set(answered)
+
+
+def start_refitter(interval: int = REFIT_SECONDS) -> threading.Thread:
+    """Start (once) a daemon thread that fits now and then refits every `interval` seconds."""
+    return start_periodic("ability-refit", MODEL.refit, interval)
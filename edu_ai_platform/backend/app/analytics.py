@@ -0,0 +1,252 @@
+"""
+Class-level analytics for /teacher/classes/{class_id}/analytics.
+
+A columnar cube holds every response (student, item, correct) and every
+assignment (student, item) as int32/bool NumPy columns, plus per-student
+class and per-item subject arrays. A class query is a handful of vectorized
+passes: mask the class's students, gather their rows, then bincount by
+subject / item and match assignment pairs against answered pairs.
+
+The cube loads from the DB on first use, is appended to as responses and
+assignments are written, and is reloaded every ANALYTICS_RELOAD_SECONDS to
+pick up writes from other processes and roster changes.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlmodel import select
+
+from .arrays import ColumnTable, KeyIndex, grow
+from .background import start_periodic
+from .database import get_session, iter_batches
+from .models import Assignment, Lesson, Student, StudentResponse
+
+RELOAD_SECONDS = int(os.environ.get("ANALYTICS_RELOAD_SECONDS", 900))
+ITEMS_LIMIT = 20
+
+
+def _read_batches(model, columns, upto: Optional[int] = None) -> Iterable[List[Tuple]]:
+    """Keyset batches of (id, *columns) from `model`, optionally only ids <= upto."""
+    stmt = select(model.id, *columns)
+    if upto is not None:
+        stmt = stmt.where(model.id <= upto)
+    return iter_batches(stmt, model.id)
+
+
+class ClassCube:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.students = KeyIndex()
+        self.items = KeyIndex()
+        self.subjects = KeyIndex()
+        self.student_class = np.zeros(0, dtype=np.int32)
+        self.item_subject = np.zeros(0, dtype=np.int16)
+        self.responses = ColumnTable(student=np.int32, item=np.int32, correct=bool)
+        self.assignments = ColumnTable(student=np.int32, item=np.int32)
+        self.loaded_at: Optional[float] = None
+        self._journal: Optional[List[Tuple[str, List[Dict[str, Any]]]]] = None
+
+    # ---- loading -------------------------------------------------------
+
+    def reload(self) -> Dict[str, Any]:
+        with self._load_lock:
+            return self._reload()
+
+    def ensure_loaded(self) -> None:
+        if self.loaded_at is None:
+            with self._load_lock:
+                if self.loaded_at is None:
+                    self._reload()
+
+    def _reload(self) -> Dict[str, Any]:
+        with self._lock:
+            self._journal = []  # writes observed while loading are replayed after the swap
+        try:
+            started = time.perf_counter()
+            # the load reads rows up to these ids; journaled rows past them are replayed
+            with get_session() as sess:
+                upto = {
+                    "responses": sess.exec(select(func.max(StudentResponse.id))).one() or 0,
+                    "assignments": sess.exec(select(func.max(Assignment.id))).one() or 0,
+                }
+            state = self._build(upto)
+            with self._lock:
+                for name, value in state.items():
+                    setattr(self, name, value)
+                journal, self._journal = self._journal, None
+                for kind, rows in journal:
+                    rows = [r for r in rows if r.get("id") is None or r["id"] > upto[kind]]
+                    if rows:
+                        self._append(kind, rows)
+                self.loaded_at = time.time()
+                return {
+                    "students": len(self.students),
+                    "items": len(self.items),
+                    "responses": len(self.responses),
+                    "assignments": len(self.assignments),
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+                }
+        finally:
+            with self._lock:
+                self._journal = None
+
+    def _build(self, upto: Dict[str, int]) -> Dict[str, Any]:
+        students, items, subjects = KeyIndex(), KeyIndex(), KeyIndex()
+        classes: List[int] = []
+        for batch in _read_batches(Student, (Student.student_id, Student.class_id)):
+            for _, student_id, class_id in batch:
+                students.add(student_id)
+                classes.append(-1 if class_id is None else class_id)
+        lesson_subjects: Dict[str, Optional[str]] = {}
+        for batch in _read_batches(Lesson, (Lesson.item_id, Lesson.subject)):
+            for _, item_id, subject in batch:
+                lesson_subjects[item_id] = subject  # newest lesson row wins
+
+        def codes(rows, col, index):
+            return np.fromiter((index.add(r[col]) for r in rows), dtype=np.int32, count=len(rows))
+
+        r_parts, a_parts = [], []
+        for batch in _read_batches(StudentResponse, (StudentResponse.student_id, StudentResponse.item_id, StudentResponse.correct), upto["responses"]):
+            r_parts.append((codes(batch, 1, students), codes(batch, 2, items),
+                            np.fromiter((bool(r[3]) for r in batch), dtype=bool, count=len(batch))))
+        for batch in _read_batches(Assignment, (Assignment.student_id, Assignment.item_id), upto["assignments"]):
+            a_parts.append((codes(batch, 1, students), codes(batch, 2, items)))
+
+        student_class = np.full(len(students), -1, dtype=np.int32)
+        student_class[:len(classes)] = classes
+        for item_id in lesson_subjects:
+            items.add(item_id)
+        item_subject = np.full(len(items), -1, dtype=np.int16)
+        for item_id, subject in lesson_subjects.items():
+            if subject is not None:
+                item_subject[items.pos[item_id]] = subjects.add(subject)
+
+        def concat(parts, k, dtype):
+            return np.concatenate([p[k] for p in parts]) if parts else np.zeros(0, dtype=dtype)
+
+        return {
+            "students": students,
+            "items": items,
+            "subjects": subjects,
+            "student_class": student_class,
+            "item_subject": item_subject,
+            "responses": ColumnTable.from_arrays(
+                student=concat(r_parts, 0, np.int32), item=concat(r_parts, 1, np.int32), correct=concat(r_parts, 2, bool)),
+            "assignments": ColumnTable.from_arrays(
+                student=concat(a_parts, 0, np.int32), item=concat(a_parts, 1, np.int32)),
+        }
+
+    # ---- incremental updates -------------------------------------------
+
+    def _codes(self, rows: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+        s = np.fromiter((self.students.add(r["student_id"]) for r in rows), dtype=np.int32, count=len(rows))
+        i = np.fromiter((self.items.add(r["item_id"]) for r in rows), dtype=np.int32, count=len(rows))
+        self.student_class = grow(self.student_class, len(self.students), -1)
+        self.item_subject = grow(self.item_subject, len(self.items), -1)
+        return s, i
+
+    def _append(self, kind: str, rows: List[Dict[str, Any]]) -> None:
+        s, i = self._codes(rows)
+        if kind == "responses":
+            correct = np.fromiter((bool(r.get("correct")) for r in rows), dtype=bool, count=len(rows))
+            self.responses.append(student=s, item=i, correct=correct)
+        else:
+            self.assignments.append(student=s, item=i)
+
+    def _observe(self, kind: str, rows: Iterable[Dict[str, Any]]) -> None:
+        rows = list(rows)
+        if not rows:
+            return
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((kind, rows))
+            if self.loaded_at is not None:  # otherwise the first load reads them from the table
+                self._append(kind, rows)
+
+    def observe_responses(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Append stored responses (dicts with id, student_id, item_id, correct)."""
+        self._observe("responses", rows)
+
+    def observe_assignments(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Append stored assignments (dicts with id, student_id, item_id)."""
+        self._observe("assignments", rows)
+
+    # ---- queries -------------------------------------------------------
+
+    def class_summary(self, class_id: int, items_limit: int = ITEMS_LIMIT) -> Dict[str, Any]:
+        # Columns are append-only past their filled prefix, so views taken
+        # under the lock stay consistent while the math runs without it.
+        with self._lock:
+            n_items = len(self.items)
+            in_class = self.student_class[:len(self.students)] == class_id
+            r_student, r_item, r_correct = (self.responses.view(c) for c in ("student", "item", "correct"))
+            a_student, a_item = self.assignments.view("student"), self.assignments.view("item")
+            item_subject = self.item_subject[:n_items].copy()
+            subjects = list(self.subjects.keys)
+            item_keys = list(self.items.keys)
+        n_students = int(in_class.sum())
+        r_rows = in_class[r_student]
+        r_s, r_i, r_y = r_student[r_rows], r_item[r_rows], r_correct[r_rows]
+        a_rows = in_class[a_student]
+        a_s, a_i = a_student[a_rows], a_item[a_rows]
+
+        # accuracy by subject (items without a lesson subject count only toward overall)
+        subj = item_subject[r_i].astype(np.int64)
+        known = subj >= 0
+        attempts = np.bincount(subj[known], minlength=len(subjects))
+        correct = np.bincount(subj[known], weights=r_y[known], minlength=len(subjects))
+        by_subject = {
+            subjects[k]: {"attempts": int(attempts[k]), "correct": int(correct[k]),
+                          "accuracy": round(float(correct[k] / attempts[k]), 4)}
+            for k in np.flatnonzero(attempts)
+        }
+
+        # item difficulty: share of the class's attempts that were wrong
+        item_attempts = np.bincount(r_i, minlength=n_items)
+        item_correct = np.bincount(r_i, weights=r_y, minlength=n_items)
+        attempted = np.flatnonzero(item_attempts)
+        p = item_correct[attempted] / item_attempts[attempted]
+        hardest = attempted[np.argsort(p, kind="stable")][:items_limit]
+        items = [
+            {"item_id": item_keys[k],
+             "subject": subjects[item_subject[k]] if item_subject[k] >= 0 else None,
+             "attempts": int(item_attempts[k]),
+             "p_correct": round(float(item_correct[k] / item_attempts[k]), 4),
+             "difficulty": round(float(1 - item_correct[k] / item_attempts[k]), 4)}
+            for k in hardest
+        ]
+
+        # completion: distinct assigned (student, item) pairs that have a response
+        assigned = np.unique(a_s.astype(np.int64) * n_items + a_i)
+        answered = np.unique(r_s.astype(np.int64) * n_items + r_i)
+        completed = int(np.isin(assigned, answered, assume_unique=True).sum())
+
+        total = len(r_y)
+        return {
+            "class_id": class_id,
+            "students": n_students,
+            "accuracy": {
+                "attempts": total,
+                "correct": int(r_y.sum()),
+                "overall": round(float(r_y.mean()), 4) if total else None,
+                "by_subject": by_subject,
+            },
+            "completion": {
+                "assigned": int(len(assigned)),
+                "completed": completed,
+                "rate": round(completed / len(assigned), 4) if len(assigned) else None,
+            },
+            "hardest_items": items,
+        }
+
+
+CUBE = ClassCube()
+
+def start_reloader(interval: int = RELOAD_SECONDS) -> threading.Thread:
+    """Start (once) a daemon thread that loads the cube now and reloads it every `interval` seconds."""
+    return start_periodic("analytics-reload", CUBE.reload, interval)
@@ -0,0 +1,70 @@
+"""
+Small helpers for the in-memory NumPy models (ability.py, analytics.py):
+string-key -> array-position maps and append-only growable columns.
+"""
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+
+class KeyIndex:
+    """Append-only key -> position map."""
+
+    def __init__(self, keys: Iterable[str] = ()):
+        self.keys: List[str] = []
+        self.pos: Dict[str, int] = {}
+        for k in keys:
+            self.add(k)
+
+    def add(self, key: str) -> int:
+        idx = self.pos.get(key)
+        if idx is None:
+            idx = self.pos[key] = len(self.keys)
+            self.keys.append(key)
+        return idx
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def grow(arr: np.ndarray, n: int, fill=0) -> np.ndarray:
+    """Return `arr` with room for at least n entries (capacity doubles; new slots = fill)."""
+    if n <= len(arr):
+        return arr
+    out = np.full(max(n, 2 * len(arr), 64), fill, dtype=arr.dtype)
+    out[:len(arr)] = arr
+    return out
+
+
+class ColumnTable:
+    """Row-appendable set of equal-length NumPy columns.
+
+    Columns are over-allocated and `view(name)` returns the filled prefix,
+    so appends are amortized O(1) per row.
+    """
+
+    def __init__(self, **dtypes):
+        self.n = 0
+        self.columns: Dict[str, np.ndarray] = {name: np.zeros(0, dtype=dt) for name, dt in dtypes.items()}
+
+    @classmethod
+    def from_arrays(cls, **arrays) -> "ColumnTable":
+        table = cls(**{name: a.dtype for name, a in arrays.items()})
+        table.columns = dict(arrays)
+        table.n = len(next(iter(arrays.values()))) if arrays else 0
+        return table
+
+    def append(self, **values) -> None:
+        k = len(next(iter(values.values())))
+        if not k:
+            return
+        for name, col in self.columns.items():
+            col = self.columns[name] = grow(col, self.n + k)
+            col[self.n:self.n + k] = values[name]
+        self.n += k
+
+    def view(self, name: str) -> np.ndarray:
+        return self.columns[name][:self.n]
+
+    def __len__(self):
+        return self.n
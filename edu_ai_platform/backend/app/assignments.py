@@ -0,0 +1,103 @@
+"""
+Set-based assignment writes for the teacher endpoints.
+A cohort (students x items) is deduped against existing Assignment rows and
+written with one batched INSERT ... RETURNING inside a single transaction.
+"""
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from pydantic import BaseModel, ConfigDict, StringConstraints
+from sqlmodel import select
+from typing_extensions import Annotated
+
+from .analytics import CUBE
+from .database import in_chunks, insert_returning_ids
+from .events import BUS as EVENTS
+from .models import Assignment, Classroom, Student
+
+Id = Annotated[str, StringConstraints(strict=True, strip_whitespace=True, min_length=1)]
+
+
+class BulkAssignRequest(BaseModel):
+    """Body of POST /teacher/assign_bulk: ids must be lists of non-empty strings."""
+    model_config = ConfigDict(extra="forbid")
+
+    student_ids: Optional[List[Id]] = None
+    item_id: Optional[Id] = None
+    item_ids: Optional[List[Id]] = None
+    all: bool = False
+    class_id: Optional[int] = None
+    dedupe: bool = True
+
+    def items(self) -> List[str]:
+        return self.item_ids or ([self.item_id] if self.item_id else [])
+
+
+def _unique(values: Iterable[str]) -> List[str]:
+    # order-preserving dedupe; drops empty values
+    if isinstance(values, str):
+        raise TypeError("expected a list of ids, not a string")  # would be iterated by character
+    return [v for v in dict.fromkeys(values) if v]
+
+
+def resolve_cohort(sess, student_ids: Optional[List[str]] = None, all_students: bool = False, class_id=None) -> List[str]:
+    """Return the student_ids targeted by an assign request."""
+    if all_students:
+        return list(sess.exec(select(Student.student_id)).all())
+    if class_id:
+        return list(sess.exec(select(Student.student_id).where(Student.class_id == int(class_id))).all())
+    return list(student_ids or [])
+
+
+def teacher_roster(sess, teacher_id: str) -> List[str]:
+    """student_ids in the classes taught by teacher_id."""
+    stmt = select(Student.student_id).join(Classroom, Student.class_id == Classroom.id).where(Classroom.teacher_id == teacher_id)
+    return list(sess.exec(stmt).all())
+
+
+def existing_pairs(sess, student_ids: List[str], item_ids: List[str]) -> set:
+    pairs = set()
+    # one query for any class or grade cohort (IN_CHUNK students per list)
+    for chunk in in_chunks(student_ids):
+        stmt = select(Assignment.student_id, Assignment.item_id).where(
+            Assignment.student_id.in_(chunk), Assignment.item_id.in_(item_ids)
+        )
+        pairs.update((sid, iid) for sid, iid in sess.exec(stmt).all())
+    return pairs
+
+
+def bulk_assign(sess, student_ids: Iterable[str], item_ids: Iterable[str], dedupe: bool = True,
+                teacher_id: Optional[str] = None) -> Dict[str, Any]:
+    """Assign every item to every student (cartesian matrix) in one transaction.
+
+    Committed rows are pushed to the /events bus (teacher_id gets the summary).
+    Returns the new assignment ids (in student-major order), the number of
+    pairs skipped because they were already assigned, and write throughput.
+    """
+    started = time.perf_counter()
+    student_ids = _unique(student_ids)
+    item_ids = _unique(item_ids)
+    skip = existing_pairs(sess, student_ids, item_ids) if (dedupe and student_ids and item_ids) else set()
+    assigned_at = datetime.utcnow().isoformat()
+    rows = [
+        {"student_id": sid, "item_id": iid, "assigned_at": assigned_at}
+        for sid in student_ids
+        for iid in item_ids
+        if (sid, iid) not in skip
+    ]
+    ids: List[int] = []
+    if rows:
+        ids = insert_returning_ids(sess, Assignment, rows)
+        sess.commit()
+        stored = [dict(row, id=new_id) for row, new_id in zip(rows, ids)]
+        CUBE.observe_assignments(stored)
+        EVENTS.assignments_committed(stored, teacher_id)
+    elapsed = time.perf_counter() - started
+    return {
+        "assigned_ids": ids,
+        "skipped": len(student_ids) * len(item_ids) - len(rows),
+        "rows": len(rows),
+        "elapsed_ms": round(elapsed * 1000, 3),
+        "rows_per_sec": round(len(rows) / elapsed, 1) if elapsed > 0 else None,
+    }
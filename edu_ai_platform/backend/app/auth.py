@@ -8,15 +8,25 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
 from typing import Optional
 import jwt
+import os
+import threading
 import time
+import hashlib
+from collections import OrderedDict
 from datetime import timedelta
-from .database import get_session
+from .database import get_session, write_sync
 from .models import RefreshToken
+from .revocation import CACHE as REVOCATIONS, is_revoked
+from .token_store import persist as persist_refresh_token
 from sqlmodel import select
 
 # Secret for JWT (in production, use env var)
 SECRET_KEY = "supersecretkey"
 ALGORITHM = "HS256"
+# /events stream tickets: audience-bound so they are useless as bearer tokens, and
+# short-lived because EventSource has to carry them in the URL
+STREAM_AUDIENCE = "events"
+STREAM_TICKET_SECONDS = int(os.environ.get("STREAM_TICKET_SECONDS", 60))
 
 # Dummy user store for prototype
 USERS = {
@@ -56,53 +66,138 @@ def create_access_token(data: dict, expires_delta: int = 3600):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+def token_digest(token: str) -> str:
+    """Stable lookup key for a refresh token (matches RefreshToken.token_hash)."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
 def create_refresh_token(data: dict, expires_delta: int = 60 * 60 * 24 * 7):
     # default: 7 days
     to_encode = data.copy()
     # include a random identifier so each refresh token is unique even if called in the same second
     import uuid
-    to_encode.update({"exp": int(time.time()) + expires_delta, "jti": str(uuid.uuid4())})
+    jti = str(uuid.uuid4())
+    to_encode.update({"exp": int(time.time()) + expires_delta, "jti": jti})
     token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    # persist refresh token for revocation/rotation support
+    # persist refresh token for revocation/rotation support (write-behind, see token_store)
     try:
-        # ensure DB tables exist (handles cases where DB was created before RefreshToken model)
-        from .database import init_db
-        init_db()
         from datetime import datetime
-        rt = RefreshToken(token=token, username=data.get('sub'), created_at=datetime.utcnow().isoformat(), expires_at=str(int(time.time()) + expires_delta), revoked=False)
-        with get_session() as sess:
-            sess.add(rt)
-            sess.commit()
+        persist_refresh_token({
+            "token": token, "token_hash": token_digest(token), "jti": jti, "username": data.get('sub'),
+            "created_at": datetime.utcnow().isoformat(), "expires_at": str(int(time.time()) + expires_delta), "revoked": False,
+        })
     except Exception:
         pass
     return token
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+class TokenCache:
+    """LRU of verified access tokens: token digest -> (User, exp).
+
+    Access tokens carry no jti and cannot be revoked, so a verified token
+    stays valid until its exp; entries are dropped at that point. Callers
+    share the cached User instance and must not mutate it.
+    AUTH_TOKEN_CACHE=0 disables the cache.
+    """
+
+    def __init__(self, size: int = int(os.environ.get("AUTH_TOKEN_CACHE", 10_000))):
+        self._lock = threading.Lock()
+        self.size = size
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self.hits = self.misses = self.expired = self.evicted = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, token: str) -> Optional[User]:
+        if self.size <= 0:
+            return None
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: str, user: User, exp) -> None:
+        if self.size <= 0 or not isinstance(exp, (int, float)):
+            return
+        with self._lock:
+            self._entries[self._key(token)] = (user, exp)
+            if len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "capacity": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+
+TOKEN_CACHE = TokenCache()
+
+
+def _verify_access_token(token: str) -> User:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        role = payload.get("role")
-        student_id = payload.get("student_id")
-        teacher_id = payload.get("teacher_id")
-        if username is None or role is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        return User(username=username, role=role, student_id=student_id, teacher_id=teacher_id)
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    username = payload.get("sub")
+    role = payload.get("role")
+    student_id = payload.get("student_id")
+    teacher_id = payload.get("teacher_id")
+    if username is None or role is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    user = User(username=username, role=role, student_id=student_id, teacher_id=teacher_id)
+    if "jti" not in payload:  # refresh tokens are revocable; never cache them
+        TOKEN_CACHE.put(token, user, payload.get("exp"))
+    return user
+
+
+# async (CPU-only) so auth does not take a threadpool slot per request
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    # dashboard polling re-sends the same token; skip jwt.decode for ones already verified
+    user = TOKEN_CACHE.get(token)
+    if user is not None:
+        return user
+    return _verify_access_token(token)
 
 
 def verify_refresh_token(token: str) -> Optional[dict]:
-    # Strict verification: decode and confirm presence/non-revoked state in DB.
+    # Signature and exp are checked by jwt.decode; revocation is checked by jti
+    # against the in-process cache, which only goes to the DB on a bloom hit.
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except jwt.PyJWTError:
         return None
-    # require DB confirmation; if DB access fails, treat as invalid to avoid insecure fallback.
+    # if DB access fails, treat as invalid to avoid insecure fallback.
     try:
+        jti = payload.get("jti")
+        if jti:
+            return None if is_revoked(jti) else payload
+        # legacy tokens minted without a jti: confirm a non-revoked row exists
         with get_session() as sess:
-            # prefer non-revoked matching tokens; if multiple rows exist with the same token
-            # (possible in this prototype when tokens are deterministic), ensure we pick a non-revoked one.
-            row = sess.exec(select(RefreshToken).where((RefreshToken.token == token) & (RefreshToken.revoked == False))).first()
+            row = sess.exec(select(RefreshToken).where((RefreshToken.token_hash == token_digest(token)) & (RefreshToken.revoked == False))).first()
             if not row:
                 return None
     except Exception:
@@ -112,18 +207,47 @@ def verify_refresh_token(token: str) -> Optional[dict]:
 
 def revoke_refresh_token(token: str):
     try:
-        with get_session() as sess:
-            rows = sess.exec(select(RefreshToken).where(RefreshToken.token == token)).all()
-            for row in rows:
-                row.revoked = True
-                sess.add(row)
-            if rows:
-                sess.commit()
+        # expired tokens can still be revoked (logout after expiry)
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False})
+    except jwt.PyJWTError:
+        return
+    jti = payload.get("jti")
+    if jti:
+        REVOCATIONS.revoke(jti)
+    key = (RefreshToken.jti == jti) if jti else (RefreshToken.token_hash == token_digest(token))
+    def write(sess):
+        rows = sess.exec(select(RefreshToken).where(key)).all()
+        for row in rows:
+            row.revoked = True
+            sess.add(row)
+        if rows:
+            sess.commit()
+    try:
+        write_sync(write)
     except Exception:
         pass
 
+def create_stream_ticket(user: User) -> str:
+    claims = {"sub": user.username, "role": user.role, "student_id": user.student_id, "teacher_id": user.teacher_id,
+              "aud": STREAM_AUDIENCE}
+    return create_access_token(claims, expires_delta=STREAM_TICKET_SECONDS)
+
+
+def verify_stream_ticket(ticket: str) -> User:
+    # access and refresh tokens carry no aud, so they fail here; tickets (with
+    # aud) are in turn rejected by jwt.decode in _verify_access_token
+    try:
+        payload = jwt.decode(ticket, SECRET_KEY, algorithms=[ALGORITHM], audience=STREAM_AUDIENCE)
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid stream ticket")
+    if payload.get("sub") is None or payload.get("role") is None:
+        raise HTTPException(status_code=401, detail="Invalid stream ticket")
+    return User(username=payload["sub"], role=payload["role"], student_id=payload.get("student_id"),
+                teacher_id=payload.get("teacher_id"))
+
+
 def require_role(required_role: str):
-    def role_checker(user: User = Depends(get_current_user)):
+    async def role_checker(user: User = Depends(get_current_user)):
         if user.role != required_role:
             raise HTTPException(status_code=403, detail="Insufficient permissions")
         return user
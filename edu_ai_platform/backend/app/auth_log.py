@@ -1,45 +1,447 @@
-from datetime import datetime
-from pathlib import Path
+"""
+Buffered auth event log (logs/auth_events.jsonl).
+
+record_event() only stamps the event and puts it on a bounded in-memory
+queue, so a burst of 401/403s never waits on the disk. A daemon writer
+thread drains the queue in batches, appends them with one write, and
+rotates the file by size (AUTH_LOG_MAX_BYTES) and optionally by age
+(AUTH_LOG_ROTATE_SECONDS); rotated files are gzipped next to it as
+auth_events.<first event timestamp>.jsonl.gz and only the newest
+AUTH_LOG_BACKUPS are kept. When the queue is full the event is dropped and
+counted.
+
+Every written batch also gets a line in a sidecar index (<log>.idx): its
+byte range, time range, statuses and paths. query_events() walks files and
+blocks newest first, skips blocks the filters rule out, and reads the rest
+backwards in fixed-size chunks, so a page costs about the same however
+large the log has grown. Byte ranges the index doesn't cover (older logs,
+a failed index write) are simply read.
+"""
+import base64
+import gzip
+import io
 import json
-from typing import List, Dict, Any
+import os
+import re
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 LOG_DIR = Path(__file__).resolve().parents[1] / "logs"
 LOG_FILE = LOG_DIR / "auth_events.jsonl"
+QUEUE_MAX = int(os.environ.get("AUTH_LOG_QUEUE", 10_000))
+MAX_BYTES = int(os.environ.get("AUTH_LOG_MAX_BYTES", 10 * 1024 * 1024))
+# 0 = rotate by size only
+ROTATE_SECONDS = int(os.environ.get("AUTH_LOG_ROTATE_SECONDS", 0))
+BACKUPS = int(os.environ.get("AUTH_LOG_BACKUPS", 10))
+BATCH_MAX = 1000
+# how long the writer waits for more events after the first one arrives
+LINGER_SECONDS = 0.05
+# index blocks list their paths up to this many distinct ones (else "any")
+INDEX_PATHS = 64
+READ_BLOCK = 1 << 16
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+_queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=QUEUE_MAX)
+_writer: Optional[threading.Thread] = None
+_lock = threading.Lock()
+_done = threading.Condition()
+_stats = {"queued": 0, "written": 0, "dropped": 0, "failed": 0, "rotations": 0}
 
 
 def _ensure_log_dir():
     LOG_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def _first_timestamp(path: Path) -> Optional[str]:
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return str(json.loads(f.readline())["timestamp"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _started_at(path: Path) -> Optional[float]:
+    """Timestamp of the first event in `path` (its age, for time-based rotation)."""
+    first = _first_timestamp(path)
+    try:
+        return None if first is None else datetime.fromisoformat(first).timestamp()
+    except ValueError:
+        return None
+
+
+def _stamp(timestamp: str) -> str:
+    return re.sub(r"[^0-9T]", "", timestamp)
+
+
+def _index_path(path: Path) -> Path:
+    """auth_events.jsonl -> auth_events.jsonl.idx, auth_events.<stamp>.jsonl.gz -> auth_events.<stamp>.jsonl.idx"""
+    name = path.name[:-3] if path.name.endswith(".gz") else path.name
+    return path.with_name(name + ".idx")
+
+
+def _rotated() -> List[Path]:
+    return sorted(LOG_DIR.glob(LOG_FILE.stem + ".*.jsonl.gz"))
+
+
+def _prune() -> None:
+    rotated = _rotated()
+    for old in rotated[:max(0, len(rotated) - BACKUPS)]:
+        for path in (old, _index_path(old)):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+def _rotate() -> None:
+    # named after the file's first event, so paging cursors stay valid across the rename
+    first = _first_timestamp(LOG_FILE)
+    stamp = _stamp(first) if first else datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    plain = LOG_DIR / f"{LOG_FILE.stem}.{stamp}.jsonl"
+    os.replace(LOG_FILE, plain)
+    index = _index_path(LOG_FILE)
+    if index.exists():
+        os.replace(index, _index_path(plain))
+    with plain.open("rb") as src, gzip.open(plain.with_name(plain.name + ".gz"), "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    plain.unlink()
+    with _done:
+        _stats["rotations"] += 1
+    _prune()
+
+
+def _block_entry(start: int, events: List[Dict[str, Any]], end: int) -> Dict[str, Any]:
+    stamps = [str(e.get("timestamp")) for e in events]
+    paths = {e.get("path") for e in events}
+    return {
+        "start": start,
+        "end": end,
+        "first": min(stamps),
+        "last": max(stamps),
+        "statuses": sorted({e["status"] for e in events if isinstance(e.get("status"), int)}),
+        "paths": sorted(p for p in paths if p is not None) if len(paths) <= INDEX_PATHS and None not in paths else None,
+    }
+
+
+_index_cache: Dict[str, Tuple[Tuple[int, int], List[Dict[str, Any]]]] = {}
+
+
+def _read_index(path: Path) -> List[Dict[str, Any]]:
+    """Parsed index entries of `path`; an index that only grew is read from where it was last parsed."""
+    index = _index_path(path)
+    try:
+        with index.open("rb") as f:
+            st = os.fstat(f.fileno())
+            cached = _index_cache.get(str(index))
+            blocks: List[Dict[str, Any]] = []
+            if cached is not None and cached[0][0] == st.st_ino and cached[0][1] <= st.st_size:
+                blocks = list(cached[1])
+                f.seek(cached[0][1])
+            data = f.read(st.st_size - f.tell())
+    except OSError:
+        return []
+    complete = data[:data.rfind(b"\n") + 1]  # a line still being appended is read next time
+    for line in complete.splitlines():
+        try:
+            blocks.append(json.loads(line))
+        except ValueError:
+            continue
+    _index_cache[str(index)] = ((st.st_ino, st.st_size - len(data) + len(complete)), blocks)
+    return blocks
+
+
+class _Writer:
+    def __init__(self):
+        self.path: Optional[Path] = None
+        self.size: Optional[int] = None
+        self.started: Optional[float] = None
+
+    def _open(self) -> None:
+        self.path = LOG_FILE
+        self.size = LOG_FILE.stat().st_size if LOG_FILE.exists() else 0
+        self.started = _started_at(LOG_FILE) if self.size else None
+        # an index that doesn't end where the log does belongs to another
+        # version of the file; drop it and let readers scan
+        blocks = _read_index(LOG_FILE)
+        if blocks and blocks[-1].get("end") != self.size:
+            try:
+                _index_path(LOG_FILE).unlink()
+            except OSError:
+                pass
+
+    def write(self, events: List[Dict[str, Any]]) -> None:
+        _ensure_log_dir()
+        if self.size is None or self.path != LOG_FILE:
+            self._open()
+        now = time.time()
+        if ROTATE_SECONDS and self.started is not None and now - self.started >= ROTATE_SECONDS:
+            self._rotate()
+        lines = [(json.dumps(e) + "\n").encode("utf-8") for e in events]
+        while lines:
+            # as many lines as fit under MAX_BYTES (at least one per file)
+            n, size = 0, self.size
+            while n < len(lines) and (size + len(lines[n]) <= MAX_BYTES or size == 0):
+                size += len(lines[n])
+                n += 1
+            if n == 0:
+                self._rotate()
+                continue
+            with LOG_FILE.open("ab") as f:
+                f.write(b"".join(lines[:n]))
+            entry = _block_entry(self.size, events[:n], size)
+            self.size = size
+            try:
+                with _index_path(LOG_FILE).open("a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+            except OSError:
+                pass  # the block is read without the index's help
+            if self.started is None:
+                self.started = now
+            lines, events = lines[n:], events[n:]
+
+    def _rotate(self) -> None:
+        if self.size:
+            _rotate()
+        self.size, self.started = 0, None
+
+
+def _drain_loop():
+    writer = _Writer()
+    while True:
+        events = [_queue.get()]
+        deadline = time.monotonic() + LINGER_SECONDS
+        while len(events) < BATCH_MAX:
+            remaining = deadline - time.monotonic()
+            try:
+                events.append(_queue.get(timeout=remaining) if remaining > 0 else _queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            writer.write(events)
+            outcome = "written"
+        except Exception:
+            writer.size = None  # re-stat on the next batch
+            outcome = "failed"
+        with _done:
+            _stats[outcome] += len(events)
+            _done.notify_all()
+
+
+def _ensure_writer() -> None:
+    global _writer
+    if _writer and _writer.is_alive():
+        return
+    with _lock:
+        if not (_writer and _writer.is_alive()):
+            _writer = threading.Thread(target=_drain_loop, name="auth-log-writer", daemon=True)
+            _writer.start()
+
+
 def record_event(event_data: Dict[str, Any]) -> None:
-    _ensure_log_dir()
+    """Queue an auth event for writing; never blocks (drops and counts when full)."""
     event = {
         "timestamp": datetime.utcnow().isoformat(),
         **event_data
     }
+    _ensure_writer()
+    with _done:
+        try:
+            _queue.put_nowait(event)
+            _stats["queued"] += 1
+        except queue.Full:
+            _stats["dropped"] += 1
+
+
+def flush(timeout: Optional[float] = None) -> bool:
+    """Wait until every event queued so far is on disk; False on timeout."""
+    with _done:
+        target = _stats["queued"]
+        return _done.wait_for(lambda: _stats["written"] + _stats["failed"] >= target, timeout)
+
+
+def stats() -> Dict[str, int]:
+    """Logger counters: queued, written, dropped (queue full), failed (I/O), rotations, pending."""
+    with _done:
+        return dict(_stats, pending=_stats["queued"] - _stats["written"] - _stats["failed"])
+
+
+# ---- reading ------------------------------------------------------------
+
+
+def encode_cursor(file_id: str, offset: int) -> str:
+    raw = json.dumps({"file": file_id, "before": offset}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """(file id, byte offset) to continue before. Raises ValueError on a bad token."""
     try:
-        with LOG_FILE.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(event) + "\n")
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        file_id, offset = data["file"], data["before"]
     except Exception:
-        pass
+        raise ValueError("invalid cursor")
+    if not isinstance(file_id, str) or not isinstance(offset, int):
+        raise ValueError("invalid cursor")
+    return file_id, offset
 
 
-def recent_events(limit: int = 100) -> List[Dict[str, Any]]:
-    _ensure_log_dir()
-    if not LOG_FILE.exists():
-        return []
+def parse_time(value: Optional[str]) -> Optional[str]:
+    """Normalize an ISO date/time to the log's naive-UTC format. Raises ValueError."""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat()
 
-    events = []
-    try:
-        with LOG_FILE.open("r", encoding="utf-8") as f:
-            lines = f.readlines()
-            for line in lines[-limit:]:
-                try:
-                    event = json.loads(line.strip())
-                    events.append(event)
-                except Exception:
+
+def _files() -> List[Tuple[str, Path]]:
+    """(file id, path) for the live log and every rotated one, newest first."""
+    files = []
+    first = _first_timestamp(LOG_FILE)
+    if first:
+        files.append((_stamp(first), LOG_FILE))
+    for path in reversed(_rotated()):
+        files.append((path.name[len(LOG_FILE.stem) + 1:-len(".jsonl.gz")], path))
+    return files
+
+
+def _blocks(path: Path, size: int) -> List[Dict[str, Any]]:
+    """Indexed blocks of `path` in offset order, with unindexed gaps as summary-less blocks."""
+    blocks = sorted((b for b in _read_index(path) if b.get("end", size + 1) <= size), key=lambda b: b["start"])
+    out, pos = [], 0
+    for block in blocks:
+        if block["start"] < pos:
+            continue
+        if block["start"] > pos:
+            out.append({"start": pos, "end": block["start"]})
+        out.append(block)
+        pos = block["end"]
+    if pos < size:
+        out.append({"start": pos, "end": size})
+    return out
+
+
+def _block_matches(block: Dict[str, Any], path: Optional[str], status: Optional[int],
+                   since: Optional[str], until: Optional[str]) -> bool:
+    if "first" not in block:
+        return True
+    if since is not None and block["last"] < since:
+        return False
+    if until is not None and block["first"] >= until:
+        return False
+    if status is not None and status not in block["statuses"]:
+        return False
+    if path is not None and block["paths"] is not None and path not in block["paths"]:
+        return False
+    return True
+
+
+def _event_matches(event: Dict[str, Any], path: Optional[str], status: Optional[int],
+                   since: Optional[str], until: Optional[str]) -> bool:
+    stamp = str(event.get("timestamp", ""))
+    return ((path is None or event.get("path") == path)
+            and (status is None or event.get("status") == status)
+            and (since is None or stamp >= since)
+            and (until is None or stamp < until))
+
+
+def _reverse_lines(f, start: int, end: int) -> Iterator[Tuple[int, bytes]]:
+    """(offset, line) for the lines in [start, end) of `f`, last first, reading READ_BLOCK bytes at a time."""
+    pos, tail = end, b""
+    while pos > start:
+        n = min(READ_BLOCK, pos - start)
+        pos -= n
+        f.seek(pos)
+        parts = (f.read(n) + tail).split(b"\n")
+        tail = parts[0]  # may continue in the previous chunk
+        offset = pos + len(tail) + 1
+        found = []
+        for line in parts[1:]:
+            found.append((offset, line))
+            offset += len(line) + 1
+        for offset, line in reversed(found):
+            if line.strip():
+                yield offset, line
+    if tail.strip():
+        yield start, tail
+
+
+_gz_cache: Optional[Tuple[Tuple[str, int], bytes]] = None
+
+
+def _open_gz(path: Path):
+    """Rotated files are at most AUTH_LOG_MAX_BYTES; the last one read stays decompressed."""
+    global _gz_cache
+    key = (str(path), path.stat().st_mtime_ns)
+    cached = _gz_cache
+    if cached is None or cached[0] != key:
+        with gzip.open(path, "rb") as f:
+            cached = _gz_cache = (key, f.read())
+    return io.BytesIO(cached[1])
+
+
+def query_events(limit: int = DEFAULT_LIMIT, cursor: Optional[str] = None, path: Optional[str] = None,
+                 status: Optional[int] = None, since: Optional[str] = None,
+                 until: Optional[str] = None) -> Dict[str, Any]:
+    """A page of events, newest page first (events within it oldest first), walking back
+    through rotated files. since/until are normalized timestamps (parse_time); until is exclusive.
+    Raises ValueError on a bad cursor."""
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    cursor_file, before = decode_cursor(cursor) if cursor else (None, None)
+    found: List[Tuple[str, int, Dict[str, Any]]] = []
+    # cheap substring pre-check before decoding a line (record_event writes json.dumps defaults)
+    needle = (json.dumps({"status": status})[1:-1].encode("utf-8") if status is not None
+              else json.dumps({"path": path})[1:-1].encode("utf-8") if path is not None else None)
+    for file_id, file_path in _files():
+        if cursor_file is not None and file_id > cursor_file:
+            continue
+        end_at = before if file_id == cursor_file else None
+        compressed = file_path.suffix == ".gz"
+        try:
+            if compressed:
+                indexed = _read_index(file_path)
+                if indexed and not any(_block_matches(b, path, status, since, until) for b in indexed):
+                    continue  # fully indexed and nothing can match: skip the decompress
+                f = _open_gz(file_path)
+                size = len(f.getbuffer())
+            else:
+                f = file_path.open("rb")
+                size = os.fstat(f.fileno()).st_size
+        except OSError:
+            continue
+        with f:
+            for block in reversed(_blocks(file_path, size)):
+                end = block["end"] if end_at is None else min(block["end"], end_at)
+                if end <= block["start"] or not _block_matches(block, path, status, since, until):
                     continue
-    except Exception:
-        pass
+                for offset, line in _reverse_lines(f, block["start"], end):
+                    if needle is not None and needle not in line:
+                        continue
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(event, dict) and _event_matches(event, path, status, since, until):
+                        found.append((file_id, offset, event))
+                        if len(found) > limit:
+                            break
+                if len(found) > limit:
+                    break
+        if len(found) > limit:
+            break
+    page = found[:limit]
+    next_cursor = encode_cursor(page[-1][0], page[-1][1]) if len(found) > limit else None
+    return {"logs": [event for _, _, event in reversed(page)], "next_cursor": next_cursor}
 
-    return events
+
+def recent_events(limit: int = 100) -> List[Dict[str, Any]]:
+    """The last `limit` events, oldest first."""
+    return query_events(limit)["logs"]
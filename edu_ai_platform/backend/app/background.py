@@ -0,0 +1,36 @@
+"""
+Periodic daemon threads for in-process caches: the refresh-token sweeper,
+the nightly ability refit and the analytics cube reload.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict
+
+_threads: Dict[str, threading.Thread] = {}
+_lock = threading.Lock()
+
+
+def start_periodic(name: str, fn: Callable[[], Any], interval: float, run_now: bool = True) -> threading.Thread:
+    """Start (once per name) a daemon thread calling fn() every `interval` seconds.
+
+    With run_now the first call happens immediately, otherwise after one
+    interval. A failing call is skipped; the thread keeps its schedule.
+    """
+    with _lock:
+        thread = _threads.get(name)
+        if thread is not None and thread.is_alive():
+            return thread
+
+        def loop():
+            if not run_now:
+                time.sleep(interval)
+            while True:
+                try:
+                    fn()
+                except Exception:
+                    pass
+                time.sleep(interval)
+
+        thread = _threads[name] = threading.Thread(target=loop, name=name, daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,146 @@
+"""
+Versioned in-process lesson catalog for /teacher/lessons.
+
+The Lesson table is read once per version: each row is serialized to JSON
+bytes up front, and subject/source filters are answered from precomputed
+position lists. Assembled response bodies are cached per query with an ETag
+derived from the bytes, so an unchanged dashboard reload costs a dict
+lookup (or a 304 when the client sends If-None-Match).
+
+A new version is built when a writer calls invalidate() (lesson seeding and
+item-bank ingestion) or when the Lesson table is seen to change (row count,
+max id, max updated_at); that check runs at most every CATALOG_CHECK_SECONDS.
+"""
+import bisect
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlmodel import select
+
+from .database import get_session
+from .models import Lesson
+from .pagination import encode_cursor
+
+CHECK_SECONDS = float(os.environ.get("CATALOG_CHECK_SECONDS", 5))
+BODY_CACHE_SIZE = 256
+FIELDS = ("item_id", "subject", "prompt", "source")
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class _Version:
+    def __init__(self, number: int, rows: List[Tuple[int, Dict[str, Any]]]):
+        self.number = number
+        self.ids = [row_id for row_id, _ in rows]
+        self.rows = [row for _, row in rows]
+        self.row_bytes = [_dumps(row) for row in self.rows]
+        # content hash, so equal catalogs get equal ETags across rebuilds and workers
+        digest = hashlib.blake2b(digest_size=8)
+        for row_id, data in zip(self.ids, self.row_bytes):
+            digest.update(b"%d:%s\n" % (row_id, data))
+        self.tag = digest.hexdigest()
+        # (subject, source) filter -> row positions in id order; None = any
+        self.index: Dict[Tuple[Optional[str], Optional[str]], List[int]] = {(None, None): list(range(len(self.rows)))}
+        for pos, row in enumerate(self.rows):
+            subject, source = row["subject"], row["source"]
+            for key in {(subject, None), (None, source), (subject, source)} - {(None, None)}:
+                self.index.setdefault(key, []).append(pos)
+        self.index_ids = {key: [self.ids[p] for p in positions] for key, positions in self.index.items()}
+        self.facets = {
+            "subjects": sorted({r["subject"] for r in self.rows if r["subject"] is not None}),
+            "sources": sorted({r["source"] for r in self.rows if r["source"] is not None}),
+        }
+
+
+class LessonCatalog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version: Optional[_Version] = None
+        self._number = 0
+        self._signature = None
+        self._checked_at = 0.0
+        self._bodies: "OrderedDict[tuple, Tuple[bytes, str]]" = OrderedDict()
+        self._generation = 0
+
+    def invalidate(self) -> None:
+        """Drop the current version; the next request rebuilds it."""
+        with self._lock:
+            self._version = None
+            self._generation += 1
+            self._bodies.clear()
+
+    def _signature_now(self):
+        with get_session() as sess:
+            return tuple(sess.exec(
+                select(func.count(), func.max(Lesson.id), func.max(Lesson.updated_at)).select_from(Lesson)).one())
+
+    def current(self) -> _Version:
+        now = time.monotonic()
+        version = self._version
+        if version is not None and now - self._checked_at < CHECK_SECONDS:
+            return version
+        signature = self._signature_now()
+        with self._lock:
+            self._checked_at = now
+            if self._version is not None and signature == self._signature:
+                return self._version
+            generation = self._generation
+        with get_session() as sess:
+            rows = sess.exec(select(Lesson.id, *(getattr(Lesson, f) for f in FIELDS)).order_by(Lesson.id)).all()
+        with self._lock:
+            self._number += 1
+            version = _Version(self._number, [(r[0], dict(zip(FIELDS, r[1:]))) for r in rows])
+            if generation == self._generation:
+                self._version, self._signature = version, signature
+                self._bodies.clear()
+            return version
+
+    def page(self, names: List[str], limit: int, after: int = 0,
+             subject: Optional[str] = None, source: Optional[str] = None) -> Tuple[bytes, str]:
+        """JSON body and ETag for one page of the catalog."""
+        version = self.current()
+        key = (version.number, tuple(names), limit, after, subject, source)
+        with self._lock:
+            cached = self._bodies.get(key)
+            if cached is not None:
+                self._bodies.move_to_end(key)
+                return cached
+        positions = version.index.get((subject, source), [])
+        # positions are in id order; skip to the first id after the cursor
+        start = bisect.bisect_right(version.index_ids.get((subject, source), []), after) if after else 0
+        chosen = positions[start:start + limit + 1]
+        more = len(chosen) > limit
+        chosen = chosen[:limit]
+        if list(names) == list(FIELDS):
+            items = b",".join(version.row_bytes[p] for p in chosen)
+        else:
+            items = b",".join(_dumps({n: version.rows[p][n] for n in names}) for p in chosen)
+        next_cursor = encode_cursor(version.ids[chosen[-1]]) if more else None
+        body = (b'{"lessons":[' + items + b'],"next_cursor":' + _dumps(next_cursor)
+                + b',"version":' + _dumps(version.tag)
+                + b',"facets":' + _dumps(version.facets) + b"}")
+        etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        with self._lock:
+            if version is self._version:
+                self._bodies[key] = (body, etag)
+                while len(self._bodies) > BODY_CACHE_SIZE:
+                    self._bodies.popitem(last=False)
+        return body, etag
+
+
+CATALOG = LessonCatalog()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or ("W/" + etag) in tags
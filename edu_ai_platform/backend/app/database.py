@@ -1,20 +1,182 @@
 import os
+import queue
+import sqlite3
+import threading
+import weakref
+import contextvars
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from sqlalchemy import event, insert
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, TypeVar
+
+from . import metrics
 
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./edu_platform.db")
 
+# DB_ASYNC=1 runs endpoint DB work on an async engine (aiosqlite / asyncpg)
+# instead of a worker thread; see run_db().
+ASYNC_MODE = os.environ.get("DB_ASYNC", "0") == "1"
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 20))
+MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+# compiled-statement cache (SQLAlchemy) and prepared-statement cache (asyncpg)
+STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", 500))
+# rows per multi-row INSERT ... VALUES statement (SQLAlchemy also caps it by the driver's parameter limit)
+INSERT_PAGE_SIZE = int(os.environ.get("DB_INSERT_PAGE_SIZE", 10_000))
+# values per IN (...) list; SQLite allows 32766 bound parameters since 3.32 (999 before)
+IN_CHUNK = 10_000 if sqlite3.sqlite_version_info >= (3, 32, 0) else 500
+# rows per keyset batch for full-table scans (model fits, cube and index loads)
+READ_BATCH = 50_000
+# threads allowed to run DB work concurrently in sync mode
+DB_THREADS = int(os.environ.get("DB_THREADS", POOL_SIZE + MAX_OVERFLOW))
+
+T = TypeVar("T")
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+# SQLITE_PROFILE=off keeps SQLite defaults; anything else applies SQLITE_PRAGMAS
+SQLITE_PROFILE = os.environ.get("SQLITE_PROFILE", "production")
+# the page cache is per connection: a pool of POOL_SIZE + MAX_OVERFLOW connections can
+# hold SQLITE_CACHE_BUDGET_MB (default 256) per process, split evenly unless SQLITE_CACHE_KB
+# sets a per-connection size. Hot pages are also shared through mmap and the OS page cache.
+SQLITE_CACHE_BUDGET_MB = int(os.environ.get("SQLITE_CACHE_BUDGET_MB", 256))
+SQLITE_CACHE_KB = int(os.environ.get("SQLITE_CACHE_KB") or max(2_000, SQLITE_CACHE_BUDGET_MB * 1024 // max(1, POOL_SIZE + MAX_OVERFLOW)))
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -SQLITE_CACHE_KB,  # negative = KiB
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_BYTES", 256 * 1024 * 1024)),
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    "temp_store": "MEMORY",
+}
+# route writes through one writer thread (default on for SQLite, which allows a single writer)
+SINGLE_WRITER = os.environ.get("DB_SINGLE_WRITER", "1" if IS_SQLITE else "0") == "1"
+
+
+def _pool_args(url: str) -> dict:
+    if ":memory:" in url:
+        return {}
+    return {"pool_size": POOL_SIZE, "max_overflow": MAX_OVERFLOW, "pool_pre_ping": True}
+
+
 engine = create_engine(
     DATABASE_URL,
     echo=False,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {},
+    query_cache_size=STATEMENT_CACHE_SIZE,
+    insertmanyvalues_page_size=INSERT_PAGE_SIZE,
+    **_pool_args(DATABASE_URL),
 )
 
 
+def _apply_sqlite_pragmas(dbapi_conn, connection_record):
+    cursor = dbapi_conn.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+if IS_SQLITE and SQLITE_PROFILE != "off":
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+# METRICS=1: per-statement timing and per-request query counts
+if metrics.ENABLED:
+    metrics.instrument_engine(engine)
+
+
+def async_url(url: str) -> str:
+    """Map a sync DATABASE_URL to its async driver (aiosqlite / asyncpg)."""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith(("postgresql:", "postgres:")):
+        return "postgresql+asyncpg:" + url.split(":", 1)[1]
+    return url
+
+
+_async_engine = None
+
+
+def get_async_engine():
+    """Create the async engine on first use (needs aiosqlite or asyncpg installed)."""
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        url = os.environ.get("ASYNC_DATABASE_URL") or async_url(DATABASE_URL)
+        connect_args = {}
+        if "asyncpg" in url:
+            connect_args["prepared_statement_cache_size"] = STATEMENT_CACHE_SIZE
+        _async_engine = create_async_engine(
+            url, echo=False, connect_args=connect_args,
+            query_cache_size=STATEMENT_CACHE_SIZE, insertmanyvalues_page_size=INSERT_PAGE_SIZE, **_pool_args(url),
+        )
+        if url.startswith("sqlite") and SQLITE_PROFILE != "off":
+            event.listen(_async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+        if metrics.ENABLED:
+            metrics.instrument_engine(_async_engine.sync_engine)
+    return _async_engine
+
+
 def init_db():
     SQLModel.metadata.create_all(engine)
 
 
+_schema_ready = False
+
+
+def ensure_schema():
+    """Run init_db() once per process (startup normally does it already)."""
+    global _schema_ready
+    if not _schema_ready:
+        init_db()
+        _schema_ready = True
+
+
+def insert_returning_ids(sess, model, rows: List[Dict[str, Any]]) -> List[int]:
+    """Insert rows with batched multi-row INSERT ... RETURNING; return their ids in row order.
+
+    RETURNING with sort_by_parameter_order makes SQLAlchemy send one INSERT per
+    row on SQLite, so instead every inserted column comes back with its id and
+    ids are matched to rows by value (rows with equal values are interchangeable).
+    """
+    if not rows:
+        return []
+    columns = list(rows[0])
+    stmt = insert(model).returning(model.id, *(getattr(model, c) for c in columns))
+    ids: Dict[tuple, deque] = defaultdict(deque)
+    for new_id, *values in sess.execute(stmt, rows):
+        ids[tuple(values)].append(new_id)
+    return [ids[tuple(row[c] for c in columns)].popleft() for row in rows]
+
+
+def in_chunks(values: Iterable[T], size: int = IN_CHUNK) -> Iterator[List[T]]:
+    """Distinct values (first-seen order) in slices of at most `size`, one IN (...) list each."""
+    values = list(dict.fromkeys(values))
+    for n in range(0, len(values), size):
+        yield values[n:n + size]
+
+
+def keyset_page(stmt, key, after, limit: int):
+    """`stmt` narrowed to the `limit` rows whose `key` follows `after`, in key order."""
+    return stmt.where(key > after).order_by(key).limit(limit)
+
+
+def iter_batches(stmt, key, batch_size: int = READ_BATCH, after=0) -> Iterator[List[Any]]:
+    """Keyset batches of a select whose first column is `key` (usually the model's id).
+
+    Each batch is read on its own short session, so a full-table scan holds no
+    transaction or pool connection between batches and callers may write in between.
+    """
+    while True:
+        with get_session() as sess:
+            rows = sess.exec(keyset_page(stmt, key, after, batch_size)).all()
+        if not rows:
+            return
+        after = rows[-1][0]
+        yield rows
+        if len(rows) < batch_size:
+            return
+
+
 @contextmanager
 def get_session():
     with Session(engine) as session:
@@ -23,3 +185,90 @@ def get_session():
 
 def get_session_sync():
     return Session(engine)
+
+
+# one CapacityLimiter per event loop (TestClient may run several loops)
+_limiters: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _db_limiter():
+    import asyncio
+    import anyio
+    loop = asyncio.get_running_loop()
+    limiter = _limiters.get(loop)
+    if limiter is None:
+        limiter = _limiters[loop] = anyio.CapacityLimiter(DB_THREADS)
+    return limiter
+
+
+def _call_with_session(fn: Callable[[Session], T]) -> T:
+    with Session(engine) as sess:
+        return fn(sess)
+
+
+async def run_db(fn: Callable[[Session], T]) -> T:
+    """Run fn(session) from an async endpoint without holding the request threadpool.
+
+    Async mode runs fn on an AsyncSession via run_sync (same Session API, no
+    thread); sync mode runs it on a dedicated, DB_THREADS-wide thread limiter.
+    """
+    if ASYNC_MODE:
+        async with AsyncSession(get_async_engine()) as sess:
+            return await sess.run_sync(fn)
+    import anyio
+    return await anyio.to_thread.run_sync(_call_with_session, fn, limiter=_db_limiter())
+
+
+class _Writer:
+    """Single thread that executes write callables one at a time.
+
+    SQLite allows one writer at a time; serializing writes here avoids
+    "database is locked" errors under concurrent submissions.
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _loop(self):
+        while True:
+            fn, fut, ctx = self._queue.get()
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                fut.set_result(ctx.run(_call_with_session, fn))
+            except BaseException as exc:
+                fut.set_exception(exc)
+
+    def submit(self, fn: Callable[[Session], T]) -> "Future[T]":
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+                    self._thread.start()
+        fut: "Future[T]" = Future()
+        # carry contextvars (request-scoped state) into the writer thread
+        self._queue.put((fn, fut, contextvars.copy_context()))
+        return fut
+
+    def on_writer_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+
+_writer = _Writer()
+
+
+def write_sync(fn: Callable[[Session], T]) -> T:
+    """Run fn(session) on the writer thread and wait for its result (blocking callers)."""
+    if not SINGLE_WRITER or _writer.on_writer_thread():
+        return _call_with_session(fn)
+    return _writer.submit(fn).result()
+
+
+async def run_write(fn: Callable[[Session], T]) -> T:
+    """Async counterpart of write_sync for endpoints; falls back to run_db when disabled."""
+    if not SINGLE_WRITER:
+        return await run_db(fn)
+    import asyncio
+    return await asyncio.wrap_future(_writer.submit(fn))
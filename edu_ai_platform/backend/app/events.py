@@ -0,0 +1,216 @@
+"""
+In-process pub/sub behind the /events server-sent-events stream.
+
+Writers report committed rows to BUS next to the analytics cube's
+observe_* calls: assignments_committed() for /teacher/assign and
+/teacher/assign_bulk, responses_committed() for single and batched
+responses. Each event goes to topics "student:<student_id>" (the student it
+concerns) and "teacher:<teacher_id>" (the teacher who made the change). A
+subscriber's topics are fixed when it connects, from its JWT: a student
+gets their own topic; a teacher gets theirs, the students in the classes
+they teach, and any student_ids they ask for (teachers may read any
+student's data over REST too).
+
+Publishing never waits on a client. Every event is encoded to its SSE frame
+once and the same bytes are queued for all matching subscribers. Each
+subscriber buffers at most EVENTS_QUEUE frames; one that falls further
+behind has its buffer dropped and gets a single "resync" event, telling the
+dashboard to reload over REST. An idle connection is a suspended task and a
+Subscriber of five slots; its buffer only exists while events are pending.
+The last EVENTS_REPLAY events are kept so a client that reconnects with
+Last-Event-ID gets what it missed (or a resync when that has aged out).
+"""
+import asyncio
+import json
+import os
+import threading
+from collections import defaultdict, deque
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE", 256))
+REPLAY = int(os.environ.get("EVENTS_REPLAY", 1000))
+MAX_SUBSCRIBERS = int(os.environ.get("EVENTS_MAX_SUBSCRIBERS", 10_000))
+KEEPALIVE_SECONDS = float(os.environ.get("EVENTS_KEEPALIVE_SECONDS", 15))
+# streams end after this long; EventSource reconnects (with Last-Event-ID), which
+# picks up roster changes and a fresh token
+MAX_STREAM_SECONDS = float(os.environ.get("EVENTS_MAX_SECONDS", 900))
+# ms the browser waits before reconnecting
+RETRY_MS = 3000
+
+RESYNC = b'event: resync\ndata: {"type": "resync"}\n\n'
+KEEPALIVE = b": keepalive\n\n"
+
+
+def _frame(event_id: int, kind: str, data: Dict[str, Any]) -> bytes:
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode("utf-8")
+
+
+class Subscriber:
+    """One stream's topics and pending frames. Delivery runs on the subscriber's event loop."""
+
+    __slots__ = ("topics", "loop", "buffer", "waiter", "lagged")
+
+    def __init__(self, topics: Iterable[str], loop: asyncio.AbstractEventLoop):
+        self.topics = frozenset(topics)
+        self.loop = loop
+        self.buffer: Optional[deque] = None
+        self.waiter: Optional[asyncio.Future] = None
+        self.lagged = False
+
+    def deliver(self, frame: bytes) -> None:
+        if self.lagged:
+            return
+        if self.buffer is None:
+            self.buffer = deque()
+        if len(self.buffer) >= QUEUE_SIZE:
+            # too far behind: drop what is pending and ask the client to reload
+            self.buffer = None
+            self.lagged = True
+            BUS.stats["resyncs"] += 1
+        else:
+            self.buffer.append(frame)
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    async def next_frames(self, timeout: float) -> List[bytes]:
+        """Pending frames (a resync replaces them if the buffer overflowed); [] on timeout."""
+        if not self.buffer and not self.lagged:
+            self.waiter = self.loop.create_future()
+            try:
+                await asyncio.wait_for(self.waiter, timeout)
+            except asyncio.TimeoutError:
+                return []
+            finally:
+                self.waiter = None
+        if self.lagged:
+            self.lagged = False
+            return [RESYNC]
+        frames, self.buffer = list(self.buffer or ()), None
+        return frames
+
+
+class EventBus:
+    def __init__(self, replay: int = REPLAY):
+        self._lock = threading.Lock()
+        self._topics: Dict[str, Set[Subscriber]] = defaultdict(set)
+        self._recent: deque = deque(maxlen=replay)  # (id, topics, frame)
+        self._last_id = 0
+        self.subscribers = 0
+        self.stats = {"published": 0, "delivered": 0, "resyncs": 0}
+
+    def subscribe(self, topics: Iterable[str], last_event_id: Optional[int] = None) -> Tuple[Subscriber, List[bytes]]:
+        """Register a subscriber on the running loop. Returns it and the frames
+        to send first: missed events after last_event_id, or a resync."""
+        sub = Subscriber(topics, asyncio.get_running_loop())
+        with self._lock:
+            if self.subscribers >= MAX_SUBSCRIBERS:
+                raise OverflowError("too many event subscribers")
+            self.subscribers += 1
+            for topic in sub.topics:
+                self._topics[topic].add(sub)
+            backlog: List[bytes] = []
+            if last_event_id is not None:
+                oldest = self._recent[0][0] if self._recent else self._last_id + 1
+                if last_event_id > self._last_id or last_event_id < oldest - 1:
+                    backlog = [RESYNC]  # server restarted or the gap is no longer held
+                else:
+                    backlog = [frame for event_id, event_topics, frame in self._recent
+                               if event_id > last_event_id and not sub.topics.isdisjoint(event_topics)]
+        return sub, backlog
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        with self._lock:
+            self.subscribers -= 1
+            for topic in sub.topics:
+                subs = self._topics.get(topic)
+                if subs is not None:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._topics[topic]
+
+    def publish(self, topics: Iterable[str], kind: str, data: Dict[str, Any]) -> int:
+        """Queue an event for every subscriber of any of `topics`. Safe from any thread."""
+        topics = tuple(dict.fromkeys(t for t in topics if t))
+        with self._lock:
+            self._last_id += 1
+            event_id = self._last_id
+            frame = _frame(event_id, kind, dict(data, type=kind))
+            self._recent.append((event_id, topics, frame))
+            targets = set()
+            for topic in topics:
+                targets.update(self._topics.get(topic, ()))
+            self.stats["published"] += 1
+            self.stats["delivered"] += len(targets)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for sub in targets:
+            if sub.loop is running:
+                sub.deliver(frame)
+            else:
+                try:
+                    sub.loop.call_soon_threadsafe(sub.deliver, frame)
+                except RuntimeError:
+                    pass  # its loop has closed; the stream's own cleanup unsubscribes it
+        return event_id
+
+    def assignments_committed(self, rows: Iterable[Dict[str, Any]], teacher_id: Optional[str] = None) -> None:
+        """rows: committed assignments (id, student_id, item_id, assigned_at).
+        One event per student, plus a summary for the assigning teacher."""
+        by_student: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for row in rows:
+            by_student[row["student_id"]].append(
+                {"assignment_id": row["id"], "item_id": row["item_id"], "assigned_at": row.get("assigned_at")})
+        for student_id, assignments in by_student.items():
+            self.publish([f"student:{student_id}"], "assignment", {"student_id": student_id, "assignments": assignments})
+        if teacher_id and by_student:
+            items = {a["item_id"] for assignments in by_student.values() for a in assignments}
+            self.publish([f"teacher:{teacher_id}"], "assignment_summary", {
+                "teacher_id": teacher_id,
+                "students": len(by_student),
+                "assignments": sum(len(a) for a in by_student.values()),
+                "item_ids": sorted(items),
+            })
+
+    def responses_committed(self, rows: Iterable[Dict[str, Any]], teacher_id: Optional[str] = None) -> None:
+        """rows: committed responses (id, student_id, item_id, correct, submitted_at); one event per student."""
+        by_student: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for row in rows:
+            by_student[row["student_id"]].append({"response_id": row["id"], "item_id": row["item_id"],
+                                                  "correct": row.get("correct"), "submitted_at": row.get("submitted_at")})
+        for student_id, responses in by_student.items():
+            topics = [f"student:{student_id}", f"teacher:{teacher_id}" if teacher_id else None]
+            self.publish(topics, "response", {"student_id": student_id, "responses": responses})
+
+    def status(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, subscribers=self.subscribers, topics=len(self._topics), last_event_id=self._last_id)
+
+
+BUS = EventBus()
+
+
+def full() -> bool:
+    return BUS.subscribers >= MAX_SUBSCRIBERS
+
+
+async def stream(topics: Iterable[str], last_event_id: Optional[int] = None, max_seconds: Optional[float] = None):
+    """SSE body for one connection: missed events, then events as they come, keepalives while idle.
+    Subscribes on first iteration, so a connection dropped before its body starts holds nothing."""
+    try:
+        sub, backlog = BUS.subscribe(topics, last_event_id)
+    except OverflowError:
+        return
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + (MAX_STREAM_SECONDS if max_seconds is None else max_seconds)
+    try:
+        yield f"retry: {RETRY_MS}\n\n".encode("ascii") + b"".join(backlog)
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            frames = await sub.next_frames(min(KEEPALIVE_SECONDS, remaining))
+            yield b"".join(frames) if frames else KEEPALIVE
+    finally:
+        BUS.unsubscribe(sub)
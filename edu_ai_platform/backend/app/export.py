@@ -0,0 +1,166 @@
+"""
+Streaming assignment export for /teacher/export_assignments.
+Rows are read in keyset batches with student and lesson enrichment done by SQL
+joins, and encoded chunk by chunk so memory stays flat regardless of table
+size. Unfiltered exports walk assignment.id; student and class exports walk
+(student_id, id) on ix_assignment_student_id, so each batch is an index range
+and no batch re-sorts the rows before it.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, time
+from typing import Iterator, Optional
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+
+from .database import get_session, iter_batches as keyset_batches, keyset_page
+from .models import Assignment, Lesson, Student
+
+EXPORT_COLUMNS = ["student_id", "student_name", "item_id", "subject", "source", "assigned_at"]
+BATCH_SIZE = 5000
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def parse_bound(value: Optional[str], end: bool = False) -> Optional[str]:
+    """Normalize a since/until query value to the isoformat stored in assigned_at.
+    With end=True a bare date (2026-03-01) means the end of that day, so an
+    inclusive `until` keeps the day's rows. Raises ValueError for unparseable input."""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end and "T" not in value and " " not in value.strip():
+        parsed = datetime.combine(parsed.date(), time.max)
+    return parsed.isoformat()
+
+
+def export_statement(student_id=None, class_id=None, since=None, until=None, from_student=None):
+    # item_id is not unique in lesson; join the newest row per item so each
+    # assignment is exported exactly once (same "last wins" as the old dict).
+    lesson_alias = aliased(Lesson)
+    newest_lesson = select(func.max(lesson_alias.id)).where(lesson_alias.item_id == Assignment.item_id).scalar_subquery()
+    stmt = (
+        select(Assignment.id, Assignment.student_id, Student.name, Assignment.item_id, Lesson.subject, Lesson.source, Assignment.assigned_at)
+        .select_from(Assignment)
+        .outerjoin(Student, Student.student_id == Assignment.student_id)
+        .outerjoin(Lesson, Lesson.id == newest_lesson)
+    )
+    if student_id:
+        stmt = stmt.where(Assignment.student_id == student_id)
+    if class_id is not None:
+        # an IN list is walked in student_id order, so batches need no sort
+        roster = select(Student.student_id).where(Student.class_id == class_id)
+        if from_student is not None:
+            roster = roster.where(Student.student_id >= from_student)
+        stmt = stmt.where(Assignment.student_id.in_(roster))
+    if since:
+        stmt = stmt.where(Assignment.assigned_at >= since)
+    if until:
+        stmt = stmt.where(Assignment.assigned_at <= until)
+    return stmt
+
+
+def export_batch_statement(after, limit: int, **filters):
+    """One keyset batch of the export (what iter_batches runs per batch).
+    `after` is the last row's id, or for a class export its (student_id, id)."""
+    if filters.get("class_id") is None:
+        return keyset_page(export_statement(**filters), Assignment.id, after or 0, limit)
+    last_student, last_id = after or ("", 0)
+    stmt = export_statement(**filters, from_student=last_student).where(
+        or_(Assignment.student_id > last_student, Assignment.id > last_id))
+    return stmt.order_by(Assignment.student_id, Assignment.id).limit(limit)
+
+
+def iter_batches(batch_size: int = BATCH_SIZE, **filters) -> Iterator[list]:
+    """Yield lists of export rows; each batch uses its own short-lived session."""
+    if filters.get("class_id") is None:
+        for rows in keyset_batches(export_statement(**filters), Assignment.id, batch_size):
+            yield [tuple(r[1:]) for r in rows]
+        return
+    after = None
+    while True:
+        with get_session() as sess:
+            rows = sess.exec(export_batch_statement(after, batch_size, **filters)).all()
+        if not rows:
+            return
+        after = (rows[-1][1], rows[-1][0])
+        yield [tuple(r[1:]) for r in rows]
+        if len(rows) < batch_size:
+            return
+
+
+def _csv_chunks(batches) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in batches:
+        writer.writerows(["" if v is None else v for v in row] for row in batch)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    tail = buf.getvalue()
+    if tail:
+        yield tail.encode("utf-8")
+
+
+def _ndjson_chunks(batches) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in batch).encode("utf-8")
+
+
+def _parquet_chunks(batches) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(c, pa.string()) for c in EXPORT_COLUMNS])
+    sink = io.BytesIO()
+    writer = pq.ParquetWriter(sink, schema)
+
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    # one row group per batch; bytes are flushed as soon as each group is written
+    for batch in batches:
+        columns = list(zip(*batch))
+        writer.write_table(pa.table({c: pa.array(col, type=pa.string()) for c, col in zip(EXPORT_COLUMNS, columns)}, schema=schema))
+        data = drain()
+        if data:
+            yield data
+    writer.close()
+    yield drain()
+
+
+def _gzip_chunks(chunks) -> Iterator[bytes]:
+    comp = zlib.compressobj(wbits=31)  # 31 -> gzip container
+    for chunk in chunks:
+        out = comp.compress(chunk)
+        if out:
+            yield out
+    yield comp.flush()
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def stream_export(fmt: str = "csv", compress: bool = False, batch_size: int = BATCH_SIZE, **filters) -> Iterator[bytes]:
+    batches = iter_batches(batch_size, **filters)
+    if fmt == "parquet":
+        # parquet pages carry their own compression
+        return _parquet_chunks(batches)
+    chunks = _ndjson_chunks(batches) if fmt == "ndjson" else _csv_chunks(batches)
+    return _gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,237 @@
+"""
+Incremental item-bank ingestion into the Lesson table.
+
+Banks live under item_banks/<source>/ as JSON arrays (*.json) or NDJSON
+(*.ndjson / *.jsonl), for any grade. Files are read as streams (an array is
+decoded one element at a time), every item gets a sha256 content hash, and
+items are upserted in batches keyed by (source, item_id): new items are
+inserted, items whose hash changed are updated, and unchanged items cost
+only the hash comparison. Banks are processed in parallel worker processes;
+each returns a report of added / updated / unchanged / invalid counts.
+Workers are spawned rather than forked, so a pool started inside a running
+server never inherits its threads, locks or pooled connections.
+
+CLI: python scripts/ingest_item_banks.py [--workers N] [paths...]
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+
+from .database import get_session, in_chunks
+from .models import Lesson
+
+ITEM_BANK_ROOT = Path(__file__).resolve().parents[2] / "item_banks"
+BANK_PATTERNS = ("*/*.json", "*/*.ndjson", "*/*.jsonl")
+# INGEST_ON_STARTUP=0 skips the startup pass (run the CLI instead)
+INGEST_ON_STARTUP = os.environ.get("INGEST_ON_STARTUP", "1") != "0"
+BATCH_SIZE = 1000
+READ_CHUNK = 1 << 16
+MAX_ERRORS = 20
+_GRADE = re.compile(r"grade[_-]?(\d+)", re.IGNORECASE)
+
+
+def bank_files(root: Path = ITEM_BANK_ROOT) -> List[Path]:
+    return sorted({p for pattern in BANK_PATTERNS for p in root.glob(pattern)})
+
+
+def _iter_array(f) -> Iterator[Any]:
+    """Decode the elements of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf = f.read(READ_CHUNK).lstrip()
+    if not buf.startswith("["):
+        raise ValueError("expected a JSON array")
+    buf, pos, eof = buf[1:], 0, False
+    while True:
+        # skip separators between elements
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            chunk = f.read(READ_CHUNK)
+            buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+        if pos >= len(buf):
+            raise ValueError("unterminated JSON array")
+        if buf[pos] == "]":
+            return
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = f.read(READ_CHUNK)
+            buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+            continue
+        if end == len(buf) and not eof:
+            # a number may continue in the next chunk
+            chunk = f.read(READ_CHUNK)
+            if chunk:
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+            eof = True
+        yield value
+        pos = end
+
+
+def iter_items(path: Path, errors: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+    """Yield item dicts from a JSON-array or NDJSON bank; bad lines go to `errors`."""
+    with path.open("r", encoding="utf-8") as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        f.seek(0)
+        if head == "[":
+            for item in _iter_array(f):
+                yield item
+            return
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                if errors is not None:
+                    errors.append(f"{path.name}:{lineno}: {exc.msg}")
+
+
+def iter_bank_items(root: Path = ITEM_BANK_ROOT) -> Iterator[Dict[str, Any]]:
+    """Every valid item dict across all banks (unreadable files are skipped)."""
+    for p in bank_files(root):
+        try:
+            for item in iter_items(p):
+                if isinstance(item, dict) and item.get("item_id"):
+                    yield item
+        except (OSError, ValueError):
+            continue
+
+
+def content_hash(item: Dict[str, Any]) -> str:
+    canonical = json.dumps(item, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _grade(item: Dict[str, Any], path: Path) -> Optional[int]:
+    grade = item.get("grade")
+    if grade is None:
+        m = _GRADE.search(path.stem)
+        grade = m.group(1) if m else None
+    try:
+        return None if grade is None else int(grade)
+    except (TypeError, ValueError):
+        return None
+
+
+def _upsert_batch(source: str, rows: List[Dict[str, Any]], counts: Dict[str, int]) -> None:
+    # last occurrence wins if a bank repeats an item_id
+    unique = list({r["item_id"]: r for r in rows}.values())
+    counts["duplicates"] += len(rows) - len(unique)
+    try:
+        added, updated = _write_batch(source, unique)
+    except IntegrityError:
+        # another worker inserted one of these (source, item_id) keys first; re-diff
+        added, updated = _write_batch(source, unique)
+    counts["added"] += added
+    counts["updated"] += updated
+    counts["unchanged"] += len(unique) - added - updated
+
+
+def _write_batch(source: str, rows: List[Dict[str, Any]]) -> Tuple[int, int]:
+    item_ids = [r["item_id"] for r in rows]
+    with get_session() as sess:
+        existing: Dict[str, Tuple[int, Optional[str]]] = {}
+        for chunk in in_chunks(item_ids):
+            stmt = select(Lesson.item_id, Lesson.id, Lesson.content_hash).where(
+                Lesson.source == source, Lesson.item_id.in_(chunk))
+            existing.update((item_id, (lesson_id, h)) for item_id, lesson_id, h in sess.exec(stmt).all())
+        inserts, updates = [], []
+        now = datetime.utcnow().isoformat()
+        for r in rows:
+            r["updated_at"] = now
+            found = existing.get(r["item_id"])
+            if found is None:
+                inserts.append(r)
+            elif found[1] != r["content_hash"]:
+                updates.append(dict(r, id=found[0]))
+        if inserts:
+            sess.execute(insert(Lesson), inserts)
+        if updates:
+            sess.execute(update(Lesson), updates)
+        sess.commit()
+    return len(inserts), len(updates)
+
+
+def ingest_bank(path: Path, source: Optional[str] = None, batch_size: int = BATCH_SIZE) -> Dict[str, Any]:
+    """Stream one bank file into Lesson; returns its report."""
+    path = Path(path)
+    source = source or path.parent.name
+    started = time.perf_counter()
+    counts = {"added": 0, "updated": 0, "unchanged": 0, "invalid": 0, "duplicates": 0}
+    errors: List[str] = []
+    parse_errors: List[str] = []
+    batch: List[Dict[str, Any]] = []
+    try:
+        for n, item in enumerate(iter_items(path, parse_errors)):
+            if not isinstance(item, dict) or not item.get("item_id"):
+                counts["invalid"] += 1
+                errors.append(f"{path.name}: item {n}: missing item_id")
+                continue
+            batch.append({
+                "item_id": str(item["item_id"]),
+                "subject": item.get("subject"),
+                "prompt": item.get("prompt"),
+                "source": source,
+                "grade": _grade(item, path),
+                "options": json.dumps(item["options"], ensure_ascii=False) if isinstance(item.get("options"), list) else None,
+                "content_hash": content_hash(item),
+            })
+            if len(batch) >= batch_size:
+                _upsert_batch(source, batch, counts)
+                batch = []
+        if batch:
+            _upsert_batch(source, batch, counts)
+    except (OSError, ValueError) as exc:
+        errors.append(f"{path.name}: {exc}")
+    counts["invalid"] += len(parse_errors)
+    errors = parse_errors + errors
+    elapsed = time.perf_counter() - started
+    total = counts["added"] + counts["updated"] + counts["unchanged"]
+    return {
+        "path": str(path),
+        "source": source,
+        **counts,
+        "errors": errors[:MAX_ERRORS],
+        "elapsed_ms": round(elapsed * 1000, 3),
+        "items_per_sec": round(total / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def ingest_banks(paths: Optional[List[Path]] = None, workers: Optional[int] = None) -> Dict[str, Any]:
+    """Ingest every bank (in parallel processes when there is more than one) and summarize."""
+    paths = [Path(p) for p in paths] if paths else bank_files()
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+    started = time.perf_counter()
+    if workers <= 1 or len(paths) <= 1:
+        banks = [ingest_bank(p) for p in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            banks = list(pool.map(ingest_bank, paths))
+    totals = {k: sum(b[k] for b in banks) for k in ("added", "updated", "unchanged", "invalid")}
+    elapsed = time.perf_counter() - started
+    return {
+        "banks": banks,
+        **totals,
+        "changed": totals["added"] + totals["updated"] > 0,
+        "workers": max(1, min(workers, len(paths))),
+        "elapsed_ms": round(elapsed * 1000, 3),
+    }
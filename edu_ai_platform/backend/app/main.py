@@ -3,22 +3,42 @@ Main FastAPI app with authentication and RBAC endpoints.
 """
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from .auth import authenticate_user, create_access_token, create_refresh_token, verify_refresh_token, revoke_refresh_token, Token, TokenWithRefresh, get_current_user, require_role, User
+from .auth import STREAM_TICKET_SECONDS, TOKEN_CACHE, authenticate_user, create_access_token, create_refresh_token, create_stream_ticket, verify_stream_ticket, verify_refresh_token, revoke_refresh_token, Token, TokenWithRefresh, get_current_user, require_role, User
 from pathlib import Path
 import json
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, StreamingResponse
 from fastapi import Request
-from .auth_log import record_event, recent_events
-from .database import init_db, get_session
+from .auth_log import flush as flush_auth_log, parse_time as parse_log_time, query_events, record_event, stats as auth_log_stats
+from .assignments import BulkAssignRequest, bulk_assign, resolve_cohort, teacher_roster
+from .events import BUS as EVENTS, full as events_full, stream as event_stream
+from .export import FORMATS as EXPORT_FORMATS, parse_bound, parquet_available, stream_export
+from .database import ensure_schema, get_session, run_db, run_write
+from .pagination import clamp_limit, decode_cursor, fetch_page, parse_fields
+from .catalog import CATALOG, etag_matches
+from .search import INDEX as LESSON_SEARCH
+from .ingest import INGEST_ON_STARTUP, bank_files, ingest_banks, iter_items
+from .analytics import CUBE as ANALYTICS, start_reloader as start_analytics_reloader
+from .ability import MODEL as ABILITY, seen_items, start_refitter as start_ability_refitter
+from .progress import record_responses, student_progress as load_progress
+from .responses import MAX_BATCH as MAX_RESPONSE_BATCH, MAX_BATCH_BYTES as MAX_RESPONSE_BATCH_BYTES, ingest_batch, parse_batch
+from .scoring import KEYS as ANSWER_KEYS, iter_bank_items, rescore, score_response
+from .token_store import flush as flush_refresh_tokens, stats as refresh_token_stats
+from .ratelimit import STATS as RATE_LIMIT_STATS, RateLimitMiddleware
+from . import metrics
+from .revocation import warm_from_db as warm_revocations, start_sweeper as start_revocation_sweeper
 from .models import Student, Lesson
 from .models import Assignment, StudentResponse, Classroom
 from sqlmodel import select
-from fastapi import Response, Request
+from fastapi import Response, Request, Query
+from pydantic import ValidationError
+from typing import List, Optional
 import os
 from .models import Assignment, StudentResponse
 from datetime import datetime
+import time
+from starlette.concurrency import run_in_threadpool
 
 # load sample students from backend/data/students.json if present
 DATA_ROOT = Path(__file__).resolve().parents[1] / "data"
@@ -35,47 +55,71 @@ def load_students():
     ]
 
 def load_lessons():
-    root = Path(__file__).resolve().parents[2]
     lessons = []
-    for p in root.glob("item_banks/*/grade4_items.json"):
+    for p in bank_files():
         try:
-            with p.open("r", encoding="utf-8") as f:
-                items = json.load(f)
-            for it in items:
-                lessons.append({
-                    "item_id": it.get("item_id"),
-                    "subject": it.get("subject"),
-                    "prompt": it.get("prompt"),
-                    "source": p.parent.name,
-                })
-        except Exception:
+            for it in iter_items(p):
+                if isinstance(it, dict) and it.get("item_id"):
+                    lessons.append({
+                        "item_id": it.get("item_id"),
+                        "subject": it.get("subject"),
+                        "prompt": it.get("prompt"),
+                        "source": p.parent.name,
+                    })
+        except (OSError, ValueError):
             continue
     return lessons
 
 app = FastAPI()
 
 
-@app.middleware("http")
-async def auth_logging_middleware(request: Request, call_next):
-    # capture auth header for debugging (don't log secrets in production)
-    auth_hdr = request.headers.get('authorization')
-    resp = await call_next(request)
-    if resp.status_code in (401, 403):
-        try:
-            record_event({
-                'path': str(request.url.path),
-                'method': request.method,
-                'status': resp.status_code,
-                'auth_header_present': bool(auth_hdr),
-            })
-        except Exception:
-            pass
-    return resp
+class AuthLoggingMiddleware:
+    """Record 401/403 responses in the auth event log.
+    Plain ASGI rather than @app.middleware("http"), which wraps every response
+    body in an extra task and stream -- a real cost for long-lived /events streams.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def watch(message):
+            if message["type"] == "http.response.start" and message["status"] in (401, 403):
+                try:
+                    record_event({
+                        'path': scope["path"],
+                        'method': scope["method"],
+                        'status': message["status"],
+                        # capture auth header presence for debugging (don't log secrets in production)
+                        'auth_header_present': any(k == b'authorization' for k, _ in scope["headers"]),
+                    })
+                except Exception:
+                    pass
+            await send(message)
+
+        await self.app(scope, receive, watch)
+
+
+app.add_middleware(AuthLoggingMiddleware)
 
 # initialize DB on startup
 @app.on_event("startup")
 def on_startup():
-    init_db()
+    ensure_schema()
+    # lessons: incremental, content-hashed ingestion of every item bank; runs
+    # before any background thread starts
+    if INGEST_ON_STARTUP:
+        if ingest_banks()["changed"]:
+            CATALOG.invalidate()
+    # refresh-token revocation cache: load revoked jtis, then sweep/re-sync in the background
+    warm_revocations()
+    start_revocation_sweeper()
+    # compile item-bank answer keys for server-side scoring
+    ANSWER_KEYS.load(iter_bank_items())
     # seed DB if empty
     with get_session() as sess:
         stmt = select(Student)
@@ -91,20 +135,20 @@ def on_startup():
         if not sess.exec(stmtc).first():
             sess.add_all([Classroom(name="Class 4A", teacher_id="t1"), Classroom(name="Class 4B")])
             sess.commit()
-        # seed lessons from existing item banks
-        stmt2 = select(Lesson)
-        if not sess.exec(stmt2).first():
-            root = Path(__file__).resolve().parents[2]
-            for p in root.glob("item_banks/*/grade4_items.json"):
-                try:
-                    with p.open("r", encoding="utf-8") as f:
-                        items = json.load(f)
-                    for it in items:
-                        lesson = Lesson(item_id=it.get("item_id"), subject=it.get("subject"), prompt=it.get("prompt"), source=p.parent.name)
-                        sess.add(lesson)
-                    sess.commit()
-                except Exception:
-                    continue
+    # fit item difficulty / student ability in the background, then nightly
+    start_ability_refitter()
+    # class analytics cube: load now, reload every ANALYTICS_RELOAD_SECONDS
+    start_analytics_reloader()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    # write out refresh tokens still queued by the write-behind store
+    flush_refresh_tokens()
+    # and auth events still buffered in memory
+    flush_auth_log(timeout=5.0)
+
+# throttle repeated /token and /token/refresh failures before they reach the handlers
+app.add_middleware(RateLimitMiddleware)
 
 # allow frontend hosted elsewhere to call API during prototyping
 # Use permissive CORS for prototyping but avoid wildcard + credentials simultaneously.
@@ -116,6 +160,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# METRICS=1: per-route latency, SQL time and query counts, served at /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.register_gauges("token_cache", lambda: TOKEN_CACHE.stats())
+metrics.register_gauges("auth_log", auth_log_stats)
+metrics.register_gauges("rate_limit", lambda: dict(RATE_LIMIT_STATS))
+metrics.register_gauges("events", EVENTS.status)
+metrics.register_gauges("refresh_token_writer", refresh_token_stats)
+
 # mount static dashboard files so you can open http://localhost:8000/dashboard/
 root = Path(__file__).resolve().parents[2] / "frontend"
 # Mount teacher dashboard on /dashboard
@@ -214,10 +266,78 @@ def admin_only(user: User = Depends(require_role("admin"))):
 
 
 @app.get('/admin/auth_logs')
-def get_auth_logs(user: User = Depends(require_role("admin")), limit: int = 100):
-    """Return recent auth-related logs (admin only)."""
-    logs = recent_events(limit)
-    return {"count": len(logs), "logs": logs}
+def get_auth_logs(user: User = Depends(require_role("admin")), limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None,
+                  path: Optional[str] = None, status: Optional[int] = None, since: Optional[str] = None, until: Optional[str] = None):
+    """Return recent auth-related logs (admin only), plus the buffered logger's counters.
+    Filters: path, status, since/until (ISO, until exclusive). Pass next_cursor back as cursor= to
+    page further back, including through rotated files.
+    """
+    try:
+        since, until = parse_log_time(since), parse_log_time(until)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since/until must be ISO dates")
+    flush_auth_log(timeout=1.0)
+    try:
+        page = query_events(limit, cursor, path, status, since, until)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"count": len(page["logs"]), **page, "logger": auth_log_stats()}
+
+@app.get('/admin/token_cache')
+def get_token_cache(user: User = Depends(require_role("admin"))):
+    """Hit rate and size of the verified access-token cache (admin only)."""
+    return TOKEN_CACHE.stats()
+
+
+@app.get('/metrics')
+def get_metrics():
+    """Prometheus text exposition of request, SQL and cache metrics (METRICS=1)."""
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled; set METRICS=1")
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get('/admin/profile')
+def admin_profile(user: User = Depends(require_role("admin")),
+                  seconds: float = Query(5.0, gt=0, le=metrics.PROFILE_MAX_SECONDS),
+                  interval_ms: float = Query(5.0, ge=1, le=1000), idle: bool = False,
+                  fmt: str = Query("json", alias="format")):
+    """Sample every thread's stack for `seconds` while traffic runs (admin only).
+    format=json gives the hottest functions plus collapsed stacks; format=collapsed
+    returns just the stacks, ready for flamegraph.pl or speedscope.
+    """
+    if fmt not in ("json", "collapsed"):
+        raise HTTPException(status_code=400, detail="format must be one of json, collapsed")
+    try:
+        result = metrics.profile(seconds, interval_ms / 1000.0, idle=idle)
+    except metrics.ProfilerBusy as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    if fmt == "collapsed":
+        return Response(content=result["collapsed"] + "\n", media_type="text/plain; charset=utf-8")
+    return result
+
+@app.post('/admin/rescore')
+def admin_rescore(payload: Optional[dict] = None, user: User = Depends(require_role("admin"))):
+    """Reload answer keys from the item banks and re-grade stored responses.
+
+    Body (optional): {"item_ids": [...]} to re-grade specific items, or
+    {"all": true} to re-grade everything; by default only items whose key
+    changed on reload are re-graded.
+    """
+    payload = payload or {}
+    changed = ANSWER_KEYS.load(iter_bank_items())
+    if payload.get("all"):
+        item_ids = None
+    elif payload.get("item_ids") is not None:
+        if not isinstance(payload["item_ids"], list):
+            raise HTTPException(status_code=400, detail="item_ids must be a list")
+        item_ids = [str(i) for i in payload["item_ids"]]
+    else:
+        item_ids = changed
+    result = rescore(item_ids)
+    result["keys_changed"] = changed
+    return result
+
 
 @app.get("/teacher-only")
 def teacher_only(user: User = Depends(require_role("teacher"))):
@@ -228,79 +348,108 @@ def student_only(user: User = Depends(require_role("student"))):
     return {"msg": f"Hello, {user.username} (student)"}
 
 
+# fields= names exposed by each list endpoint -> selected column
+STUDENT_FIELDS = {"id": Student.student_id, "name": Student.name, "grade": Student.grade, "class_id": Student.class_id}
+LESSON_FIELDS = {"item_id": Lesson.item_id, "subject": Lesson.subject, "prompt": Lesson.prompt, "source": Lesson.source}
+ASSIGNMENT_FIELDS = {"id": Assignment.id, "item_id": Assignment.item_id, "assigned_at": Assignment.assigned_at}
+RESPONSE_FIELDS = {"id": StudentResponse.id, "item_id": StudentResponse.item_id, "answer": StudentResponse.answer,
+                   "correct": StudentResponse.correct, "submitted_at": StudentResponse.submitted_at}
+
+
+def _page_params(limit, after, fields, columns):
+    try:
+        return clamp_limit(limit), decode_cursor(after), parse_fields(fields, columns)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+async def _list_page(key, model, columns, where, limit, after, fields):
+    limit, after, names = _page_params(limit, after, fields, columns)
+    items, next_cursor = await run_db(lambda sess: fetch_page(sess, model.id, columns, names, where, limit, after))
+    return {key: items, "next_cursor": next_cursor}
+
+
 @app.get("/teacher/students")
-def teacher_students(user: User = Depends(require_role("teacher"))):
-    """Return a list of students for the teacher dashboard (prototype)."""
-    # prefer DB students
-    with get_session() as sess:
-        rows = sess.exec(select(Student)).all()
-        students = [{"id": r.student_id, "name": r.name, "grade": r.grade, "class_id": r.class_id} for r in rows]
-    return {"students": students}
+async def teacher_students(user: User = Depends(require_role("teacher")), limit: Optional[int] = None, after: Optional[str] = None, fields: Optional[str] = None):
+    """Return a page of students for the teacher dashboard (prototype).
+    Paging: limit (default 100, max 1000) and after=<next_cursor>; fields=id,name,... selects columns.
+    """
+    return await _list_page("students", Student, STUDENT_FIELDS, None, limit, after, fields)
 
 
 @app.get("/teacher/lessons")
-def teacher_lessons(user: User = Depends(require_role("teacher"))):
-    """Return a simple flattened lessons list (reads grade4 item banks)."""
-    # prefer DB lessons
-    with get_session() as sess:
-        rows = sess.exec(select(Lesson)).all()
-        lessons = [{"item_id": r.item_id, "subject": r.subject, "prompt": r.prompt, "source": r.source} for r in rows]
-    return {"lessons": lessons}
+async def teacher_lessons(request: Request, user: User = Depends(require_role("teacher")), limit: Optional[int] = None, after: Optional[str] = None, fields: Optional[str] = None,
+                          subject: Optional[str] = None, source: Optional[str] = None):
+    """Return a page of the flattened lessons list (seeded from the item banks).
+    Served from the versioned catalog cache; optional subject/source filters, ETag/If-None-Match -> 304.
+    """
+    limit, after, names = _page_params(limit, after, fields, LESSON_FIELDS)
+    body, etag = await run_in_threadpool(CATALOG.page, names, limit, after, subject, source)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/teacher/lessons/search")
+async def teacher_lessons_search(q: str, user: User = Depends(require_role("teacher")), limit: int = Query(20, ge=1, le=100), subject: Optional[str] = None):
+    """Full-text lesson search over prompt, subject and options (prefix and one-typo matching).
+    Every query word must match; results are ranked by match quality. limit defaults to 20 (max 100).
+    """
+    await run_in_threadpool(LESSON_SEARCH.maybe_sync)
+    started = time.perf_counter()
+    result = LESSON_SEARCH.search(q, limit, subject)
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return {"query": q, **result}
 
 
 @app.post("/teacher/assign")
-def teacher_assign(payload: dict, user: User = Depends(require_role("teacher"))):
+async def teacher_assign(payload: dict, user: User = Depends(require_role("teacher"))):
     """Assign a lesson item to a student. Payload: {student_id, item_id}"""
     student_id = payload.get("student_id")
     item_id = payload.get("item_id")
     if not student_id or not item_id:
         raise HTTPException(status_code=400, detail="student_id and item_id required")
-    from .models import Assignment
-    with get_session() as sess:
-        assign = Assignment(student_id=student_id, item_id=item_id, assigned_at=datetime.utcnow().isoformat())
+    assigned_at = datetime.utcnow().isoformat()
+    def write(sess):
+        assign = Assignment(student_id=student_id, item_id=item_id, assigned_at=assigned_at)
         sess.add(assign)
         sess.commit()
         sess.refresh(assign)
-    return {"status": "ok", "assignment_id": assign.id}
+        return assign.id
+    assignment_id = await run_write(write)
+    stored = [{"id": assignment_id, "student_id": student_id, "item_id": item_id, "assigned_at": assigned_at}]
+    ANALYTICS.observe_assignments(stored)
+    EVENTS.assignments_committed(stored, user.teacher_id)
+    return {"status": "ok", "assignment_id": assignment_id}
 
 
 @app.post("/teacher/assign_bulk")
-def teacher_assign_bulk(payload: dict, user: User = Depends(require_role("teacher"))):
-    """Assign an item to multiple students. Payload: {student_ids: [...], item_id, all: bool}
-    If all=true, assign to all students in DB.
+async def teacher_assign_bulk(payload: dict, user: User = Depends(require_role("teacher"))):
+    """Assign items to multiple students. Payload: {student_ids: [...], item_id | item_ids: [...], all: bool, class_id, dedupe: bool}
+    If all=true, assign to all students in DB. Every item is assigned to every student;
+    pairs that are already assigned are skipped unless dedupe=false.
     """
-    student_ids = payload.get("student_ids") or []
-    item_id = payload.get("item_id")
-    all_flag = payload.get("all", False)
-    if not item_id:
-        raise HTTPException(status_code=400, detail="item_id required")
-    class_id = payload.get("class_id")
-    with get_session() as sess:
-        if all_flag:
-            students = sess.exec(select(Student)).all()
-            student_ids = [s.student_id for s in students]
-        elif class_id:
-            students = sess.exec(select(Student).where(Student.class_id == int(class_id))).all()
-            student_ids = [s.student_id for s in students]
-        assigned = []
-        for sid in student_ids:
-            a = Assignment(student_id=sid, item_id=item_id, assigned_at=datetime.utcnow().isoformat())
-            sess.add(a)
-            sess.commit()
-            sess.refresh(a)
-            assigned.append(a.id)
-    return {"status": "ok", "assigned_ids": assigned}
+    try:
+        req = BulkAssignRequest.model_validate(payload)
+    except ValidationError as exc:
+        raise HTTPException(status_code=400, detail=exc.errors(include_url=False, include_context=False))
+    item_ids = req.items()
+    if not item_ids:
+        raise HTTPException(status_code=400, detail="item_id or item_ids required")
+    def write(sess):
+        student_ids = resolve_cohort(sess, req.student_ids, req.all, req.class_id)
+        return bulk_assign(sess, student_ids, item_ids, dedupe=req.dedupe, teacher_id=user.teacher_id)
+    return {"status": "ok", **(await run_write(write))}
 
 
 @app.get("/teacher/student/{student_id}/assignments")
-def teacher_student_assignments(student_id: str, user: User = Depends(require_role("teacher"))):
-    with get_session() as sess:
-        rows = sess.exec(select(Assignment).where(Assignment.student_id == student_id)).all()
-    return {"assignments": [ {"id": r.id, "item_id": r.item_id, "assigned_at": r.assigned_at} for r in rows ] }
+async def teacher_student_assignments(student_id: str, user: User = Depends(require_role("teacher")), limit: Optional[int] = None, after: Optional[str] = None, fields: Optional[str] = None):
+    return await _list_page("assignments", Assignment, ASSIGNMENT_FIELDS, Assignment.student_id == student_id, limit, after, fields)
 
 
 @app.post("/students/{student_id}/responses")
-def post_student_response(student_id: str, payload: dict, user: User = Depends(get_current_user)):
+async def post_student_response(student_id: str, payload: dict, user: User = Depends(get_current_user)):
     # allow teacher to record responses for any student, or allow a student to record their own responses
     if not (user.role == "teacher" or (user.role == "student" and user.student_id == student_id)):
         raise HTTPException(status_code=403, detail="Insufficient permissions")
@@ -309,84 +458,195 @@ def post_student_response(student_id: str, payload: dict, user: User = Depends(g
     correct = payload.get("correct")
     if not item_id:
         raise HTTPException(status_code=400, detail="item_id required")
-    with get_session() as sess:
-        resp = StudentResponse(student_id=student_id, item_id=item_id, answer=answer, correct=bool(correct), submitted_at=datetime.utcnow().isoformat())
+    # the answer key decides; the client's flag only counts for items without one
+    correct = score_response(item_id, answer, correct)
+    submitted_at = datetime.utcnow().isoformat()
+    def write(sess):
+        resp = StudentResponse(student_id=student_id, item_id=item_id, answer=answer, correct=correct, submitted_at=submitted_at)
         sess.add(resp)
+        record_responses(sess, [{"student_id": student_id, "item_id": item_id, "correct": correct, "submitted_at": submitted_at}])
         sess.commit()
         sess.refresh(resp)
-    return {"status":"ok", "response_id": resp.id}
+        return resp.id
+    response_id = await run_write(write)
+    stored = [{"id": response_id, "student_id": student_id, "item_id": item_id, "correct": correct, "submitted_at": submitted_at}]
+    ABILITY.observe(stored)
+    ANALYTICS.observe_responses(stored)
+    EVENTS.responses_committed(stored, user.teacher_id)
+    return {"status":"ok", "response_id": response_id, "correct": correct}
+
+
+async def _read_body(request: Request, limit: int) -> bytes:
+    """The request body, refused with 413 as soon as it is known to exceed `limit` bytes."""
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > limit:
+        raise HTTPException(status_code=413, detail=f"request body limited to {limit} bytes")
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(status_code=413, detail=f"request body limited to {limit} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+@app.post("/students/responses:batch")
+async def post_student_responses_batch(request: Request, user: User = Depends(get_current_user)):
+    """Ingest many responses in one transaction (offline sync).
+    Body: JSON array (or {"responses": [...]}) or NDJSON of
+    {student_id, item_id, answer, correct, submitted_at, response_id (client UUID)}.
+    Re-sending a response_id is reported as a duplicate instead of stored twice.
+    """
+    try:
+        rows = parse_batch(await _read_body(request, MAX_RESPONSE_BATCH_BYTES), request.headers.get("content-type"))
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if len(rows) > MAX_RESPONSE_BATCH:
+        raise HTTPException(status_code=413, detail=f"batch limited to {MAX_RESPONSE_BATCH} responses")
+    result = await run_write(lambda sess: ingest_batch(sess, user, rows))
+    return {"status": "ok", **result}
+
+
+MAX_WATCHED_STUDENTS = 100
+
+
+@app.post("/events/ticket")
+async def events_ticket(user: User = Depends(get_current_user)):
+    """Short-lived ticket for opening /events: EventSource cannot set headers, and an access
+    token in the URL would end up in proxy and browser logs. The ticket only opens /events.
+    """
+    return {"ticket": create_stream_ticket(user), "expires_in": STREAM_TICKET_SECONDS}
+
+
+@app.get("/events")
+async def events(request: Request, ticket: Optional[str] = None, student_id: List[str] = Query([]),
+                 last_event_id: Optional[str] = None):
+    """Server-sent events for the dashboards: `assignment` and `response` events as they commit.
+    Students receive their own; teachers receive their own actions, their classes' students and
+    any student_id= they list (max 100). Authenticate with a Bearer header or with ?ticket= from
+    POST /events/ticket; access tokens are refused in the query string. A client reopening the
+    stream with a new ticket passes ?last_event_id= (EventSource only sends the Last-Event-ID
+    header on its own reconnects). A `resync` event means events were dropped: reload over REST.
+    """
+    if "token" in request.query_params:
+        raise HTTPException(status_code=401, detail="Access tokens are not accepted in the URL; use POST /events/ticket")
+    header = request.headers.get("authorization", "")
+    bearer = header[7:] if header[:7].lower() == "bearer " else None
+    if bearer:
+        user = await get_current_user(bearer)
+    elif ticket:
+        user = verify_stream_ticket(ticket)
+    else:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    if len(student_id) > MAX_WATCHED_STUDENTS:
+        raise HTTPException(status_code=400, detail=f"at most {MAX_WATCHED_STUDENTS} student_id values")
+    if user.role == "student":
+        if any(sid != user.student_id for sid in student_id):
+            raise HTTPException(status_code=403, detail="Insufficient permissions")
+        topics = [f"student:{user.student_id}"]
+    elif user.role == "teacher":
+        roster = await run_db(lambda sess: teacher_roster(sess, user.teacher_id)) if user.teacher_id else []
+        topics = [f"teacher:{user.teacher_id}"] + [f"student:{sid}" for sid in roster + student_id]
+    else:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    if events_full():
+        raise HTTPException(status_code=503, detail="Too many event streams")
+    last_event_id = request.headers.get("last-event-id") or last_event_id
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    return StreamingResponse(event_stream(topics, last_event_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get('/admin/events')
+def get_events_status(user: User = Depends(require_role("admin"))):
+    """Subscriber count and publish/delivery counters of the /events bus (admin only)."""
+    return EVENTS.status()
 
 
 @app.get('/students/{student_id}/assignments')
-def students_assignments(student_id: str, user: User = Depends(get_current_user)):
+async def students_assignments(student_id: str, user: User = Depends(get_current_user), limit: Optional[int] = None, after: Optional[str] = None, fields: Optional[str] = None):
     # allow teacher to view any student's assignments, or a student to view their own
     if not (user.role == 'teacher' or (user.role == 'student' and user.student_id == student_id)):
         raise HTTPException(status_code=403, detail='Insufficient permissions')
-    with get_session() as sess:
-        rows = sess.exec(select(Assignment).where(Assignment.student_id == student_id)).all()
-    return {"assignments": [ {"id": r.id, "item_id": r.item_id, "assigned_at": r.assigned_at} for r in rows ] }
+    return await _list_page("assignments", Assignment, ASSIGNMENT_FIELDS, Assignment.student_id == student_id, limit, after, fields)
 
 
 @app.get("/students/{student_id}/responses")
-def get_student_responses(student_id: str, user: User = Depends(require_role("teacher"))):
-    with get_session() as sess:
-        rows = sess.exec(select(StudentResponse).where(StudentResponse.student_id == student_id)).all()
-    return {"responses": [ {"id": r.id, "item_id": r.item_id, "answer": r.answer, "correct": r.correct, "submitted_at": r.submitted_at} for r in rows ] }
+async def get_student_responses(student_id: str, user: User = Depends(require_role("teacher")), limit: Optional[int] = None, after: Optional[str] = None, fields: Optional[str] = None):
+    return await _list_page("responses", StudentResponse, RESPONSE_FIELDS, StudentResponse.student_id == student_id, limit, after, fields)
 
 
 @app.get("/teacher/export_assignments")
-def export_assignments(user: User = Depends(require_role("teacher"))):
-    """Export all assignments as CSV (download)."""
-    import csv
-    from io import StringIO
-    from .models import Assignment
-    # optional filters: student_id, class_id, since, until
-    from fastapi import Query
-    import datetime as _dt
-
-    def _parse_date(s):
-        try:
-            return _dt.datetime.fromisoformat(s)
-        except Exception:
-            return None
-
-    # read possible query params
-    # note: FastAPI Query cannot be used directly here (we're in normal function)
-    from fastapi import Request
-    # get request object from context
-    # simple approach: use global environ via Starlette request: uvicorn passes Request via dependency normally
-    # fallback: export without filters
-    with get_session() as sess:
-        rows = sess.exec(select(Assignment)).all()
-        student_map = {s.student_id: s.name for s in sess.exec(select(Student)).all()}
-        lesson_map = {l.item_id: (l.subject, l.source) for l in sess.exec(select(Lesson)).all()}
-
-    buf = StringIO()
-    writer = csv.writer(buf)
-    writer.writerow(["student_id", "student_name", "item_id", "subject", "source", "assigned_at"])
-    for r in rows:
-        name = student_map.get(r.student_id, "")
-        subject, source = lesson_map.get(r.item_id, ("", ""))
-        writer.writerow([r.student_id, name, r.item_id, subject, source, r.assigned_at])
-
-    return Response(content=buf.getvalue(), media_type="text/csv")
+def export_assignments(
+    user: User = Depends(require_role("teacher")),
+    student_id: Optional[str] = None,
+    class_id: Optional[int] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    fmt: str = Query("csv", alias="format"),
+    compress: bool = Query(False, alias="gzip"),
+):
+    """Stream assignments as CSV (default), NDJSON or Parquet (download).
+    Optional filters: student_id, class_id, since/until (ISO dates, inclusive on assigned_at;
+    a date-only until covers that whole day). Class exports are ordered by student, then id.
+    gzip=true wraps CSV/NDJSON output in a gzip file.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    if fmt == "parquet" and not parquet_available():
+        raise HTTPException(status_code=400, detail="parquet export requires pyarrow")
+    try:
+        since, until = parse_bound(since), parse_bound(until, end=True)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since/until must be ISO dates")
+    media_type, ext = EXPORT_FORMATS[fmt]
+    if compress and fmt != "parquet":
+        media_type, ext = "application/gzip", ext + ".gz"
+    body = stream_export(fmt, compress, student_id=student_id, class_id=class_id, since=since, until=until)
+    headers = {"Content-Disposition": f'attachment; filename="assignments.{ext}"'}
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+
+@app.get("/students/{student_id}/next_item")
+async def student_next_item(student_id: str, user: User = Depends(get_current_user), subject: Optional[str] = None):
+    """Adaptive pick: the unassigned, unanswered lesson with the most Rasch information for this student."""
+    if not (user.role == "teacher" or (user.role == "student" and user.student_id == student_id)):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    if ABILITY.fitted_at is None:
+        await run_in_threadpool(ABILITY.ensure_fitted)
+    else:
+        await run_in_threadpool(ABILITY.maybe_sync_lessons)
+    exclude = await run_db(lambda sess: seen_items(sess, student_id))
+    started = time.perf_counter()
+    pick = ABILITY.next_item(student_id, exclude, subject)
+    elapsed_us = round((time.perf_counter() - started) * 1e6, 1)
+    if pick is None:
+        raise HTTPException(status_code=404, detail="No unassigned lessons left")
+    return {"student_id": student_id, **pick, "selection_us": elapsed_us}
+
+
+@app.post("/admin/ability/refit")
+def admin_ability_refit(user: User = Depends(require_role("admin"))):
+    """Full Rasch refit from stored responses (what the nightly refit runs)."""
+    return ABILITY.refit()
+
+
+@app.get("/teacher/classes/{class_id}/analytics")
+async def class_analytics(class_id: int, user: User = Depends(require_role("teacher")), items: int = Query(20, ge=0, le=500)):
+    """Accuracy by subject, hardest items and assignment completion for a class."""
+    if await run_db(lambda sess: sess.get(Classroom, class_id)) is None:
+        raise HTTPException(status_code=404, detail="Class not found")
+    if ANALYTICS.loaded_at is None:
+        await run_in_threadpool(ANALYTICS.ensure_loaded)
+    started = time.perf_counter()
+    summary = ANALYTICS.class_summary(class_id, items)
+    summary["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return summary
 
 
 @app.get("/students/{student_id}/progress")
-def student_progress(student_id: str, user: User = Depends(get_current_user)):
-    """Prototype student progress endpoint. Teachers can view any student's progress."""
+async def student_progress(student_id: str, user: User = Depends(get_current_user)):
+    """Per-subject mastery from the SubjectProgress summaries. Teachers can view any student's progress."""
     if user.role != "teacher":
         raise HTTPException(status_code=403, detail="Insufficient permissions")
-    # mock progress data
-    progress = {
-        "student_id": student_id,
-        "skill_scores": {
-            "numeracy": 0.56,
-            "literacy": 0.62
-        },
-        "recent_responses": [
-            {"item_id": "g4-num-001", "correct": True},
-            {"item_id": "g4-lit-002", "correct": False}
-        ]
-    }
-    return progress
+    return await run_db(lambda sess: load_progress(sess, student_id))
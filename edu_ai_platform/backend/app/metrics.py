@@ -0,0 +1,313 @@
+"""
+Opt-in request and query instrumentation (METRICS=1).
+
+MetricsMiddleware times each HTTP request under its route template
+(/students/{student_id}/progress, never the concrete path, so label
+cardinality stays bounded). SQLAlchemy cursor events on the engine
+(instrument_engine, attached from database.py) time every statement and
+charge it to the request that ran it: the middleware puts a RequestStats
+in a contextvar, and the run_db / run_write / threadpool threads inherit
+it. Per route that gives latency, DB-time and queries-per-request
+histograms plus the largest query count seen, which is where an N+1 shows
+up: a handler issuing one query per row has a max that grows with the
+data. Instrumented responses also carry a Server-Timing header
+(db;dur=<ms>;desc="<n> queries") for the browser dev tools.
+
+render() writes everything in the Prometheus text format for /metrics,
+including gauges registered by other modules (token cache, auth log, rate
+limiter). profile() is a sampling profiler over all threads for admins to
+run on demand; it costs nothing until called, whether or not METRICS is on.
+"""
+import bisect
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import event
+
+ENABLED = os.environ.get("METRICS", "0") == "1"
+PREFIX = "edu"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+PROFILE_MAX_SECONDS = 60
+# leaf frames in these files are threads waiting, not working
+IDLE_FILES = ("threading.py", "queue.py", "selectors.py")
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str], buckets: Sequence[float]):
+        self.name, self.help, self.labels, self.buckets = name, help, tuple(labels), tuple(buckets)
+        self._lock = threading.Lock()
+        self._series: Dict[tuple, List[float]] = {}  # labels -> [count per bucket..., +Inf, sum]
+
+    def observe(self, value: float, *labels) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def snapshot(self) -> Dict[tuple, List[float]]:
+        with self._lock:
+            return {k: list(v) for k, v in self._series.items()}
+
+    def render(self, out: List[str]) -> None:
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} histogram")
+        for labels, series in sorted(self.snapshot().items()):
+            base = _labels(self.labels, labels)
+            running = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                running += count
+                le = "+Inf" if bound == float("inf") else _num(bound)
+                out.append(f"{self.name}_bucket{_labels(self.labels + ('le',), labels + (le,))} {running}")
+            out.append(f"{self.name}_sum{base} {_num(series[-1])}")
+            out.append(f"{self.name}_count{base} {running}")
+
+
+class Series:
+    """Counter or gauge keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str], kind: str = "counter"):
+        self.name, self.help, self.labels, self.kind = name, help, tuple(labels), kind
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def max(self, value: float, *labels) -> None:
+        with self._lock:
+            if value > self._values.get(labels, float("-inf")):
+                self._values[labels] = value
+
+    def get(self, *labels) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self, out: List[str]) -> None:
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} {self.kind}")
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            out.append(f"{self.name}{_labels(self.labels, labels)} {_num(value)}")
+
+
+REQUEST_SECONDS = Histogram(f"{PREFIX}_http_request_duration_seconds", "Request latency by route.",
+                            ("method", "route"), LATENCY_BUCKETS)
+REQUEST_DB_SECONDS = Histogram(f"{PREFIX}_http_request_db_seconds", "Time spent in SQL per request.",
+                               ("method", "route"), LATENCY_BUCKETS)
+REQUEST_QUERIES = Histogram(f"{PREFIX}_http_request_queries", "SQL statements executed per request.",
+                            ("method", "route"), QUERY_BUCKETS)
+REQUEST_QUERIES_MAX = Series(f"{PREFIX}_http_request_queries_max", "Most SQL statements seen in one request.",
+                             ("method", "route"), kind="gauge")
+REQUESTS = Series(f"{PREFIX}_http_requests_total", "Requests by route and status.", ("method", "route", "status"))
+IN_FLIGHT = Series(f"{PREFIX}_http_requests_in_flight", "Requests being handled.", (), kind="gauge")
+QUERY_SECONDS = Histogram(f"{PREFIX}_db_query_duration_seconds", "SQL statement latency.",
+                          ("operation", "route"), LATENCY_BUCKETS)
+METRICS = (REQUEST_SECONDS, REQUEST_DB_SECONDS, REQUEST_QUERIES, REQUEST_QUERIES_MAX, REQUESTS, IN_FLIGHT,
+           QUERY_SECONDS)
+
+# name -> callable returning {field: number}; rendered as <PREFIX>_<name>_<field> gauges
+_gauges: Dict[str, Callable[[], dict]] = {}
+
+
+def register_gauges(name: str, fn: Callable[[], dict]) -> None:
+    _gauges[name] = fn
+
+
+def _num(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def _labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{n}="{escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def render() -> str:
+    out: List[str] = []
+    for metric in METRICS:
+        metric.render(out)
+    for name, fn in sorted(_gauges.items()):
+        try:
+            values = fn()
+        except Exception:
+            continue
+        for field, value in sorted(values.items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                metric = f"{PREFIX}_{name}_{field}"
+                out.append(f"# TYPE {metric} gauge")
+                out.append(f"{metric} {_num(value)}")
+    return "\n".join(out) + "\n"
+
+
+# ---- per-request accounting ---------------------------------------------
+
+
+class RequestStats:
+    __slots__ = ("scope", "queries", "db_seconds")
+
+    def __init__(self, scope=None):
+        self.scope = scope
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_current: "contextvars.ContextVar[Optional[RequestStats]]" = contextvars.ContextVar("request_stats", default=None)
+
+
+def current() -> Optional[RequestStats]:
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("metrics_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+    operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "other"
+    QUERY_SECONDS.observe(elapsed, operation, _route_of(stats.scope) if stats is not None else "-")
+
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get("metrics_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine) -> None:
+    """Attach the statement timers to a sync Engine (idempotent)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+def _route_of(scope) -> str:
+    route = scope.get("route") if scope else None
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency, DB time and query counts."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not ENABLED or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        status = {"code": 500}
+        started = time.perf_counter()
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                timing = f'app;dur={(time.perf_counter() - started) * 1000:.1f}, ' \
+                         f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"'
+                message = dict(message, headers=list(message.get("headers", [])) +
+                               [(b"server-timing", timing.encode("ascii"))])
+            await send(message)
+
+        IN_FLIGHT.inc(amount=1)
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            IN_FLIGHT.inc(amount=-1)
+            _current.reset(token)
+            elapsed = time.perf_counter() - started
+            route, method = _route_of(scope), scope["method"]
+            REQUEST_SECONDS.observe(elapsed, method, route)
+            REQUEST_DB_SECONDS.observe(stats.db_seconds, method, route)
+            REQUEST_QUERIES.observe(stats.queries, method, route)
+            REQUEST_QUERIES_MAX.max(stats.queries, method, route)
+            REQUESTS.inc(method, route, str(status["code"]))
+
+
+# ---- sampling profiler --------------------------------------------------
+
+_profiling = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def profile(seconds: float, interval: float = 0.005, idle: bool = False, limit: int = 30) -> dict:
+    """Sample every thread's stack for `seconds` and aggregate.
+
+    Returns the hottest functions (self = at the top of the stack, total =
+    anywhere on it) and the stacks in collapsed form ("thread;outer;...;leaf
+    count" lines, the input format of flamegraph.pl and speedscope). Threads
+    blocked in threading/queue/selectors waits are left out unless `idle`.
+    Raises ProfilerBusy if another profile is running.
+    """
+    if not _profiling.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running")
+    try:
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = 0
+        deadline = time.monotonic() + min(seconds, PROFILE_MAX_SECONDS)
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if not idle and os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                stacks[tuple(reversed(stack))] += 1
+            samples += 1
+            time.sleep(interval)
+    finally:
+        _profiling.release()
+
+    own: Counter = Counter()
+    total: Counter = Counter()
+    for stack, count in stacks.items():
+        own[stack[-1]] += count
+        for name in set(stack[1:]):
+            total[name] += count
+    hits = sum(stacks.values()) or 1
+    return {
+        "samples": samples,
+        "stack_samples": sum(stacks.values()),
+        "interval_ms": round(interval * 1000, 3),
+        "top": [{"function": name, "self": own[name], "total": total[name],
+                 "self_pct": round(own[name] / hits * 100, 1)} for name, _ in own.most_common(limit)],
+        "collapsed": "\n".join(f"{';'.join(stack)} {count}" for stack, count in stacks.most_common()),
+    }
@@ -1,9 +1,15 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 from typing import Optional
 from datetime import datetime
 
 
+# Index names are shared with alembic/versions; keep them in sync.
 class Student(SQLModel, table=True):
+    __table_args__ = (
+        Index("ux_student_student_id", "student_id", unique=True),
+        Index("ix_student_class_id", "class_id"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     student_id: str
     name: str
@@ -12,14 +18,31 @@ class Student(SQLModel, table=True):
 
 
 class Lesson(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_lesson_item_id", "item_id"),
+        Index("ux_lesson_source_item", "source", "item_id", unique=True),
+        Index("ix_lesson_updated_at", "updated_at"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     item_id: str
     subject: Optional[str] = None
     prompt: Optional[str] = None
     source: Optional[str] = None
+    grade: Optional[int] = None
+    # sha256 of the item's canonical JSON; ingestion skips items whose hash is unchanged
+    content_hash: Optional[str] = None
+    # JSON-encoded answer options from the item bank (searchable)
+    options: Optional[str] = None
+    # set by ingestion on insert/update; the search index syncs from it
+    updated_at: Optional[str] = None
 
 
 class Assignment(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_assignment_student_item", "student_id", "item_id"),
+        # keyset pages and exports per student (student_id = ? AND id > ? ORDER BY id)
+        Index("ix_assignment_student_id", "student_id", "id"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     student_id: str
     item_id: str
@@ -27,12 +50,33 @@ class Assignment(SQLModel, table=True):
 
 
 class StudentResponse(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_studentresponse_student_submitted", "student_id", "submitted_at"),
+        Index("ux_studentresponse_client_id", "client_id", unique=True),
+        Index("ix_studentresponse_item_id", "item_id"),
+        Index("ix_studentresponse_student_id", "student_id", "id"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     student_id: str
     item_id: str
     answer: Optional[str] = None
     correct: Optional[bool] = None
     submitted_at: Optional[str] = None
+    # client-generated UUID; makes batch re-sends idempotent
+    client_id: Optional[str] = None
+
+
+class SubjectProgress(SQLModel, table=True):
+    """Per-(student, subject) response totals, maintained on every response insert."""
+    __table_args__ = (
+        Index("ux_subjectprogress_student_subject", "student_id", "subject", unique=True),
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+    student_id: str
+    subject: str
+    attempts: int = 0
+    correct: int = 0
+    last_submitted_at: Optional[str] = None
 
 
 class Classroom(SQLModel, table=True):
@@ -42,8 +86,16 @@ class Classroom(SQLModel, table=True):
 
 
 class RefreshToken(SQLModel, table=True):
+    __table_args__ = (
+        Index("ux_refreshtoken_token_hash", "token_hash", unique=True),
+        Index("ux_refreshtoken_jti", "jti", unique=True),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     token: str
+    # sha256 hex digest of `token`; lookups go through this unique key
+    token_hash: Optional[str] = None
+    # JWT `jti` claim; revocation checks are keyed by it
+    jti: Optional[str] = None
     username: Optional[str] = None
     created_at: Optional[str] = None
     expires_at: Optional[str] = None
@@ -0,0 +1,66 @@
+"""
+Keyset (cursor) pagination and field projection for the list endpoints.
+Pages are ordered by the table's integer primary key and fetched with
+`id > :after ... LIMIT :limit + 1`, so the cost of a page does not depend on
+table size. Only the requested columns are selected.
+"""
+import base64
+import json
+from typing import Dict, List, Optional, Tuple
+
+from sqlmodel import select
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    """Return the last id seen (0 for no cursor). Raises ValueError on a bad token."""
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))["id"]
+    except Exception:
+        raise ValueError("invalid cursor")
+    if not isinstance(last_id, int):
+        raise ValueError("invalid cursor")
+    return last_id
+
+
+def parse_fields(fields: Optional[str], columns: Dict[str, object]) -> List[str]:
+    """Validate a comma-separated `fields=` value against the endpoint's columns."""
+    if not fields:
+        return list(columns)
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [n for n in names if n not in columns]
+    if unknown or not names:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}; allowed: {', '.join(columns)}")
+    return list(dict.fromkeys(names))
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    if limit is None:
+        return DEFAULT_LIMIT
+    return max(1, min(int(limit), MAX_LIMIT))
+
+
+def fetch_page(sess, key_column, columns: Dict[str, object], names: List[str], where=None,
+               limit: int = DEFAULT_LIMIT, after: int = 0) -> Tuple[List[dict], Optional[str]]:
+    """Fetch one page of `names` (keys of `columns`) ordered by key_column.
+
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    stmt = select(key_column, *(columns[n] for n in names)).where(key_column > after)
+    if where is not None:
+        stmt = stmt.where(where)
+    rows = sess.exec(stmt.order_by(key_column).limit(limit + 1)).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    items = [dict(zip(names, row[1:])) for row in rows]
+    next_cursor = encode_cursor(rows[-1][0]) if more else None
+    return items, next_cursor
@@ -0,0 +1,156 @@
+"""
+Per-subject mastery for /students/{student_id}/progress.
+SubjectProgress holds running (attempts, correct) totals per (student, subject).
+Responses update it in the same transaction that inserts them, with one
+INSERT ... ON CONFLICT DO UPDATE per batch, so reading progress is a single
+indexed lookup. rebuild() recomputes every row from the response table in one
+INSERT ... SELECT ... GROUP BY.
+"""
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy import case, delete, func, insert
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+
+from .database import in_chunks
+from .models import Lesson, StudentResponse, SubjectProgress
+
+RECENT_LIMIT = 10
+
+
+def subject_map(sess, item_ids: Iterable[str]) -> Dict[str, str]:
+    """item_id -> subject, using the newest lesson row per item (same rule as export)."""
+    subjects: Dict[str, str] = {}
+    for chunk in in_chunks(item_ids):
+        stmt = (
+            select(Lesson.item_id, Lesson.subject)
+            .where(Lesson.item_id.in_(chunk), Lesson.subject.is_not(None))
+            .order_by(Lesson.id)
+        )
+        subjects.update(sess.exec(stmt).all())
+    return subjects
+
+
+def _upsert(sess, rows: List[Dict[str, Any]]) -> None:
+    if sess.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    table = SubjectProgress.__table__
+    stmt = dialect_insert(table)
+    last = table.c.last_submitted_at
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["student_id", "subject"],
+        set_={
+            "attempts": table.c.attempts + stmt.excluded.attempts,
+            "correct": table.c.correct + stmt.excluded.correct,
+            "last_submitted_at": case(
+                (last.is_(None), stmt.excluded.last_submitted_at),
+                (stmt.excluded.last_submitted_at > last, stmt.excluded.last_submitted_at),
+                else_=last,
+            ),
+        },
+    )
+    sess.execute(stmt, rows)
+
+
+def record_responses(sess, rows: Iterable[Dict[str, Any]]) -> None:
+    """Fold newly inserted responses (dicts with student_id, item_id, correct,
+    submitted_at) into SubjectProgress. The caller commits."""
+    rows = list(rows)
+    subjects = subject_map(sess, (r["item_id"] for r in rows))
+    totals: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for r in rows:
+        subject = subjects.get(r["item_id"])
+        if subject is None:
+            continue
+        t = totals.setdefault((r["student_id"], subject), {
+            "student_id": r["student_id"], "subject": subject,
+            "attempts": 0, "correct": 0, "last_submitted_at": None,
+        })
+        t["attempts"] += 1
+        t["correct"] += 1 if r.get("correct") else 0
+        if r.get("submitted_at") and (t["last_submitted_at"] is None or r["submitted_at"] > t["last_submitted_at"]):
+            t["last_submitted_at"] = r["submitted_at"]
+    if totals:
+        _upsert(sess, list(totals.values()))
+
+
+def record_corrections(sess, rows: Iterable[Dict[str, Any]]) -> None:
+    """Apply re-graded results (dicts with student_id, item_id, the new
+    `correct` and the `previous` value) to the stored totals. The caller commits."""
+    rows = list(rows)
+    subjects = subject_map(sess, (r["item_id"] for r in rows))
+    deltas: Dict[Tuple[str, str], int] = defaultdict(int)
+    for r in rows:
+        subject = subjects.get(r["item_id"])
+        if subject is not None:
+            deltas[(r["student_id"], subject)] += bool(r["correct"]) - bool(r.get("previous"))
+    for (student_id, subject), delta in deltas.items():
+        if delta:
+            sess.execute(
+                SubjectProgress.__table__.update()
+                .where(SubjectProgress.student_id == student_id, SubjectProgress.subject == subject)
+                .values(correct=SubjectProgress.correct + delta)
+            )
+
+
+def rebuild_statement():
+    """INSERT ... SELECT that recomputes every SubjectProgress row from responses."""
+    lesson_alias = aliased(Lesson)
+    newest_lesson = select(func.max(lesson_alias.id)).where(lesson_alias.item_id == StudentResponse.item_id).scalar_subquery()
+    source = (
+        select(
+            StudentResponse.student_id,
+            Lesson.subject,
+            func.count(),
+            func.coalesce(func.sum(case((StudentResponse.correct == True, 1), else_=0)), 0),  # noqa: E712
+            func.max(StudentResponse.submitted_at),
+        )
+        .select_from(StudentResponse)
+        .join(Lesson, Lesson.id == newest_lesson)
+        .where(Lesson.subject.is_not(None))
+        .group_by(StudentResponse.student_id, Lesson.subject)
+    )
+    return insert(SubjectProgress).from_select(
+        ["student_id", "subject", "attempts", "correct", "last_submitted_at"], source,
+    )
+
+
+def rebuild(sess) -> int:
+    """Replace all summaries with totals recomputed from StudentResponse; commits."""
+    sess.execute(delete(SubjectProgress))
+    sess.execute(rebuild_statement())
+    sess.commit()
+    return sess.exec(select(func.count()).select_from(SubjectProgress)).one()
+
+
+def student_progress(sess, student_id: str) -> Dict[str, Any]:
+    summaries = sess.exec(
+        select(SubjectProgress).where(SubjectProgress.student_id == student_id).order_by(SubjectProgress.subject)
+    ).all()
+    recent = sess.exec(
+        select(StudentResponse.item_id, StudentResponse.correct, StudentResponse.submitted_at)
+        .where(StudentResponse.student_id == student_id)
+        .order_by(StudentResponse.submitted_at.desc())
+        .limit(RECENT_LIMIT)
+    ).all()
+    subjects = {
+        s.subject: {
+            "attempts": s.attempts,
+            "correct": s.correct,
+            "mastery": round(s.correct / s.attempts, 3) if s.attempts else None,
+            "last_submitted_at": s.last_submitted_at,
+        }
+        for s in summaries
+    }
+    return {
+        "student_id": student_id,
+        "skill_scores": {name: v["mastery"] for name, v in subjects.items()},
+        "subjects": subjects,
+        "recent_responses": [
+            {"item_id": item_id, "correct": correct, "submitted_at": submitted_at}
+            for item_id, correct, submitted_at in recent
+        ],
+    }
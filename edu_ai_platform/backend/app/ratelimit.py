@@ -0,0 +1,219 @@
+"""
+Brute-force throttle for /token and /token/refresh.
+
+Failed attempts (400/401 responses) drain token buckets keyed by client IP
+and, for /token, by the submitted username; buckets refill at a steady
+rate. While a bucket is empty the middleware answers 429 with Retry-After
+before the request reaches the endpoint, so a credential-stuffing client
+costs no password check, DB lookup or JWT work. A successful login refills
+that username's bucket. Bodies over MAX_BODY_PARSE are refused with 413, so
+padding a form cannot hide its username from the per-user bucket.
+
+Buckets live in a RateLimitStore. MemoryStore keeps one [tokens, updated]
+pair per key in an LRU capped at RATE_LIMIT_KEYS, so memory is bounded
+however many addresses an attacker rotates through. Multi-worker
+deployments can share state by pointing RATE_LIMIT_STORE at a
+"module:factory" returning another RateLimitStore (e.g. one backed by
+Redis); each worker otherwise limits on its own.
+
+RATE_LIMIT=0 turns the throttle off.
+"""
+import abc
+import importlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs
+
+ENABLED = os.environ.get("RATE_LIMIT", "1") != "0"
+MAX_KEYS = int(os.environ.get("RATE_LIMIT_KEYS", 100_000))
+# take the client address from X-Forwarded-For (only behind a proxy that sets it)
+TRUST_FORWARDED = os.environ.get("RATE_LIMIT_TRUST_FORWARDED", "0") == "1"
+FAILURE_STATUSES = (400, 401)
+LIMITED_PATHS = ("/token", "/token/refresh")
+# login forms are tiny; larger bodies are refused with 413 (and count as a failure for
+# the address) rather than let padding hide the username from its bucket
+MAX_BODY_PARSE = 4096
+
+
+class Rule(NamedTuple):
+    burst: float  # bucket size: failures allowed back to back
+    per_second: float  # refill rate
+
+    @classmethod
+    def from_env(cls, name: str, burst: int, per_minute: float) -> "Rule":
+        return cls(float(os.environ.get(f"RATE_LIMIT_{name}_BURST", burst)),
+                   float(os.environ.get(f"RATE_LIMIT_{name}_PER_MINUTE", per_minute)) / 60.0)
+
+
+IP_RULE = Rule.from_env("IP", 20, 10)
+USER_RULE = Rule.from_env("USER", 5, 2)
+
+
+class RateLimitStore(abc.ABC):
+    """Token-bucket storage. Implementations must be safe to call from many threads."""
+
+    @abc.abstractmethod
+    def retry_after(self, key: str, rule: Rule, now: float) -> float:
+        """Seconds until `key` has a whole token again (0 = not limited)."""
+
+    @abc.abstractmethod
+    def consume(self, key: str, rule: Rule, now: float, cost: float = 1.0) -> None:
+        """Take `cost` tokens from `key`'s bucket (a failed attempt)."""
+
+    @abc.abstractmethod
+    def reset(self, key: str) -> None:
+        """Refill `key`'s bucket (a successful login)."""
+
+
+class MemoryStore(RateLimitStore):
+    def __init__(self, max_keys: int = MAX_KEYS):
+        self._lock = threading.Lock()
+        self._max_keys = max_keys
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()  # key -> [tokens, updated]
+
+    def _level(self, key: str, rule: Rule, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return rule.burst
+        return min(rule.burst, bucket[0] + (now - bucket[1]) * rule.per_second)
+
+    def retry_after(self, key: str, rule: Rule, now: float) -> float:
+        with self._lock:
+            level = self._level(key, rule, now)
+        if level >= 1.0:
+            return 0.0
+        return (1.0 - level) / rule.per_second if rule.per_second > 0 else float("inf")
+
+    def consume(self, key: str, rule: Rule, now: float, cost: float = 1.0) -> None:
+        with self._lock:
+            level = self._level(key, rule, now) - cost
+            self._buckets[key] = [max(level, 0.0), now]
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+def _load_store() -> RateLimitStore:
+    spec = os.environ.get("RATE_LIMIT_STORE")
+    if not spec:
+        return MemoryStore()
+    module, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module), attr)()
+
+
+STORE: RateLimitStore = _load_store()
+STATS = {"limited": 0, "failures": 0}
+
+
+def _client_ip(scope, headers: Dict[bytes, bytes]) -> str:
+    if TRUST_FORWARDED and b"x-forwarded-for" in headers:
+        return headers[b"x-forwarded-for"].split(b",")[0].strip().decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _username(body: bytes, content_type: bytes) -> Optional[str]:
+    if not body:
+        return None
+    try:
+        if content_type.startswith(b"application/json"):
+            value = json.loads(body).get("username")
+        else:
+            value = parse_qs(body.decode("utf-8")).get("username", [None])[0]
+    except (ValueError, AttributeError, UnicodeDecodeError):
+        return None
+    return value.strip().lower() if isinstance(value, str) and value.strip() else None
+
+
+class RateLimitMiddleware:
+    """ASGI middleware enforcing the buckets on LIMITED_PATHS (POST)."""
+
+    def __init__(self, app, store: Optional[RateLimitStore] = None):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if (not ENABLED or scope["type"] != "http" or scope["method"] != "POST"
+                or scope["path"] not in LIMITED_PATHS):
+            await self.app(scope, receive, send)
+            return
+        store = self.store or STORE
+        headers = dict(scope["headers"])
+        ip_key = ("ip:" + _client_ip(scope, headers), IP_RULE)
+        # buffer the (small) body so the username can be read and then replayed
+        messages, body = [], b""
+        declared = headers.get(b"content-length", b"")
+        oversized = declared.isdigit() and int(declared) > MAX_BODY_PARSE
+        while not oversized:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            body += message.get("body", b"")
+            oversized = len(body) > MAX_BODY_PARSE
+            if not message.get("more_body"):
+                break
+        if oversized:
+            STATS["failures"] += 1
+            store.consume(*ip_key, time.time())
+            await _reject(send, 413, "Request body too large")
+            return
+        keys: List[Tuple[str, Rule]] = [ip_key]
+        if scope["path"] == "/token":
+            username = _username(body, headers.get(b"content-type", b""))
+            if username is not None:
+                keys.append(("user:" + username, USER_RULE))
+
+        now = time.time()
+        wait = max(store.retry_after(key, rule, now) for key, rule in keys)
+        if wait > 0:
+            STATS["limited"] += 1
+            retry = str(max(1, int(wait + 0.999))).encode("ascii")
+            await _reject(send, 429, "Too many failed attempts; retry later", [(b"retry-after", retry)])
+            return
+
+        pending = list(messages)
+
+        async def replay():
+            if pending:
+                return pending.pop(0)
+            return await receive()
+
+        status = {}
+
+        async def watch(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        await self.app(scope, replay, watch)
+        code = status.get("code")
+        if code in FAILURE_STATUSES:
+            STATS["failures"] += 1
+            now = time.time()
+            for key, rule in keys:
+                store.consume(key, rule, now)
+        elif code == 200 and len(keys) > 1:
+            store.reset(keys[1][0])
+
+
+async def _reject(send, status: int, detail: str, headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), *(headers or []),
+                    (b"content-length", str(len(body)).encode("ascii"))],
+    })
+    await send({"type": "http.response.body", "body": body})
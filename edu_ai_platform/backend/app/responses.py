@@ -0,0 +1,145 @@
+"""
+Batched response ingestion for offline-synced classrooms.
+A batch holds responses for many students. Permissions are checked once per
+student, rows carrying an already-seen client `response_id` are reported as
+duplicates, and the rest are written with one INSERT ... RETURNING in a
+single transaction (together with the SubjectProgress update).
+"""
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlmodel import select
+
+from .ability import MODEL as ABILITY
+from .analytics import CUBE
+from .database import in_chunks, insert_returning_ids
+from .events import BUS as EVENTS
+from .models import StudentResponse
+from .progress import record_responses
+from .scoring import score_response
+
+MAX_BATCH = 10_000
+# request body cap, checked before parsing: about 1 KB per response
+MAX_BATCH_BYTES = MAX_BATCH * 1024
+
+
+def parse_batch(body: bytes, content_type: Optional[str] = None) -> List[Any]:
+    """Decode a JSON array, {"responses": [...]} or NDJSON body. Raises ValueError."""
+    text = body.decode("utf-8").strip()
+    if not text:
+        return []
+    if "ndjson" not in (content_type or "") and text[0] in "[{":
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            data = None  # a single-line object stream is also valid NDJSON
+        if isinstance(data, dict) and isinstance(data.get("responses"), list):
+            return data["responses"]
+        if isinstance(data, list):
+            return data
+        if data is not None and text[0] == "[":
+            raise ValueError("expected a JSON array of responses")
+    rows = []
+    for lineno, line in enumerate(text.splitlines(), 1):
+        if line.strip():
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                raise ValueError(f"invalid JSON on line {lineno}")
+    return rows
+
+
+def _client_id(value) -> str:
+    # normalize so "ABC..." and "abc..." are the same response
+    return str(uuid.UUID(str(value)))
+
+
+def _submitted_at(value: Any) -> str:
+    """Client timestamp as naive-UTC isoformat, the form of the server's own. Raises ValueError."""
+    # bare dates and numbers would sort as text among full timestamps
+    if not isinstance(value, str) or ("T" not in value and " " not in value.strip()):
+        raise ValueError(value)
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat()
+
+
+def ingest_batch(sess, user, rows: List[Any]) -> Dict[str, Any]:
+    """Validate, dedupe and insert a batch; returns per-row results in input order."""
+    results: List[Dict[str, Any]] = [None] * len(rows)
+    allowed: Dict[str, bool] = {}
+    pending = []  # (index, row dict)
+    seen_client_ids: Dict[str, int] = {}
+    now = datetime.utcnow().isoformat()
+
+    for i, raw in enumerate(rows):
+        if not isinstance(raw, dict) or not raw.get("student_id") or not raw.get("item_id"):
+            results[i] = {"index": i, "status": "invalid", "error": "student_id and item_id required"}
+            continue
+        student_id = str(raw["student_id"])
+        if student_id not in allowed:
+            allowed[student_id] = user.role == "teacher" or (user.role == "student" and user.student_id == student_id)
+        if not allowed[student_id]:
+            results[i] = {"index": i, "status": "forbidden", "error": "Insufficient permissions"}
+            continue
+        try:
+            submitted_at = now if raw.get("submitted_at") in (None, "") else _submitted_at(raw["submitted_at"])
+        except ValueError:
+            results[i] = {"index": i, "status": "invalid", "error": "submitted_at must be an ISO date-time"}
+            continue
+        client_id = None
+        if raw.get("response_id") is not None:
+            try:
+                client_id = _client_id(raw["response_id"])
+            except ValueError:
+                results[i] = {"index": i, "status": "invalid", "error": "response_id must be a UUID"}
+                continue
+            if client_id in seen_client_ids:
+                results[i] = {"index": i, "status": "duplicate", "duplicate_of_index": seen_client_ids[client_id]}
+                continue
+            seen_client_ids[client_id] = i
+        item_id = str(raw["item_id"])
+        answer = None if raw.get("answer") is None else str(raw["answer"])
+        pending.append((i, {
+            "student_id": student_id,
+            "item_id": item_id,
+            "answer": answer,
+            "correct": score_response(item_id, answer, raw.get("correct")),
+            "submitted_at": submitted_at,
+            "client_id": client_id,
+        }))
+
+    # idempotency: anything already stored under the same client id is a duplicate
+    existing: Dict[str, int] = {}
+    for chunk in in_chunks(seen_client_ids):
+        stmt = select(StudentResponse.client_id, StudentResponse.id).where(StudentResponse.client_id.in_(chunk))
+        existing.update(sess.exec(stmt).all())
+    to_insert = []
+    for i, row in pending:
+        if row["client_id"] in existing:
+            results[i] = {"index": i, "status": "duplicate", "response_id": existing[row["client_id"]]}
+        else:
+            to_insert.append((i, row))
+
+    if to_insert:
+        ids = insert_returning_ids(sess, StudentResponse, [row for _, row in to_insert])
+        record_responses(sess, [row for _, row in to_insert])
+        sess.commit()
+        stored = [dict(row, id=new_id) for (_, row), new_id in zip(to_insert, ids)]
+        ABILITY.observe(stored)
+        CUBE.observe_responses(stored)
+        EVENTS.responses_committed(stored, user.teacher_id)
+        for (i, _), new_id in zip(to_insert, ids):
+            results[i] = {"index": i, "status": "created", "response_id": new_id}
+
+    for r in results:
+        if "duplicate_of_index" in r:
+            r["response_id"] = results[r["duplicate_of_index"]].get("response_id")
+
+    counts: Dict[str, int] = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    return {"counts": counts, "results": results}
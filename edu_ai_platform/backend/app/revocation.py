@@ -0,0 +1,159 @@
+"""
+In-process refresh-token revocation cache keyed by the JWT `jti` claim.
+
+A bloom filter holds every revoked jti that has not expired yet, so the common
+case (a token that was never revoked) is answered without touching the DB.
+Bloom hits are confirmed through an LRU of known jti states and, on a miss,
+a single indexed lookup. The cache is warmed from the DB on first use and
+rebuilt by the background sweeper, which also deletes expired rows.
+
+Revocations made by other worker processes become visible at the next
+sweep (REVOCATION_SYNC_SECONDS, default 60s).
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import Integer, cast, delete
+from sqlmodel import select
+
+from .background import start_periodic
+from .database import get_session, write_sync
+from .models import RefreshToken
+
+BLOOM_BITS = 1 << 23  # 1 MiB; ~1% false positives at ~800k revoked tokens
+BLOOM_HASHES = 7
+LRU_SIZE = 100_000
+SYNC_SECONDS = int(os.environ.get("REVOCATION_SYNC_SECONDS", 60))
+RECENT_SECONDS = 300
+
+
+class BloomFilter:
+    def __init__(self, size_bits: int = BLOOM_BITS, hashes: int = BLOOM_HASHES):
+        self.size = size_bits
+        self.hashes = hashes
+        self.bits = bytearray(size_bits // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class RevocationCache:
+    def __init__(self, bloom_bits: int = BLOOM_BITS, lru_size: int = LRU_SIZE):
+        self._lock = threading.Lock()
+        self._bloom_bits = bloom_bits
+        self._lru_size = lru_size
+        self._bloom = BloomFilter(bloom_bits)
+        self._known: "OrderedDict[str, bool]" = OrderedDict()  # jti -> revoked
+        # jti -> revoke time; survives reloads for RECENT_SECONDS so a revocation
+        # whose DB write is still in flight is not lost by reset()
+        self._recent: Dict[str, float] = {}
+        self.warmed = False
+
+    def _remember(self, jti: str, revoked: bool) -> None:
+        self._known[jti] = revoked
+        self._known.move_to_end(jti)
+        if len(self._known) > self._lru_size:
+            self._known.popitem(last=False)
+
+    def revoke(self, jti: str) -> None:
+        with self._lock:
+            self._bloom.add(jti)
+            self._remember(jti, True)
+            self._recent[jti] = time.monotonic()
+
+    def remember(self, jti: str, revoked: bool) -> None:
+        with self._lock:
+            self._remember(jti, revoked)
+
+    def lookup(self, jti: str) -> Optional[bool]:
+        """False: definitely not revoked. True: revoked. None: ask the DB."""
+        with self._lock:
+            if jti not in self._bloom:
+                return False
+            state = self._known.get(jti)
+            if state is not None:
+                self._known.move_to_end(jti)
+            return state
+
+    def reset(self, revoked_jtis: Iterable[str]) -> None:
+        """Replace the cache contents with the revoked jtis read from the DB."""
+        bloom = BloomFilter(self._bloom_bits)
+        known: "OrderedDict[str, bool]" = OrderedDict()
+        for jti in revoked_jtis:
+            bloom.add(jti)
+            known[jti] = True
+            if len(known) > self._lru_size:
+                known.popitem(last=False)
+        with self._lock:
+            cutoff = time.monotonic() - RECENT_SECONDS
+            self._recent = {j: t for j, t in self._recent.items() if t >= cutoff}
+            for jti in self._recent:
+                bloom.add(jti)
+                known[jti] = True
+            self._bloom, self._known, self.warmed = bloom, known, True
+
+
+CACHE = RevocationCache()
+
+
+def _unexpired(now: int):
+    return cast(RefreshToken.expires_at, Integer) >= now
+
+
+def warm_from_db() -> int:
+    """Rebuild the cache from revoked, unexpired rows. Returns the number loaded."""
+    with get_session() as sess:
+        stmt = select(RefreshToken.jti).where(
+            (RefreshToken.revoked == True) & (RefreshToken.jti != None) & _unexpired(int(time.time()))
+        )
+        jtis = sess.exec(stmt).all()
+    CACHE.reset(jtis)
+    return len(jtis)
+
+
+def is_revoked(jti: str) -> bool:
+    if not CACHE.warmed:
+        warm_from_db()
+    state = CACHE.lookup(jti)
+    if state is not None:
+        return state
+    # bloom hit without a cached answer (false positive or evicted): one indexed probe
+    with get_session() as sess:
+        row = sess.exec(select(RefreshToken.revoked).where(RefreshToken.jti == jti)).first()
+    revoked = bool(row)
+    CACHE.remember(jti, revoked)
+    return revoked
+
+
+def sweep_expired(now: Optional[int] = None) -> int:
+    """Delete refresh-token rows past expires_at. Returns the number deleted."""
+    now = int(time.time()) if now is None else now
+    def write(sess):
+        result = sess.execute(delete(RefreshToken).where(cast(RefreshToken.expires_at, Integer) < now))
+        sess.commit()
+        return result.rowcount or 0
+    return write_sync(write)
+
+
+def _sweep_and_sync() -> None:
+    sweep_expired()
+    warm_from_db()
+
+
+def start_sweeper(interval: int = SYNC_SECONDS) -> threading.Thread:
+    """Start (once) a daemon thread that sweeps expired rows and re-syncs the cache every `interval` seconds."""
+    return start_periodic("refresh-token-sweeper", _sweep_and_sync, interval, run_now=False)
@@ -0,0 +1,150 @@
+"""
+Server-side scoring against the item-bank answer keys.
+
+Answer keys are compiled once into an in-memory index (item_id -> accepted
+normalized answers) so scoring a response is a dict lookup plus one
+normalization. When keys change, rescore() re-grades stored responses in
+keyset batches and writes only the rows whose result changed.
+"""
+import re
+import threading
+import time
+import unicodedata
+from decimal import Decimal
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+
+from sqlalchemy import update
+from sqlmodel import select
+
+from .database import iter_batches, write_sync
+from .ingest import iter_bank_items
+from .models import StudentResponse
+from .progress import record_corrections
+
+RESCORE_BATCH = 5000
+# longer answers, or numbers beyond 10**±MAX_EXPONENT, are compared as text:
+# formatting 1e999999 in full would take a million digits
+MAX_NUMERIC_LENGTH = 64
+MAX_EXPONENT = 64
+_WS = re.compile(r"\s+")
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def normalize(value: Any) -> str:
+    """Canonical form used on both sides of a comparison."""
+    text = _WS.sub(" ", unicodedata.normalize("NFKC", str(value)).casefold().strip())
+    if len(text) > MAX_NUMERIC_LENGTH:
+        return text
+    try:
+        number = Decimal(text)
+        if not number.is_finite():
+            return format(number, "f")
+        if abs(number.adjusted()) > MAX_EXPONENT:
+            return text
+        # "8", "8.0" and "08" are the same numeric answer, as are "0" and "-0"
+        return "0" if number.is_zero() else format(number.normalize(), "f")
+    except (ArithmeticError, ValueError):  # InvalidOperation, Overflow, ...
+        return text
+
+
+def compile_key(item: Dict[str, Any]) -> Optional[FrozenSet[str]]:
+    """Accepted normalized answers for a bank item, or None if it has no key."""
+    correct = item.get("correct_answer")
+    if correct is None:
+        return None
+    accepted = {normalize(correct)}
+    options = item.get("options") or []
+    # multiple choice: also accept the option letter ("c") of the correct option
+    for idx, opt in enumerate(options[:len(LETTERS)]):
+        if normalize(opt) == normalize(correct):
+            accepted.add(LETTERS[idx])
+    return frozenset(accepted)
+
+
+class AnswerKeyIndex:
+    def __init__(self):
+        self._keys: Dict[str, FrozenSet[str]] = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def load(self, items: Iterable[Dict[str, Any]]) -> List[str]:
+        """Replace the index; returns item_ids whose key was added, changed or removed."""
+        keys = {}
+        for it in items:
+            key = compile_key(it)
+            if key is not None:
+                keys[str(it["item_id"])] = key
+        with self._lock:
+            old = self._keys
+            changed = [i for i in keys.keys() | old.keys() if keys.get(i) != old.get(i)]
+            self._keys, self.loaded = keys, True
+        return sorted(changed)
+
+    def score(self, item_id: str, answer: Any) -> Optional[bool]:
+        """True/False against the key (a missing answer is wrong); None when the item has no key."""
+        if not self.loaded:
+            self.load(iter_bank_items())
+        key = self._keys.get(item_id)
+        if key is None:
+            return None
+        return answer is not None and normalize(answer) in key
+
+    def __len__(self):
+        return len(self._keys)
+
+
+KEYS = AnswerKeyIndex()
+
+
+def score_response(item_id: str, answer: Any, client_correct: Any = None) -> bool:
+    """Server-side result; the client flag is only used for items without a key."""
+    result = KEYS.score(item_id, answer)
+    return bool(client_correct) if result is None else result
+
+
+def _rescore_rows(where, batch_size: int):
+    scanned = changed = 0
+    stmt = select(StudentResponse.id, StudentResponse.student_id, StudentResponse.item_id, StudentResponse.answer, StudentResponse.correct)
+    if where is not None:
+        stmt = stmt.where(where)
+    for rows in iter_batches(stmt, StudentResponse.id, batch_size):
+        scanned += len(rows)
+        updates = []
+        for rid, student_id, item_id, answer, correct in rows:
+            result = KEYS.score(item_id, answer)
+            if result is not None and result != correct:
+                updates.append({"id": rid, "student_id": student_id, "item_id": item_id, "correct": result, "previous": correct})
+        if updates:
+            def write(sess, updates=updates):
+                sess.execute(update(StudentResponse), [{"id": u["id"], "correct": u["correct"]} for u in updates])
+                record_corrections(sess, updates)
+                sess.commit()
+            write_sync(write)
+            changed += len(updates)
+    return scanned, changed
+
+
+def rescore(item_ids: Optional[List[str]] = None, batch_size: int = RESCORE_BATCH) -> Dict[str, Any]:
+    """Re-grade stored responses (all, or only `item_ids`) against the current keys.
+
+    Reads run in keyset batches on short sessions, one item at a time so each
+    batch is an (item_id, id) index range rather than a re-sort of every
+    remaining match; each batch's changed rows are written with one
+    executemany UPDATE on the writer thread.
+    """
+    started = time.perf_counter()
+    if item_ids is None:
+        scanned, changed = _rescore_rows(None, batch_size)
+    else:
+        scanned = changed = 0
+        for item_id in dict.fromkeys(item_ids):
+            s_, c_ = _rescore_rows(StudentResponse.item_id == item_id, batch_size)
+            scanned, changed = scanned + s_, changed + c_
+    elapsed = time.perf_counter() - started
+    return {
+        "scanned": scanned,
+        "changed": changed,
+        "keys": len(KEYS),
+        "elapsed_ms": round(elapsed * 1000, 3),
+        "scored_per_sec": round(scanned / elapsed, 1) if elapsed > 0 else None,
+    }
@@ -0,0 +1,248 @@
+"""
+In-memory inverted index for /teacher/lessons/search.
+
+Lesson prompt, subject and answer options are tokenized (NFKC, casefold,
+word characters) into postings lists of document positions. Positions only
+grow, so every postings array is sorted and membership tests are binary
+searches. A query term matches exactly (weight 3), as a prefix of indexed
+terms (weight 2), or, when neither hits, within one edit (weight 1). All
+terms must match. Candidates are narrowed rarest term first, and only the
+top `limit` are sorted.
+
+The index syncs incrementally from Lesson.updated_at (set by ingestion).
+An edited lesson tombstones its old document and appends a new one.
+"""
+import bisect
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlmodel import select
+
+from .arrays import KeyIndex, grow
+from .database import iter_batches
+from .models import Lesson
+
+SYNC_SECONDS = float(os.environ.get("SEARCH_SYNC_SECONDS", 5))
+# re-read this much before the last seen updated_at (writes from slow transactions)
+SYNC_OVERLAP_SECONDS = 5
+PREFIX_EXPANSIONS = 50
+FUZZY_MIN_LENGTH = 4
+EXACT, PREFIX, FUZZY = 3, 2, 1
+_TOKEN = re.compile(r"\w+")
+_ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789"
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return _TOKEN.findall(unicodedata.normalize("NFKC", text).casefold())
+
+
+def _edits1(word: str) -> Iterable[str]:
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    for a, b in splits:
+        if b:
+            yield a + b[1:]
+            for c in _ALPHABET:
+                yield a + c + b[1:]
+        if len(b) > 1:
+            yield a + b[1] + b[0] + b[2:]
+        for c in _ALPHABET:
+            yield a + c + b
+
+
+def _doc_tokens(row: Dict[str, Any]) -> List[str]:
+    tokens = tokenize(row.get("prompt")) + tokenize(row.get("subject"))
+    options = row.get("options")
+    if options:
+        try:
+            tokens += tokenize(" ".join(str(o) for o in json.loads(options)))
+        except (TypeError, ValueError):
+            tokens += tokenize(options)
+    return tokens
+
+
+def _copy(plist: array) -> np.ndarray:
+    return np.frombuffer(plist, dtype=np.int32).copy()
+
+
+class SearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self.postings: Dict[str, array] = {}
+        self.vocab: List[str] = []  # sorted terms, for prefix ranges
+        self.docs: List[Dict[str, Any]] = []
+        self.alive = np.zeros(0, dtype=bool)
+        self.subjects = KeyIndex()
+        self.doc_subject = np.zeros(0, dtype=np.int16)
+        # lesson id -> (doc, (content_hash, updated_at)) of its live document
+        self.by_lesson: Dict[int, Tuple[int, Tuple[Optional[str], Optional[str]]]] = {}
+        self.watermark: Optional[str] = None
+        self.synced_at: Optional[float] = None
+        self._checked_at = 0.0
+
+    # ---- building ------------------------------------------------------
+
+    def _add(self, row: Dict[str, Any], new_terms: List[str]) -> None:
+        # postings first, then the doc tables: a failure part way leaves no trace
+        doc = len(self.docs)
+        subject = row.get("subject")
+        entry = {k: row.get(k) for k in ("item_id", "subject", "prompt", "source")}
+        appended: List[str] = []
+        try:
+            for term in dict.fromkeys(_doc_tokens(row)):
+                plist = self.postings.get(term)
+                if plist is None:
+                    plist = self.postings[term] = array("i")
+                    new_terms.append(term)
+                plist.append(doc)
+                appended.append(term)
+        except BaseException:
+            for term in appended:
+                self.postings[term].pop()
+                if not self.postings[term]:
+                    del self.postings[term]
+                    new_terms.remove(term)
+            raise
+        self.alive = grow(self.alive, doc + 1, False)
+        self.doc_subject = grow(self.doc_subject, doc + 1, -1)
+        self.doc_subject[doc] = -1 if subject is None else self.subjects.add(subject)
+        self.docs.append(entry)
+        self.alive[doc] = True
+        old = self.by_lesson.get(row["id"])
+        if old is not None:
+            self.alive[old[0]] = False
+        self.by_lesson[row["id"]] = (doc, (row.get("content_hash"), row.get("updated_at")))
+
+    def apply(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Index new or changed lessons (dicts of Lesson columns); returns how many changed."""
+        changed = 0
+        with self._lock:
+            new_terms: List[str] = []
+            for row in rows:
+                old = self.by_lesson.get(row["id"])
+                if old is not None and old[1] == (row.get("content_hash"), row.get("updated_at")):
+                    continue  # re-read through the sync overlap window
+                self._add(row, new_terms)
+                changed += 1
+            if len(new_terms) > len(self.vocab) // 8:
+                self.vocab = sorted(self.postings)
+            else:
+                for term in new_terms:
+                    bisect.insort(self.vocab, term)
+        return changed
+
+    def sync(self) -> int:
+        """Pull lessons written since the last sync (everything on the first call)."""
+        with self._sync_lock:
+            columns = (Lesson.id, Lesson.item_id, Lesson.subject, Lesson.prompt, Lesson.source, Lesson.options,
+                       Lesson.content_hash, Lesson.updated_at)
+            names = [c.key for c in columns]
+            since = self.watermark
+            if since is not None:
+                since = (datetime.fromisoformat(since) - timedelta(seconds=SYNC_OVERLAP_SECONDS)).isoformat()
+            changed, latest = 0, self.watermark
+            stmt = select(*columns)
+            if since is not None:
+                stmt = stmt.where(Lesson.updated_at >= since)
+            for batch in iter_batches(stmt, Lesson.id):
+                rows = [dict(zip(names, r)) for r in batch]
+                changed += self.apply(rows)
+                stamps = [r["updated_at"] for r in rows if r["updated_at"]]
+                if stamps and (latest is None or max(stamps) > latest):
+                    latest = max(stamps)
+            self.watermark = latest
+            self.synced_at = time.time()
+            return changed
+
+    def maybe_sync(self) -> None:
+        """sync() at most every SEARCH_SYNC_SECONDS (first call always)."""
+        now = time.monotonic()
+        if self.synced_at is None or now - self._checked_at >= SYNC_SECONDS:
+            self._checked_at = now
+            self.sync()
+
+    # ---- querying ------------------------------------------------------
+
+    def _expand(self, term: str) -> List[Tuple[np.ndarray, int]]:
+        """(postings, weight) alternatives for one query term. Called under _lock; the
+        postings are copied, since apply() cannot grow an array while a view of it exists."""
+        out: List[Tuple[np.ndarray, int]] = []
+        exact = self.postings.get(term)
+        if exact is not None:
+            out.append((_copy(exact), EXACT))
+        lo = bisect.bisect_left(self.vocab, term)
+        hi = bisect.bisect_left(self.vocab, term + "\U0010ffff")
+        prefixed = [t for t in self.vocab[lo:hi] if t != term]
+        if len(prefixed) > PREFIX_EXPANSIONS:
+            prefixed = sorted(prefixed, key=lambda t: len(self.postings[t]), reverse=True)[:PREFIX_EXPANSIONS]
+        out.extend((_copy(self.postings[t]), PREFIX) for t in prefixed)
+        if not out and len(term) >= FUZZY_MIN_LENGTH:
+            for t in set(_edits1(term)):
+                plist = self.postings.get(t)
+                if plist is not None:
+                    out.append((_copy(plist), FUZZY))
+        return out
+
+    def search(self, query: str, limit: int = 20, subject: Optional[str] = None) -> Dict[str, Any]:
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            n_docs = len(self.docs)
+            expansions = [self._expand(t) for t in terms]
+            alive = self.alive[:n_docs]
+            doc_subject = self.doc_subject[:n_docs]
+            subject_code = self.subjects.pos.get(subject) if subject is not None else None
+            docs = self.docs
+        if not terms or any(not e for e in expansions) or (subject is not None and subject_code is None):
+            return {"total": 0, "results": []}
+        # narrow the candidates rarest term first
+        expansions.sort(key=lambda alts: sum(len(p) for p, _ in alts))
+        first = expansions[0]
+        if sum(len(p) for p, _ in first) < n_docs // 8:
+            cand = np.unique(np.concatenate([p for p, _ in first]))
+            score = np.zeros(len(cand), dtype=np.int16)
+            for plist, weight in first:
+                idx = np.searchsorted(cand, plist)
+                score[idx] = np.maximum(score[idx], weight)
+        else:
+            dense = np.zeros(n_docs, dtype=np.int16)
+            for plist, weight in first:
+                dense[plist] = np.maximum(dense[plist], weight)
+            cand = np.flatnonzero(dense).astype(np.int32)
+            score = dense[cand]
+        keep = alive[cand] if subject_code is None else alive[cand] & (doc_subject[cand] == subject_code)
+        cand, score = cand[keep], score[keep]
+        for alts in expansions[1:]:
+            if not len(cand):
+                break
+            term_score = np.zeros(len(cand), dtype=np.int16)
+            for plist, weight in alts:
+                pos = np.searchsorted(plist, cand)
+                hit = plist[np.minimum(pos, len(plist) - 1)] == cand
+                term_score[hit] = np.maximum(term_score[hit], weight)
+            keep = term_score > 0
+            cand, score = cand[keep], score[keep] + term_score[keep]
+        total = int(len(cand))
+        # best score first, then insertion order; partial sort of the top `limit`
+        key = -score.astype(np.int64) * (n_docs + 1) + cand
+        if total > limit:
+            top = np.argpartition(key, limit)[:limit]
+            top = top[np.argsort(key[top])]
+        else:
+            top = np.argsort(key)
+        return {
+            "total": total,
+            "results": [dict(docs[int(cand[i])], score=int(score[i])) for i in top],
+        }
+
+
+INDEX = SearchIndex()
@@ -0,0 +1,153 @@
+"""
+Write-behind persistence for issued refresh tokens.
+
+Login and /token/refresh enqueue the new RefreshToken row and return; a daemon
+thread drains the queue and writes everything pending with one executemany
+INSERT per transaction, so a burst of concurrent logins costs one commit.
+Verification does not need the row (see revocation.py), and a token revoked
+before its row is written is persisted as revoked.
+
+A failed batch is logged and retried with backoff. If it still fails, its
+revoked rows are kept and retried on their own (as an upsert) until they are
+written, since warm_from_db() cannot restore a revocation that never reached
+the DB after a restart; other rows are dropped and counted. stats() reports
+the counters.
+
+Set TOKEN_WRITE_BEHIND=0 to write synchronously on the request thread.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert, update
+from sqlmodel import select
+
+from .database import ensure_schema, in_chunks, write_sync
+from .models import RefreshToken
+from .revocation import CACHE as REVOCATIONS
+
+WRITE_BEHIND = os.environ.get("TOKEN_WRITE_BEHIND", "1") != "0"
+BATCH_MAX = 500
+# how long the writer waits for more rows after the first one arrives
+LINGER_SECONDS = 0.005
+# pauses between attempts at a failed batch
+RETRY_SECONDS = (0.1, 0.5, 2.0, 5.0)
+
+log = logging.getLogger(__name__)
+
+_queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=10_000)
+_writer: Optional[threading.Thread] = None
+_lock = threading.Lock()
+_stats = {"written": 0, "failed_writes": 0, "dropped": 0, "carried": 0}
+
+
+def _write(rows: List[Dict[str, Any]]) -> None:
+    for row in rows:
+        if REVOCATIONS.lookup(row["jti"]) is True:
+            row["revoked"] = True
+    def write(sess):
+        sess.execute(insert(RefreshToken), rows)
+        sess.commit()
+    write_sync(write)
+
+
+def _write_revoked(rows: List[Dict[str, Any]]) -> None:
+    # an earlier attempt may have committed some rows: mark those revoked, insert the rest
+    def write(sess):
+        stored = set()
+        for chunk in in_chunks(row["token_hash"] for row in rows):
+            stored.update(sess.exec(select(RefreshToken.token_hash).where(RefreshToken.token_hash.in_(chunk))).all())
+        if stored:
+            sess.execute(update(RefreshToken).where(RefreshToken.token_hash.in_(stored)).values(revoked=True))
+        missing = [row for row in rows if row["token_hash"] not in stored]
+        if missing:
+            sess.execute(insert(RefreshToken), missing)
+        sess.commit()
+    write_sync(write)
+
+
+def _write_with_retry(rows: List[Dict[str, Any]]) -> bool:
+    for delay in RETRY_SECONDS + (None,):
+        try:
+            _write(rows)
+            _stats["written"] += len(rows)
+            return True
+        except Exception:
+            _stats["failed_writes"] += 1
+            log.warning("refresh-token write of %d rows failed", len(rows), exc_info=True)
+        if delay is None:
+            return False
+        time.sleep(delay)
+
+
+def _drain_loop():
+    ensure_schema()
+    carried: List[Dict[str, Any]] = []  # revoked rows of failed batches, already task_done
+    while True:
+        try:
+            # with rows carried over, wake up to retry them even if nothing new arrives
+            rows = [_queue.get(timeout=RETRY_SECONDS[-1]) if carried else _queue.get()]
+        except queue.Empty:
+            rows = []
+        deadline = time.monotonic() + LINGER_SECONDS
+        while rows and len(rows) < BATCH_MAX:
+            remaining = deadline - time.monotonic()
+            try:
+                rows.append(_queue.get(timeout=remaining) if remaining > 0 else _queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            if rows and not _write_with_retry(rows):
+                # _write() marked the rows revoked since they were queued
+                kept = [row for row in rows if row["revoked"]]
+                _stats["dropped"] += len(rows) - len(kept)
+                log.error("dropped %d refresh-token rows after %d attempts; keeping %d revoked rows",
+                          len(rows) - len(kept), len(RETRY_SECONDS) + 1, len(kept))
+                carried.extend(kept)
+            if carried:
+                try:
+                    _write_revoked(carried)
+                    _stats["written"] += len(carried)
+                    carried = []
+                except Exception:
+                    _stats["failed_writes"] += 1
+                    log.warning("writing %d revoked refresh-token rows failed", len(carried), exc_info=True)
+            _stats["carried"] = len(carried)
+        finally:
+            for _ in rows:
+                _queue.task_done()
+
+
+def _ensure_writer() -> None:
+    global _writer
+    if _writer and _writer.is_alive():
+        return
+    with _lock:
+        if not (_writer and _writer.is_alive()):
+            _writer = threading.Thread(target=_drain_loop, name="refresh-token-writer", daemon=True)
+            _writer.start()
+
+
+def persist(row: Dict[str, Any]) -> None:
+    """Queue a refresh-token row (dict of RefreshToken columns) for writing."""
+    if WRITE_BEHIND:
+        _ensure_writer()
+        try:
+            _queue.put_nowait(row)
+            return
+        except queue.Full:
+            pass  # backpressure: fall through to a synchronous write
+    _write([row])
+
+
+def flush() -> None:
+    """Block until every queued row has been written or given up on (tests, shutdown)."""
+    if _writer and _writer.is_alive():
+        _queue.join()
+
+
+def stats() -> Dict[str, int]:
+    return {**_stats, "queued": _queue.qsize()}
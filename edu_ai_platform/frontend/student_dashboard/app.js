@@ -49,11 +49,38 @@ document.getElementById('loginForm').addEventListener('submit', async (e)=>{
     if(!res.ok) throw new Error('Login failed');
     const data = await res.json(); token = data.access_token;
     document.getElementById('login').style.display = 'none'; document.getElementById('dashboard').style.display = 'block';
-    loadAssignments();
+    loadAssignments(); openEvents();
   }catch(err){ document.getElementById('loginMsg').innerText = err.message; }
 });
 
-document.getElementById('logout').addEventListener('click', ()=>{ try{ fetch(API_BASE + 'logout', {method:'POST'}); }catch(e){} token = null; document.getElementById('login').style.display = 'block'; document.getElementById('dashboard').style.display = 'none'; });
+// Live updates: the server pushes `assignment` events over SSE (/events), so the list
+// reloads only when something changed. EventSource cannot send headers, and the access token
+// must not go in the URL, so each connection is opened with a short-lived stream ticket.
+let events = null;
+let lastEventId = null;
+async function openEvents(){
+  closeEvents();
+  if(!token) return;
+  const res = await authFetch(API_BASE + 'events/ticket', {method:'POST'});  // refreshes the access token when needed
+  if(!res.ok || !token) return;
+  const params = new URLSearchParams({ticket: (await res.json()).ticket});
+  // a new EventSource does not send Last-Event-ID; pass it so missed events are replayed
+  if(lastEventId) params.append('last_event_id', lastEventId);
+  closeEvents();
+  events = new EventSource(API_BASE + 'events?' + params);
+  // `resync` means the server dropped events for us: reload everything
+  ['assignment', 'resync'].forEach(type => events.addEventListener(type, (e)=>{
+    if(e.lastEventId) lastEventId = e.lastEventId;
+    loadAssignments();
+  }));
+  events.onerror = ()=>{
+    // dropped connections are retried by EventSource; a rejected one (expired ticket) ends CLOSED
+    if(events && events.readyState === EventSource.CLOSED) setTimeout(openEvents, 3000);
+  };
+}
+function closeEvents(){ if(events){ events.close(); events = null; } }
+
+document.getElementById('logout').addEventListener('click', ()=>{ closeEvents(); lastEventId = null; try{ fetch(API_BASE + 'logout', {method:'POST'}); }catch(e){} token = null; document.getElementById('login').style.display = 'block'; document.getElementById('dashboard').style.display = 'none'; });
 
 async function loadAssignments(){
   // find current user
@@ -62,9 +89,24 @@ async function loadAssignments(){
   const me = await meRes.json();
   const studentId = me.student_id;
   // students should call the student-facing endpoint which allows students to view their own assignments
-  const res = await authFetch(API_BASE + `students/${studentId}/assignments`);
+  const assignments = await fetchAllPages(`students/${studentId}/assignments?limit=1000`, 'assignments');
   const ul = document.getElementById('assignments'); ul.innerHTML = '';
-  if(res.ok){ const d = await res.json(); d.assignments.forEach(a=>{ const li = document.createElement('li'); li.textContent = `${a.item_id} — assigned ${a.assigned_at}`; ul.appendChild(li); }); }
+  if(assignments){ assignments.forEach(a=>{ const li = document.createElement('li'); li.textContent = `${a.item_id} — assigned ${a.assigned_at}`; ul.appendChild(li); }); }
+}
+
+// list endpoints return keyset pages; follow next_cursor until the last one
+async function fetchAllPages(path, key){
+  const items = [];
+  let after = null;
+  do{
+    const sep = path.includes('?') ? '&' : '?';
+    const res = await authFetch(API_BASE + path + (after ? `${sep}after=${encodeURIComponent(after)}` : ''));
+    if(!res.ok) return null;
+    const page = await res.json();
+    items.push(...page[key]);
+    after = page.next_cursor;
+  } while(after);
+  return items;
 }
 
 document.getElementById('submit').addEventListener('click', async ()=>{
@@ -67,12 +67,50 @@ document.getElementById('loginForm').addEventListener('submit', async (e)=>{
       document.getElementById('dashboard').style.display = 'block';
       loadStudents();
       loadLessons();
+      openEvents();
     }catch(err){
       document.getElementById('loginMsg').innerText = err.message;
     }
 });
 
+// Live updates over SSE (/events): the server pushes `assignment` and `response` events for
+// this teacher's classes plus the selected student, so the student panel reloads only when
+// something changed. EventSource cannot send headers, and the access token must not go in the
+// URL, so each connection is opened with a short-lived stream ticket.
+let events = null;
+let watchedStudent = null;
+let lastEventId = null;
+async function openEvents(){
+  closeEvents();
+  if(!token) return;
+  const res = await authFetch(API_BASE + 'events/ticket', {method:'POST'});  // refreshes the access token when needed
+  if(!res.ok || !token) return;
+  const params = new URLSearchParams({ticket: (await res.json()).ticket});
+  if(watchedStudent) params.append('student_id', watchedStudent.id);
+  // a new EventSource does not send Last-Event-ID; pass it so missed events are replayed
+  if(lastEventId) params.append('last_event_id', lastEventId);
+  closeEvents();
+  events = new EventSource(API_BASE + 'events?' + params);
+  const refresh = (e)=>{
+    if(e.lastEventId) lastEventId = e.lastEventId;
+    if(!watchedStudent) return;
+    // `resync` means the server dropped events for us: reload regardless
+    if(e.type === 'resync' || JSON.parse(e.data).student_id === watchedStudent.id){
+      onStudentSelect(watchedStudent.id, watchedStudent.name);
+    }
+  };
+  ['assignment', 'response', 'resync'].forEach(type => events.addEventListener(type, refresh));
+  events.onerror = ()=>{
+    // dropped connections are retried by EventSource; a rejected one (expired ticket) ends CLOSED
+    if(events && events.readyState === EventSource.CLOSED) setTimeout(openEvents, 3000);
+  };
+}
+function closeEvents(){ if(events){ events.close(); events = null; } }
+
 document.getElementById('logout').addEventListener('click', ()=>{
+  closeEvents();
+  watchedStudent = null;
+  lastEventId = null;
   // attempt to revoke refresh token on server (cookie-based)
   try{ fetch(API_BASE + 'logout', {method:'POST'}); }catch(e){}
   token = null;
@@ -80,12 +118,26 @@ document.getElementById('logout').addEventListener('click', ()=>{
   document.getElementById('dashboard').style.display = 'none';
 });
 
+// list endpoints are cursor-paginated: follow next_cursor until the last page
+async function fetchAllPages(path, key){
+  const items = [];
+  let after = null;
+  do{
+    const sep = path.includes('?') ? '&' : '?';
+    const res = await authFetch(API_BASE + path + (after ? `${sep}after=${encodeURIComponent(after)}` : ''));
+    if(!res.ok) return null;
+    const page = await res.json();
+    items.push(...page[key]);
+    after = page.next_cursor;
+  } while(after);
+  return items;
+}
+
 async function loadStudents(){
-  const res = await authFetch(API_BASE + 'teacher/students');
-  if(!res.ok){ document.getElementById('students').innerHTML = '<li>Error loading students</li>'; return }
-  const data = await res.json();
+  const students = await fetchAllPages('teacher/students?limit=1000&fields=id,name,grade', 'students');
+  if(!students){ document.getElementById('students').innerHTML = '<li>Error loading students</li>'; return }
   const ul = document.getElementById('students'); ul.innerHTML = '';
-  data.students.forEach(s=>{
+  students.forEach(s=>{
     const li = document.createElement('li');
     li.textContent = `${s.id} — ${s.name} (Grade ${s.grade})`;
     li.style.cursor = 'pointer';
@@ -101,12 +153,35 @@ async function loadStudents(){
   });
 }
 
-async function loadLessons(){
-  const res = await authFetch(API_BASE + 'teacher/lessons');
+// subject filter for the lessons list; filtering happens server-side (?subject=)
+function lessonSubjectSelect(){
+  let sel = document.getElementById('lessonSubject');
+  if(!sel){
+    sel = document.createElement('select');
+    sel.id = 'lessonSubject';
+    sel.addEventListener('change', ()=> loadLessons(sel.value));
+    const ul = document.getElementById('lessons');
+    ul.parentNode.insertBefore(sel, ul);
+  }
+  return sel;
+}
+
+async function loadLessons(subject){
+  const query = 'teacher/lessons?limit=30' + (subject ? '&subject=' + encodeURIComponent(subject) : '');
+  const res = await authFetch(API_BASE + query);
   if(!res.ok){ document.getElementById('lessons').innerHTML = '<li>Error loading lessons</li>'; return }
   const data = await res.json();
+  const sel = lessonSubjectSelect();
+  sel.innerHTML = '';
+  ['', ...data.facets.subjects].forEach(name=>{
+    const opt = document.createElement('option');
+    opt.value = name; opt.textContent = name || 'All subjects';
+    sel.appendChild(opt);
+  });
+  sel.value = subject || '';
   const ul = document.getElementById('lessons'); ul.innerHTML = '';
-  data.lessons.slice(0,30).forEach(l=>{
+  const assignLesson = document.getElementById('assignLesson'); assignLesson.innerHTML = '';
+  data.lessons.forEach(l=>{
     const li = document.createElement('li');
     li.textContent = `[${l.source}] ${l.item_id} — ${l.subject}: ${l.prompt}`;
     ul.appendChild(li);
@@ -114,7 +189,7 @@ async function loadLessons(){
     const opt = document.createElement('option');
     opt.value = l.item_id;
     opt.textContent = `[${l.source}] ${l.item_id} — ${l.subject}`;
-    document.getElementById('assignLesson').appendChild(opt);
+    assignLesson.appendChild(opt);
   });
 }
 
@@ -149,22 +224,25 @@ document.getElementById('exportAssignments').addEventListener('click', async ()=
 
 async function onStudentSelect(studentId, studentName){
   document.getElementById('selectedStudent').textContent = studentName + ' ('+studentId+')';
-  // load assignments
-  const res = await authFetch(API_BASE + `teacher/student/${studentId}/assignments`);
+  // follow this student's events from now on
+  if(!watchedStudent || watchedStudent.id !== studentId){
+    watchedStudent = {id: studentId, name: studentName};
+    openEvents();
+  }
+  // load assignments (every page)
+  const assignments = await fetchAllPages(`teacher/student/${studentId}/assignments?limit=1000`, 'assignments');
   const al = document.getElementById('studentAssignments'); al.innerHTML = '';
-  if(res.ok){
-    const d = await res.json();
-    d.assignments.forEach(a=>{
+  if(assignments){
+    assignments.forEach(a=>{
       const li = document.createElement('li'); li.textContent = `${a.item_id} — assigned ${a.assigned_at}`; al.appendChild(li);
     });
   } else { al.innerHTML = '<li>Unable to load assignments</li>' }
 
-  // load responses
-  const rres = await authFetch(API_BASE + `students/${studentId}/responses`);
+  // load responses (every page)
+  const responses = await fetchAllPages(`students/${studentId}/responses?limit=1000`, 'responses');
   const rl = document.getElementById('studentResponses'); rl.innerHTML = '';
-  if(rres.ok){
-    const rd = await rres.json();
-    rd.responses.forEach(r=>{
+  if(responses){
+    responses.forEach(r=>{
       const li = document.createElement('li'); li.textContent = `${r.item_id} — answer: ${r.answer} (correct: ${r.correct}) at ${r.submitted_at}`; rl.appendChild(li);
     });
   } else { rl.innerHTML = '<li>Unable to load responses</li>' }
@@ -191,8 +269,7 @@ document.getElementById('submitResponse').addEventListener('click', async ()=>{
   const msg = document.getElementById('respMsg');
   if(!res.ok){ msg.textContent = 'Submit failed'; return }
   const d = await res.json(); msg.textContent = 'Response saved id=' + d.response_id;
-  // refresh responses
-  onStudentSelect(studentId, student.split(' (')[0]);
+  // the response list refreshes from the `response` event on /events
 });
 // end of script
 
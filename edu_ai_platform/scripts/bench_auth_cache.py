@@ -0,0 +1,65 @@
+"""
+Microbenchmark for authenticated-request overhead with the access-token
+cache on and off.
+  dependency   get_current_user() alone (jwt.decode + User vs a cache hit)
+  request      GET /me in-process through the full ASGI stack
+Tokens are drawn from a pool, like a fleet of polling dashboards.
+Run: python scripts/bench_auth_cache.py [--tokens 50] [--requests 5000]
+"""
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import argparse
+import asyncio
+import time
+
+import httpx
+from backend.app import auth
+from backend.app.main import app
+
+
+def tokens(n):
+    return [auth.create_access_token({'sub': f'teacher{i}', 'role': 'teacher', 'teacher_id': f't{i}'}) for i in range(n)]
+
+
+async def dependency(pool, total):
+    started = time.perf_counter()
+    for i in range(total):
+        await auth.get_current_user(pool[i % len(pool)])
+    return (time.perf_counter() - started) / total * 1e6
+
+
+async def request(pool, total):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        headers = [{'Authorization': f'Bearer {t}'} for t in pool]
+        started = time.perf_counter()
+        for i in range(total):
+            r = await client.get('/me', headers=headers[i % len(headers)])
+            assert r.status_code == 200, r.status_code
+        return (time.perf_counter() - started) / total * 1e6
+
+
+def run(mode, pool, total):
+    auth.TOKEN_CACHE = auth.TokenCache(size=10_000 if mode == 'cache on' else 0)
+    dep = asyncio.run(dependency(pool, total))
+    req = asyncio.run(request(pool, total))
+    return dep, req, auth.TOKEN_CACHE.stats()['hit_rate']
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tokens', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+    pool = tokens(args.tokens)
+    print(f'{args.requests} authenticated calls over {args.tokens} tokens')
+    results = {}
+    for mode in ('cache off', 'cache on'):
+        dep, req, hit_rate = run(mode, pool, args.requests)
+        results[mode] = (dep, req)
+        print(f'{mode:10s} get_current_user {dep:7.1f} us   GET /me {req:7.1f} us   hit rate {hit_rate}')
+    off, on = results['cache off'], results['cache on']
+    print(f'saved per request: {off[0] - on[0]:.1f} us in the dependency, {off[1] - on[1]:.1f} us end to end')
@@ -0,0 +1,60 @@
+"""
+Time /teacher/classes/{id}/analytics queries against a synthetic cube.
+Builds the cube's columns directly (no DB) at district scale and reports
+per-class query latency; the target is < 50 ms at 100k students.
+
+    python scripts/bench_class_analytics.py [students] [responses_per_student]
+"""
+import sys, os, time
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import numpy as np
+
+from backend.app.analytics import ClassCube
+from backend.app.arrays import ColumnTable, KeyIndex
+
+CLASS_SIZE = 30
+ITEMS = 2000
+SUBJECTS = ('numeracy', 'literacy', 'science')
+
+
+def build(students: int, per_student: int) -> ClassCube:
+    rng = np.random.default_rng(7)
+    cube = ClassCube()
+    cube.students = KeyIndex(f's{i}' for i in range(students))
+    cube.items = KeyIndex(f'item-{i}' for i in range(ITEMS))
+    cube.subjects = KeyIndex(SUBJECTS)
+    cube.student_class = (np.arange(students) // CLASS_SIZE).astype(np.int32)
+    cube.item_subject = (np.arange(ITEMS) % len(SUBJECTS)).astype(np.int16)
+    n = students * per_student
+    cube.responses = ColumnTable.from_arrays(
+        student=rng.integers(0, students, n, dtype=np.int32),
+        item=rng.integers(0, ITEMS, n, dtype=np.int32),
+        correct=rng.random(n) < 0.6,
+    )
+    cube.assignments = ColumnTable.from_arrays(
+        student=rng.integers(0, students, n, dtype=np.int32),
+        item=rng.integers(0, ITEMS, n, dtype=np.int32),
+    )
+    cube.loaded_at = time.time()
+    return cube
+
+
+if __name__ == '__main__':
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    per_student = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    t0 = time.perf_counter()
+    cube = build(students, per_student)
+    print(f'{students} students, {len(cube.responses)} responses, {len(cube.assignments)} assignments '
+          f'(built in {time.perf_counter() - t0:.1f}s)')
+    classes = np.random.default_rng(1).integers(0, students // CLASS_SIZE, 50)
+    cube.class_summary(int(classes[0]))  # warm-up
+    timings = []
+    for c in classes:
+        t0 = time.perf_counter()
+        cube.class_summary(int(c))
+        timings.append((time.perf_counter() - t0) * 1000)
+    timings.sort()
+    print(f'class_summary: p50 {timings[len(timings) // 2]:.2f} ms  p99 {timings[-1]:.2f} ms')
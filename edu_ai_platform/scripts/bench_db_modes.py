@@ -0,0 +1,86 @@
+"""
+Compare endpoint latency with the threadpool DB layer (DB_ASYNC=0) and the
+async engine (DB_ASYNC=1) at a fixed number of concurrent clients.
+Each mode runs in its own process against the same seeded SQLite file.
+Run: python scripts/bench_db_modes.py [--clients 500] [--requests 5000]
+"""
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import tempfile
+import time
+
+STUDENTS = 1000
+
+
+def seed(url):
+    os.environ['DATABASE_URL'] = url
+    from backend.app.database import get_session, init_db
+    from backend.app.models import Student, Assignment
+    init_db()
+    with get_session() as sess:
+        sess.add_all(Student(student_id=f's{i}', name=f'Student {i}', grade=4) for i in range(STUDENTS))
+        sess.add_all(Assignment(student_id=f's{i % STUDENTS}', item_id=f'item-{i % 50}', assigned_at='2026-01-01T00:00:00') for i in range(STUDENTS * 10))
+        sess.commit()
+
+
+async def child(clients, total):
+    import httpx
+    from backend.app.main import app
+    rng = random.Random(7)
+    latencies = []
+    errors = []
+    sem = asyncio.Semaphore(clients)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench') as client:
+        r = await client.post('/token', data={'username': 'teacher', 'password': 'teacherpass'})
+        auth = {'Authorization': 'Bearer ' + r.json()['access_token']}
+
+        async def one(i):
+            sid = f's{rng.randrange(STUDENTS)}'
+            async with sem:
+                t0 = time.perf_counter()
+                try:
+                    if i % 10 == 0:
+                        r = await client.post(f'/students/{sid}/responses', json={'item_id': 'item-1', 'answer': '8'}, headers=auth)
+                    else:
+                        r = await client.get(f'/students/{sid}/assignments', headers=auth)
+                    status = r.status_code
+                except Exception as exc:  # e.g. "database is locked" raised through the ASGI transport
+                    status = type(exc).__name__
+                latencies.append(time.perf_counter() - t0)
+                if status != 200:
+                    errors.append(status)
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+    print(json.dumps({'rps': total / elapsed, 'p50_ms': pct(0.50), 'p99_ms': pct(0.99), 'errors': len(errors)}))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        asyncio.run(child(args.clients, args.requests))
+        sys.exit(0)
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_modes.db')}"
+    seed(url)
+    print(f'{args.requests} requests (90% GET assignments / 10% POST response) at {args.clients} concurrent clients')
+    for mode in ('0', '1'):
+        env = dict(os.environ, DATABASE_URL=url, DB_ASYNC=mode, PYTHONWARNINGS='ignore')
+        out = subprocess.run([sys.executable, __file__, '--child', '--clients', str(args.clients), '--requests', str(args.requests)],
+                             env=env, capture_output=True, text=True, check=True).stdout
+        res = json.loads(out.strip().splitlines()[-1])
+        label = 'async engine' if mode == '1' else 'threadpool'
+        print(f"{label:13s} {res['rps']:8.1f} req/s   p50 {res['p50_ms']:7.1f} ms   p99 {res['p99_ms']:7.1f} ms   errors {res['errors']}")
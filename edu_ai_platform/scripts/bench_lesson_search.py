@@ -0,0 +1,93 @@
+"""
+Time /teacher/lessons/search queries against a synthetic index.
+Indexes generated lessons directly (no DB) and reports per-query latency
+for exact, prefix, multi-word and typo queries; the target is p95 < 10 ms
+at 500k items.
+
+    python scripts/bench_lesson_search.py [items]
+"""
+import sys, os, time
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import json
+
+import numpy as np
+
+from backend.app.search import SearchIndex
+
+SUBJECTS = ('numeracy', 'literacy', 'science')
+VOCAB = 20_000
+WORDS_PER_PROMPT = 10
+QUERIES = 200
+
+
+def word(i: int) -> str:
+    # pronounceable, distinct, 5-8 letters
+    consonants, vowels = 'bdfgklmnprstvz', 'aeiou'
+    out = []
+    for _ in range(3):
+        out.append(consonants[i % 14] + vowels[(i // 14) % 5])
+        i //= 70
+    return ''.join(out) + str(i % 10 or '')
+
+
+def build(items: int):
+    rng = np.random.default_rng(7)
+    words = [word(i) for i in range(VOCAB)]
+    # Zipf-like word frequencies, as in real prompts
+    p = 1.0 / np.arange(1, VOCAB + 1)
+    p /= p.sum()
+    picks = rng.choice(VOCAB, size=(items, WORDS_PER_PROMPT + 2), p=p)
+    index = SearchIndex()
+    batch = []
+    for n in range(items):
+        row = picks[n]
+        batch.append({
+            'id': n + 1,
+            'item_id': f'item-{n}',
+            'subject': SUBJECTS[n % len(SUBJECTS)],
+            'prompt': ' '.join(words[k] for k in row[:WORDS_PER_PROMPT]),
+            'source': 'bench',
+            'options': json.dumps([words[row[-2]], words[row[-1]]]),
+            'content_hash': None,
+            'updated_at': None,
+        })
+        if len(batch) == 50_000:
+            index.apply(batch)
+            batch = []
+    index.apply(batch)
+    return index, words
+
+
+if __name__ == '__main__':
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    t0 = time.perf_counter()
+    index, words = build(items)
+    print(f'{items} items, {len(index.postings)} terms (indexed in {time.perf_counter() - t0:.1f}s)')
+    rng = np.random.default_rng(1)
+    common, rare = words[:200], words[2000:]
+    kinds = {
+        'exact': lambda: str(rng.choice(rare)),
+        'common': lambda: str(rng.choice(common)),
+        'prefix': lambda: str(rng.choice(rare))[:3],
+        'two words': lambda: f'{rng.choice(common)} {rng.choice(rare)}',
+        'typo': lambda: (lambda w: w[0] + w[2] + w[1] + w[3:])(str(rng.choice(rare))),
+        'subject': lambda: str(rng.choice(common)),
+    }
+    everything = []
+    for kind, make in kinds.items():
+        subject = 'science' if kind == 'subject' else None
+        index.search(make(), subject=subject)  # warm-up
+        timings = []
+        for _ in range(QUERIES):
+            q = make()
+            t0 = time.perf_counter()
+            index.search(q, subject=subject)
+            timings.append((time.perf_counter() - t0) * 1000)
+        timings.sort()
+        everything += timings
+        print(f'{kind:10s} p50 {timings[len(timings) // 2]:.2f} ms  p95 {timings[int(len(timings) * 0.95)]:.2f} ms')
+    everything.sort()
+    print(f'{"all":10s} p50 {everything[len(everything) // 2]:.2f} ms  p95 {everything[int(len(everything) * 0.95)]:.2f} ms')
@@ -0,0 +1,262 @@
+"""
+Load-test harness: seed a database, start uvicorn on it, and replay
+classroom traffic scenarios over real HTTP.
+  login_storm      POST /token (a class logging in at the bell)
+  dashboard_poll   GET students / lessons / class analytics / progress / assignments
+  bulk_assign      POST /teacher/assign_bulk for a whole class
+  response_burst   POST /students/{id}/responses (a class submitting answers)
+  csv_export       GET /teacher/export_assignments for a class (full body)
+Each scenario reports RPS and p50/p95/p99 latency. Results are saved as JSON
+(with the git commit and settings) so runs can be compared between commits:
+
+  python scripts/bench_load.py --scale 100k
+  python scripts/bench_load.py --scale 100k --compare bench_results/<earlier>.json
+
+--scale is the number of assignment rows (and response rows): 1k, 100k, 1m
+or any integer; there is one student per 20 rows, in classes of 30.
+"""
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import socket
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+SCENARIOS = ('login_storm', 'dashboard_poll', 'bulk_assign', 'response_burst', 'csv_export')
+SCALES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+CLASS_SIZE = 30
+ROWS_PER_STUDENT = 20
+ITEMS = 500
+SUBJECTS = ('numeracy', 'literacy', 'science')
+INSERT_CHUNK = 50_000
+
+
+def parse_scale(value: str) -> int:
+    return SCALES.get(value.lower()) or int(value)
+
+
+def seed(url: str, rows: int, seed_value: int = 7) -> dict:
+    """Bulk-load students, classes, lessons, assignments and responses (executemany per chunk)."""
+    os.environ['DATABASE_URL'] = url
+    from sqlalchemy import insert
+    from backend.app.database import engine, init_db
+    from backend.app.models import Assignment, Classroom, Lesson, Student, StudentResponse
+    from backend.app.progress import rebuild as rebuild_progress
+    from backend.app.database import get_session
+
+    rng = random.Random(seed_value)
+    init_db()
+    students = max(CLASS_SIZE, rows // ROWS_PER_STUDENT)
+    classes = (students + CLASS_SIZE - 1) // CLASS_SIZE
+    start = datetime(2026, 1, 5)
+
+    def chunks(make, total):
+        for n in range(0, total, INSERT_CHUNK):
+            yield [make(i) for i in range(n, min(total, n + INSERT_CHUNK))]
+
+    with engine.begin() as conn:
+        conn.execute(insert(Classroom), [{'id': c + 1, 'name': f'Class {c + 1}', 'teacher_id': 't1'} for c in range(classes)])
+        for batch in chunks(lambda i: {'student_id': f's{i}', 'name': f'Student {i}', 'grade': 3 + i % 4,
+                                        'class_id': i // CLASS_SIZE + 1}, students):
+            conn.execute(insert(Student), batch)
+        conn.execute(insert(Lesson), [{'item_id': f'bench-{i}', 'subject': SUBJECTS[i % len(SUBJECTS)],
+                                       'prompt': f'Benchmark item {i}', 'source': 'bench', 'grade': 3 + i % 4}
+                                      for i in range(ITEMS)])
+        for batch in chunks(lambda i: {'student_id': f's{i % students}', 'item_id': f'bench-{rng.randrange(ITEMS)}',
+                                        'assigned_at': (start + timedelta(minutes=i)).isoformat()}, rows):
+            conn.execute(insert(Assignment), batch)
+        for batch in chunks(lambda i: {'student_id': f's{i % students}', 'item_id': f'bench-{rng.randrange(ITEMS)}',
+                                        'answer': 'x', 'correct': rng.random() < 0.6,
+                                        'submitted_at': (start + timedelta(minutes=i)).isoformat()}, rows):
+            conn.execute(insert(StudentResponse), batch)
+    with get_session() as sess:
+        rebuild_progress(sess)
+    engine.dispose()
+    return {'students': students, 'classes': classes, 'items': ITEMS, 'assignments': rows, 'responses': rows}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(url: str, port: int, workers: int) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=url, PYTHONWARNINGS='ignore')
+    cmd = [sys.executable, '-m', 'uvicorn', 'backend.app.main:app', '--host', '127.0.0.1', '--port', str(port),
+           '--workers', str(workers), '--log-level', 'warning', '--no-access-log']
+    proc = subprocess.Popen(cmd, cwd=PROJECT_ROOT, env=env)
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'uvicorn exited with {proc.returncode}')
+        try:
+            if httpx.get(f'http://127.0.0.1:{port}/openapi.json', timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError('uvicorn did not become ready')
+
+
+def make_requests(name: str, data: dict, rng: random.Random):
+    """Infinite generator of (method, path, kwargs) for a scenario."""
+    students, classes = data['students'], data['classes']
+    while True:
+        sid = f's{rng.randrange(students)}'
+        cid = rng.randrange(classes) + 1
+        if name == 'login_storm':
+            creds = rng.choice([('teacher', 'teacherpass'), ('student', 'studentpass'), ('student2', 'student2pass')])
+            yield 'POST', '/token', {'data': {'username': creds[0], 'password': creds[1]}}
+        elif name == 'dashboard_poll':
+            yield rng.choice([
+                ('GET', '/teacher/students', {'params': {'limit': 100}}),
+                ('GET', '/teacher/lessons', {'params': {'limit': 100}}),
+                ('GET', f'/teacher/classes/{cid}/analytics', {}),
+                ('GET', f'/students/{sid}/progress', {}),
+                ('GET', f'/students/{sid}/assignments', {}),
+            ])
+        elif name == 'bulk_assign':
+            items = [f'bench-{rng.randrange(ITEMS)}' for _ in range(3)]
+            yield 'POST', '/teacher/assign_bulk', {'json': {'class_id': cid, 'item_ids': items}}
+        elif name == 'response_burst':
+            yield 'POST', f'/students/{sid}/responses', {'json': {'item_id': f'bench-{rng.randrange(ITEMS)}', 'answer': 'x'}}
+        elif name == 'csv_export':
+            yield 'GET', '/teacher/export_assignments', {'params': {'class_id': cid}}
+        else:
+            raise ValueError(f'unknown scenario {name}')
+
+
+async def run_scenario(base: str, name: str, data: dict, total: int, concurrency: int, warmup: int) -> dict:
+    rng = random.Random(name)
+    requests = make_requests(name, data, rng)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=120) as client:
+        r = await client.post('/token', data={'username': 'teacher', 'password': 'teacherpass'})
+        auth = {'Authorization': 'Bearer ' + r.json()['access_token']}
+        latencies, errors = [], {}
+
+        async def worker(count: int, record: bool):
+            for _ in range(count):
+                method, path, kwargs = next(requests)
+                t0 = time.perf_counter()
+                try:
+                    r = await client.request(method, path, headers=auth, **kwargs)
+                    await r.aread()
+                    status = r.status_code
+                except httpx.HTTPError as exc:
+                    status = type(exc).__name__
+                if record:
+                    latencies.append(time.perf_counter() - t0)
+                    if status != 200:
+                        errors[str(status)] = errors.get(str(status), 0) + 1
+
+        def split(n):
+            return [n // concurrency + (1 if i < n % concurrency else 0) for i in range(concurrency)]
+
+        await asyncio.gather(*(worker(n, False) for n in split(warmup)))
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n, True) for n in split(total)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    pct = lambda p: round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 3)
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'errors': errors,
+        'rps': round(total / elapsed, 1),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'p50_ms': pct(0.50),
+        'p95_ms': pct(0.95),
+        'p99_ms': pct(0.99),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(current: dict, baseline: dict) -> None:
+    print(f"\nvs {baseline['meta']['commit']} ({baseline['meta']['scale']} rows):")
+    for name, res in current['scenarios'].items():
+        old = baseline['scenarios'].get(name)
+        if not old:
+            continue
+        delta = lambda k: (res[k] - old[k]) / old[k] * 100 if old[k] else 0.0
+        print(f"{name:15s} rps {delta('rps'):+6.1f}%   p50 {delta('p50_ms'):+6.1f}%   p99 {delta('p99_ms'):+6.1f}%")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', default='100k', help='1k, 100k, 1m or a row count')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=2000, help='measured requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--out', help='result file (default bench_results/<commit>-<scale>-<time>.json)')
+    parser.add_argument('--compare', help='earlier result file to diff against')
+    args = parser.parse_args()
+    rows = parse_scale(args.scale)
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    for name in scenarios:
+        if name not in SCENARIOS:
+            parser.error(f'unknown scenario {name}; choose from {", ".join(SCENARIOS)}')
+
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_load.db')}"
+    t0 = time.perf_counter()
+    data = seed(url, rows, args.seed)
+    print(f"seeded {rows} rows ({data['students']} students, {data['classes']} classes) in {time.perf_counter() - t0:.1f}s")
+    port = free_port()
+    server = start_server(url, port, args.workers)
+    results = {}
+    try:
+        for name in scenarios:
+            res = asyncio.run(run_scenario(f'http://127.0.0.1:{port}', name, data, args.requests, args.concurrency,
+                                           warmup=min(args.requests, args.concurrency * 2)))
+            results[name] = res
+            print(f"{name:15s} {res['rps']:8.1f} req/s   p50 {res['p50_ms']:7.1f} ms   p95 {res['p95_ms']:7.1f} ms   "
+                  f"p99 {res['p99_ms']:7.1f} ms   errors {sum(res['errors'].values())}")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    commit = git_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'scale': rows,
+            'data': data,
+            'workers': args.workers,
+            'seed': args.seed,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'started_at': datetime.utcnow().isoformat(),
+        },
+        'scenarios': results,
+    }
+    out = args.out or os.path.join(PROJECT_ROOT, 'bench_results',
+                                   f"{commit}-{args.scale}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f'results: {out}')
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
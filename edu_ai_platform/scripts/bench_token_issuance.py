@@ -0,0 +1,72 @@
+"""
+Load test for POST /token: fire logins at a fixed concurrency against the app
+in-process and compare refresh-token persistence modes.
+  legacy       init_db() + one commit per login (previous behaviour)
+  sync         one commit per login, no schema work
+  write-behind queued rows, one transaction per batch (default)
+Run: python scripts/bench_token_issuance.py [--concurrency 200] [--requests 2000]
+"""
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import argparse
+import asyncio
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp, 'bench_token.db')}"
+
+import httpx
+from backend.app import token_store
+from backend.app.database import init_db, ensure_schema
+from backend.app.main import app
+
+
+def set_mode(mode):
+    original = getattr(set_mode, '_write', None) or token_store._write
+    set_mode._write = original
+    token_store.WRITE_BEHIND = mode == 'write-behind'
+    if mode == 'legacy':
+        def legacy_write(rows):
+            init_db()
+            original(rows)
+        token_store._write = legacy_write
+    else:
+        token_store._write = original
+
+
+async def run(mode, concurrency, total):
+    set_mode(mode)
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        async def one():
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post('/token', data={'username': 'teacher', 'password': 'teacherpass'})
+                latencies.append(time.perf_counter() - t0)
+                assert r.status_code == 200, r.status_code
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+    token_store.flush()
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+    return {'mode': mode, 'rps': total / elapsed, 'p50_ms': pct(0.50), 'p99_ms': pct(0.99)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--modes', default='legacy,sync,write-behind')
+    args = parser.parse_args()
+    ensure_schema()
+    print(f'POST /token x{args.requests} at concurrency {args.concurrency}')
+    for mode in args.modes.split(','):
+        res = asyncio.run(run(mode, args.concurrency, args.requests))
+        print(f"{res['mode']:14s} {res['rps']:8.1f} req/s   p50 {res['p50_ms']:7.1f} ms   p99 {res['p99_ms']:7.1f} ms")
@@ -0,0 +1,294 @@
+"""
+Generate a synthetic school district for benchmarks and scale testing.
+
+  schools -> grades -> classes (teacher t<school>-<n>) -> students
+  items per subject and grade, each with a Rasch difficulty
+  assignments: each student gets ~A items of their grade over the school year
+  responses: each assignment is answered with the student's engagement
+             probability; correctness ~ sigmoid(ability - difficulty)
+
+Classes are generated in parallel worker processes, each from its own RNG
+stream derived from --seed and the class number, so the output does not
+depend on the worker count. The parent writes rows with executemany in
+large transactions (secondary indexes are dropped and rebuilt when the
+tables start empty), then rebuilds the SubjectProgress summaries.
+
+  python scripts/generate_district.py --preset large          # ~10M rows
+  python scripts/generate_district.py --schools 5 --assignments 50 --seed 1
+Presets: small (~100k rows), district (~1M), large (~10M).
+"""
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import argparse
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+PRESETS = {
+    'small': {'schools': 2, 'classes_per_grade': 2, 'assignments': 80},
+    'district': {'schools': 10, 'classes_per_grade': 3, 'assignments': 110},
+    'large': {'schools': 20, 'classes_per_grade': 4, 'assignments': 420},
+}
+SUBJECTS = ('numeracy', 'literacy', 'science', 'social studies')
+FIRST_NAMES = ('Amina', 'Chinedu', 'Ngozi', 'Tunde', 'Zainab', 'Emeka', 'Fatima', 'Ibrahim', 'Kemi', 'Musa',
+               'Ada', 'Bola', 'Chioma', 'Dayo', 'Efe', 'Funmi', 'Garba', 'Halima', 'Ifeanyi', 'Jumoke')
+LAST_NAMES = ('Okafor', 'Adeyemi', 'Bello', 'Eze', 'Mohammed', 'Okonkwo', 'Ibrahim', 'Balogun', 'Nwosu', 'Yusuf')
+OPTIONS = ('A', 'B', 'C', 'D')
+SCHOOL_YEAR_START = np.datetime64('2025-09-08T00:00:00')
+SCHOOL_DAYS = 180
+WRITE_CHUNK = 100_000
+
+
+class ClassPlan(NamedTuple):
+    number: int  # 0-based class index; RNG stream and classroom id offset
+    school: int
+    grade: int
+    section: int
+    first_student: int  # global student index of the first student
+    size: int
+
+
+def plan_classes(schools: int, grades: List[int], classes_per_grade: int, class_size: int, seed: int) -> List[ClassPlan]:
+    rng = np.random.default_rng([seed, 0])
+    plans, student = [], 0
+    for school in range(schools):
+        for grade in grades:
+            for section in range(classes_per_grade):
+                size = int(np.clip(rng.normal(class_size, class_size * 0.15), class_size // 2, class_size * 3 // 2))
+                plans.append(ClassPlan(len(plans), school, grade, section, student, size))
+                student += size
+    return plans
+
+
+def make_items(grades: List[int], per_set: int, seed: int) -> Dict[int, Dict[str, Any]]:
+    """Per grade: item ids, subjects and Rasch difficulties (harder within a set as the index grows)."""
+    rng = np.random.default_rng([seed, 1])
+    items = {}
+    for grade in grades:
+        ids, subjects, difficulty = [], [], []
+        for subject in SUBJECTS:
+            for i in range(per_set):
+                ids.append(f"{subject[:3]}-g{grade}-{i:04d}")
+                subjects.append(subject)
+            difficulty.append(np.sort(rng.normal(0.0, 1.0, per_set)))
+        items[grade] = {'ids': ids, 'subjects': subjects, 'difficulty': np.concatenate(difficulty)}
+    return items
+
+
+_ITEMS: Dict[int, Dict[str, Any]] = {}
+_SETTINGS: Dict[str, Any] = {}
+
+
+def _worker_init(items, settings):
+    _ITEMS.update(items)
+    _SETTINGS.update(settings)
+
+
+def _timestamps(rng, n: int) -> np.ndarray:
+    """School-day timestamps (weekdays, 08:00-15:00) spread over the year."""
+    day = rng.integers(0, SCHOOL_DAYS, n)
+    calendar_day = day // 5 * 7 + day % 5  # skip weekends
+    seconds = rng.integers(8 * 3600, 15 * 3600, n)
+    return SCHOOL_YEAR_START + calendar_day.astype('timedelta64[D]') + seconds.astype('timedelta64[s]')
+
+
+def generate_class(plan: ClassPlan, classroom_id: int) -> Dict[str, list]:
+    """Rows for one class: students, assignments and responses, as tuples in column order."""
+    seed = _SETTINGS['seed']
+    rng = np.random.default_rng([seed, 2, plan.number])
+    items = _ITEMS[plan.grade]
+    pool = len(items['ids'])
+    class_effect = rng.normal(0.0, 0.3)
+    students, assignments, responses = [], [], []
+    for k in range(plan.size):
+        n = plan.first_student + k
+        student_id = f"d{plan.school:03d}-{n:07d}"
+        name = f"{FIRST_NAMES[rng.integers(len(FIRST_NAMES))]} {LAST_NAMES[rng.integers(len(LAST_NAMES))]}"
+        students.append((student_id, name, plan.grade, classroom_id))
+        ability = rng.normal(0.0, 1.0) + class_effect
+        engagement = rng.beta(8, 2) * _SETTINGS['response_rate'] / 0.8
+        count = min(pool, int(rng.poisson(_SETTINGS['assignments'])))
+        if count == 0:
+            continue
+        chosen = rng.choice(pool, size=count, replace=False)
+        assigned = np.sort(_timestamps(rng, count))
+        assigned_s = np.datetime_as_string(assigned, unit='s')
+        for item, at in zip(chosen, assigned_s):
+            assignments.append((student_id, items['ids'][item], str(at)))
+        answered = rng.random(count) < min(engagement, 1.0)
+        if not answered.any():
+            continue
+        delay = rng.exponential(20 * 3600, count).astype('timedelta64[s]')
+        submitted_s = np.datetime_as_string(assigned + delay, unit='s')
+        p = 1.0 / (1.0 + np.exp(-(ability - items['difficulty'][chosen])))
+        correct = rng.random(count) < p
+        wrong = rng.integers(1, len(OPTIONS), count)
+        for j in np.flatnonzero(answered):
+            # option A is the key for generated items; wrong answers pick another option
+            answer = OPTIONS[0] if correct[j] else OPTIONS[wrong[j]]
+            responses.append((student_id, items['ids'][chosen[j]], answer, bool(correct[j]), str(submitted_s[j])))
+    return {'students': students, 'assignments': assignments, 'responses': responses}
+
+
+def _generate(args):
+    return generate_class(*args)
+
+
+def generate(schools: int = 2, grades: Optional[List[int]] = None, classes_per_grade: int = 2, class_size: int = 28,
+             assignments: int = 80, response_rate: float = 0.8, items_per_set: int = 200, seed: int = 42,
+             workers: Optional[int] = None, progress=None) -> Dict[str, Any]:
+    """Write a district into the configured database (DATABASE_URL); returns row counts and timings."""
+    from sqlalchemy import func, select, text
+    from backend.app.database import IS_SQLITE, engine, init_db, write_sync
+    from backend.app.models import Assignment, Classroom, Lesson, Student, StudentResponse
+    from backend.app.progress import rebuild as rebuild_progress
+
+    grades = grades or [1, 2, 3, 4, 5, 6]
+    started = time.perf_counter()
+    init_db()
+    plans = plan_classes(schools, grades, classes_per_grade, class_size, seed)
+    items = make_items(grades, items_per_set, seed)
+    tables = {'students': Student.__table__, 'assignments': Assignment.__table__, 'responses': StudentResponse.__table__}
+    columns = {
+        'students': ('student_id', 'name', 'grade', 'class_id'),
+        'assignments': ('student_id', 'item_id', 'assigned_at'),
+        'responses': ('student_id', 'item_id', 'answer', 'correct', 'submitted_at'),
+    }
+    marker = '?' if engine.dialect.paramstyle == 'qmark' else '%s'
+    sql = {k: f"INSERT INTO {tables[k].name} ({', '.join(cols)}) VALUES ({', '.join([marker] * len(cols))})"
+           for k, cols in columns.items()}
+    counts = {'classrooms': len(plans), 'lessons': 0, 'students': 0, 'assignments': 0, 'responses': 0}
+
+    with engine.begin() as conn:
+        first_class = (conn.execute(select(func.max(Classroom.id))).scalar() or 0) + 1
+        empty = all(conn.execute(select(func.count()).select_from(t)).scalar() == 0 for t in tables.values())
+        if IS_SQLITE:
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        conn.exec_driver_sql(
+            f"INSERT INTO {Classroom.__table__.name} (id, name, teacher_id) VALUES ({marker}, {marker}, {marker})",
+            [(first_class + p.number, f"School {p.school + 1} Grade {p.grade}{'ABCDEFGH'[p.section % 8]}",
+              f"t{p.school + 1}-{p.grade}{p.section}") for p in plans])
+        existing = set(conn.execute(select(Lesson.item_id).where(Lesson.source == 'district')).scalars())
+        lessons = [(item_id, subject, f"{subject.title()} practice {item_id} (grade {grade})", 'district', grade,
+                    json.dumps(list(OPTIONS)))
+                   for grade, g in items.items() for item_id, subject in zip(g['ids'], g['subjects']) if item_id not in existing]
+        if lessons:
+            conn.exec_driver_sql(
+                f"INSERT INTO {Lesson.__table__.name} (item_id, subject, prompt, source, grade, options) "
+                f"VALUES ({', '.join([marker] * 6)})", lessons)
+        counts['lessons'] = len(lessons)
+        # bulk loads into empty tables are much faster without the secondary indexes
+        dropped = [idx for t in tables.values() for idx in t.indexes] if empty else []
+        for idx in dropped:
+            idx.drop(conn, checkfirst=True)
+
+    pending = {k: [] for k in columns}
+
+    def flush(force: bool = False):
+        if not force and sum(len(v) for v in pending.values()) < WRITE_CHUNK:
+            return
+        with engine.begin() as conn:
+            if IS_SQLITE:
+                conn.exec_driver_sql("PRAGMA synchronous=OFF")
+            for kind, rows in pending.items():
+                if rows:
+                    conn.exec_driver_sql(sql[kind], rows)
+                    counts[kind] += len(rows)
+                    rows.clear()
+        if progress:
+            progress(counts, time.perf_counter() - started)
+
+    settings = {'seed': seed, 'assignments': assignments, 'response_rate': response_rate}
+    work = [(p, first_class + p.number) for p in plans]
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        _worker_init(items, settings)
+        for rows in map(_generate, work):
+            for kind in columns:
+                pending[kind].extend(rows[kind])
+            flush()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init, initargs=(items, settings)) as pool:
+            # a bounded window of classes in flight keeps memory flat when the writer is the bottleneck
+            window = deque(pool.submit(_generate, w) for w in work[:workers * 4])
+            queued = len(window)
+            while window:
+                rows = window.popleft().result()  # in class order, so ids are reproducible
+                if queued < len(work):
+                    window.append(pool.submit(_generate, work[queued]))
+                    queued += 1
+                for kind in columns:
+                    pending[kind].extend(rows[kind])
+                flush()
+    flush(force=True)
+    generated = time.perf_counter() - started
+
+    with engine.begin() as conn:
+        for idx in dropped:
+            idx.create(conn, checkfirst=True)
+        if IS_SQLITE:
+            conn.execute(text("ANALYZE"))
+    indexed = time.perf_counter() - started
+    write_sync(rebuild_progress)
+    elapsed = time.perf_counter() - started
+    total = counts['students'] + counts['assignments'] + counts['responses']
+    return {
+        **counts,
+        'rows': total,
+        'seed': seed,
+        'seconds': {'load': round(generated, 1), 'indexes': round(indexed - generated, 1),
+                    'progress': round(elapsed - indexed, 1), 'total': round(elapsed, 1)},
+        'rows_per_sec': round(total / generated) if generated else None,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--preset', choices=sorted(PRESETS), help='size preset (flags below override it)')
+    parser.add_argument('--schools', type=int)
+    parser.add_argument('--grades', default='1-6', help='e.g. 1-6 or 3,4,5')
+    parser.add_argument('--classes-per-grade', type=int)
+    parser.add_argument('--class-size', type=int, default=28, help='mean class size')
+    parser.add_argument('--assignments', type=int, help='mean assignments per student')
+    parser.add_argument('--response-rate', type=float, default=0.8, help='mean share of assignments answered')
+    parser.add_argument('--items', type=int, default=200, help='items per subject and grade')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=None, help='generator processes (default: CPU count)')
+    parser.add_argument('--database-url', help='default: DATABASE_URL')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    if '-' in args.grades:
+        lo, hi = (int(g) for g in args.grades.split('-'))
+        grades = list(range(lo, hi + 1))
+    else:
+        grades = [int(g) for g in args.grades.split(',')]
+    params = dict(PRESETS.get(args.preset or 'small'))
+    for name in ('schools', 'classes_per_grade', 'assignments'):
+        if getattr(args, name) is not None:
+            params[name] = getattr(args, name)
+
+    def progress(counts, seconds):
+        if not args.json:
+            done = counts['students'] + counts['assignments'] + counts['responses']
+            print(f"\r{done:>12,} rows  {seconds:6.1f}s", end='', flush=True)
+
+    report = generate(grades=grades, class_size=args.class_size, response_rate=args.response_rate,
+                      items_per_set=args.items, seed=args.seed, workers=args.workers, progress=progress, **params)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print()
+        print(f"{report['classrooms']} classes, {report['students']:,} students, {report['lessons']} new items, "
+              f"{report['assignments']:,} assignments, {report['responses']:,} responses")
+        print(f"{report['rows']:,} rows in {report['seconds']['total']}s "
+              f"({report['rows_per_sec']:,} rows/s load, {report['seconds']['indexes']}s indexes, "
+              f"{report['seconds']['progress']}s progress)")
@@ -0,0 +1,38 @@
+"""
+Ingest item banks into the Lesson table (incremental; unchanged items are skipped).
+Banks are item_banks/<source>/*.json (JSON array) or *.ndjson / *.jsonl.
+
+    python scripts/ingest_item_banks.py                  # every bank under item_banks/
+    python scripts/ingest_item_banks.py --workers 4 a.ndjson b.json
+    python scripts/ingest_item_banks.py --json           # machine-readable report
+"""
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import argparse
+import json
+
+from backend.app.database import init_db
+from backend.app.ingest import ingest_banks
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paths', nargs='*', help='bank files (default: all banks under item_banks/)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per bank, up to CPU count)')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+    init_db()
+    report = ingest_banks(args.paths or None, workers=args.workers)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        sys.exit(0)
+    print(f"{'bank':50s} {'added':>7s} {'updated':>8s} {'unchanged':>10s} {'invalid':>8s} {'items/s':>10s}")
+    for b in report['banks']:
+        print(f"{os.path.relpath(b['path'], PROJECT_ROOT)[-50:]:50s} {b['added']:7d} {b['updated']:8d} {b['unchanged']:10d} "
+              f"{b['invalid']:8d} {b['items_per_sec'] or 0:10.0f}")
+        for err in b['errors']:
+            print(f'    ! {err}')
+    print(f"total: {report['added']} added, {report['updated']} updated, {report['unchanged']} unchanged, "
+          f"{report['invalid']} invalid in {report['elapsed_ms']:.0f} ms ({report['workers']} workers)")
@@ -0,0 +1,19 @@
+"""
+Recompute the SubjectProgress summaries from the full response table.
+Run after bulk-loading responses outside the API or after changing lesson subjects:
+
+    python scripts/rebuild_progress.py
+"""
+import sys, os, time
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from backend.app.database import init_db, write_sync
+from backend.app.progress import rebuild
+
+if __name__ == '__main__':
+    init_db()
+    t0 = time.perf_counter()
+    rows = write_sync(rebuild)
+    print(f'Rebuilt {rows} subject summaries in {(time.perf_counter() - t0) * 1000:.1f} ms')
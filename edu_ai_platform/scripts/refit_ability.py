@@ -0,0 +1,28 @@
+"""
+Fit Rasch ability/difficulty from the response table and report timings.
+The API refits in-process every ABILITY_REFIT_SECONDS (default nightly) and
+on POST /admin/ability/refit; this script runs the same fit offline, e.g.
+against a copy of production data:
+
+    DATABASE_URL=sqlite:///copy.db python scripts/refit_ability.py
+"""
+import sys, os, time
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from backend.app.ability import MODEL
+from backend.app.database import init_db
+
+if __name__ == '__main__':
+    init_db()
+    stats = MODEL.refit()
+    print(f"fit {stats['responses']} responses / {stats['students']} students / {stats['items']} items "
+          f"({stats['lessons']} lessons) in {stats['elapsed_ms']} ms")
+    sample = MODEL.students.keys[:1000]
+    if sample:
+        t0 = time.perf_counter()
+        for sid in sample:
+            MODEL.next_item(sid)
+        per_pick = (time.perf_counter() - t0) / len(sample) * 1e6
+        print(f'next_item: {per_pick:.1f} us per pick over {len(sample)} students')
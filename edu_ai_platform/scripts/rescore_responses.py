@@ -0,0 +1,21 @@
+"""
+Re-grade stored responses against the item-bank answer keys.
+Run after editing an item bank's correct_answer values:
+
+    python scripts/rescore_responses.py                 # every response
+    python scripts/rescore_responses.py g4-num-001 ...  # only these items
+"""
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from backend.app.database import init_db
+from backend.app.scoring import KEYS, iter_bank_items, rescore
+
+if __name__ == '__main__':
+    init_db()
+    KEYS.load(iter_bank_items())
+    result = rescore(sys.argv[1:] or None)
+    print(f"keys: {result['keys']}  scanned: {result['scanned']}  changed: {result['changed']}")
+    print(f"elapsed: {result['elapsed_ms']} ms  ({result['scored_per_sec']} responses/sec)")
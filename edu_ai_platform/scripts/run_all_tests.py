@@ -1,5 +1,6 @@
 """
-Run the Option A–D test scripts sequentially and stop on failure.
+Run the Option A–E test scripts, the ingestion test, the query-plan check and the
+query-budget check sequentially and stop on failure.
 Run: python scripts/run_all_tests.py
 """
 import subprocess
@@ -12,6 +13,10 @@ TEST_SCRIPTS = [
     'scripts/test_optionB_client.py',
     'scripts/test_optionC_client.py',
     'scripts/test_optionD_client.py',
+    'scripts/test_optionE_client.py',
+    'scripts/test_item_bank_ingest.py',
+    'scripts/test_query_plans.py',
+    'scripts/test_query_budgets.py',
 ]
 
 def run_script(path):
@@ -0,0 +1,98 @@
+"""
+Item-bank ingestion test: JSON-array and NDJSON banks are ingested in
+parallel, re-ingesting is a no-op, and only edited items are updated (and
+re-indexed by the lesson search index).
+Run: python scripts/test_item_bank_ingest.py
+"""
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import json
+import tempfile
+from pathlib import Path
+
+from sqlmodel import select
+
+from backend.app.database import get_session, init_db
+from backend.app.ingest import content_hash, ingest_banks, iter_items
+from backend.app.models import Lesson
+from backend.app.search import SearchIndex
+
+
+def main():
+    init_db()
+
+    print('Test: item-bank ingestion')
+    print('=' * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bank_a = Path(tmp) / f'bank-a-{os.getpid()}' / 'grade5_items.json'
+        bank_b = Path(tmp) / f'bank-b-{os.getpid()}' / 'items.ndjson'
+        bank_a.parent.mkdir()
+        bank_b.parent.mkdir()
+        items_a = [{'item_id': f'g5-{i:04d}', 'subject': 'numeracy', 'prompt': f'{i} + 1?', 'correct_answer': str(i + 1)} for i in range(2500)]
+        bank_a.write_text(json.dumps(items_a, indent=1), encoding='utf-8')
+        lines = [json.dumps({'item_id': f'g6-{i:04d}', 'subject': 'literacy', 'grade': 6, 'prompt': f'Word {i}'}) for i in range(300)]
+        lines.insert(10, '{not json')
+        lines.insert(20, json.dumps({'subject': 'literacy'}))
+        bank_b.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+        print('\n1. Streaming reader matches a full parse')
+        assert list(iter_items(bank_a)) == items_a
+
+        print('\n2. First ingest adds everything (2 worker processes)')
+        report = ingest_banks([bank_a, bank_b], workers=2)
+        for b in report['banks']:
+            print(f"{Path(b['path']).name}: +{b['added']} ~{b['updated']} ={b['unchanged']} !{b['invalid']} {b['errors'][:2]}")
+        assert report['workers'] == 2
+        assert (report['added'], report['updated'], report['unchanged'], report['invalid']) == (2800, 0, 0, 2)
+
+        print('\n3. Re-ingest is a no-op')
+        report = ingest_banks([bank_a, bank_b], workers=2)
+        assert (report['added'], report['updated'], report['unchanged']) == (0, 0, 2800) and not report['changed']
+
+        index = SearchIndex()
+        index.sync()
+
+        def hits(query, **kw):
+            return [(r['source'], r['item_id'], r['score']) for r in index.search(query, limit=100, **kw)['results']
+                    if r['source'] in (bank_a.parent.name, bank_b.parent.name)]
+
+        print('\n4. Editing one item updates only that item')
+        items_a[7]['prompt'] = 'Edited prompt'
+        items_a.append({'item_id': 'g5-new', 'subject': 'numeracy', 'prompt': 'New'})
+        bank_a.write_text(json.dumps(items_a), encoding='utf-8')
+        report = ingest_banks([bank_a], workers=1)
+        print(f"added={report['added']} updated={report['updated']} unchanged={report['unchanged']} in {report['elapsed_ms']} ms")
+        assert (report['added'], report['updated'], report['unchanged']) == (1, 1, 2499)
+
+        with get_session() as sess:
+            row = sess.exec(select(Lesson).where(Lesson.source == bank_a.parent.name, Lesson.item_id == 'g5-0007')).one()
+            assert row.prompt == 'Edited prompt' and row.grade == 5 and row.content_hash == content_hash(items_a[7])
+            row = sess.exec(select(Lesson).where(Lesson.source == bank_b.parent.name, Lesson.item_id == 'g6-0001')).one()
+            assert row.grade == 6 and row.subject == 'literacy'
+
+        print('\n5. Lesson search picks up the edit incrementally')
+        assert index.sync() == 2
+        src = bank_a.parent.name
+        assert hits('edited') == [(src, 'g5-0007', 3)]
+        assert hits('EDI prompt') == [(src, 'g5-0007', 5)]
+        assert hits('word 299', subject='literacy') == [(bank_b.parent.name, 'g6-0299', 6)]
+        assert hits('word 299', subject='numeracy') == []
+        items_a[7]['prompt'] = 'Zanzibar quokka'
+        bank_a.write_text(json.dumps(items_a), encoding='utf-8')
+        ingest_banks([bank_a], workers=1)
+        assert index.sync() == 1
+        assert hits('edited') == [] and hits('zanzibar quokka') == [(src, 'g5-0007', 6)]
+        assert hits('quoka') == [(src, 'g5-0007', 1)]  # one typo
+        assert index.sync() == 0
+
+    print('\n✓ Item-bank ingestion tests passed!')
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    # worker processes are spawned and re-import this module
+    main()
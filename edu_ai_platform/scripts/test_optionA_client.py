@@ -3,7 +3,12 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
+import asyncio
+import time
+from unittest import mock
+
 from fastapi.testclient import TestClient
+from backend.app import auth, main, ratelimit
 from backend.app.main import app
 
 client = TestClient(app)
@@ -44,5 +49,83 @@ r5 = client.get('/me')
 print(f'GET /me without token status: {r5.status_code}')
 assert r5.status_code == 401, f"Expected 401, got {r5.status_code}"
 
+print('\n6. Test repeated failed logins are throttled before the handler runs')
+with mock.patch.object(ratelimit, 'STORE', ratelimit.MemoryStore()), \
+        mock.patch.object(main, 'authenticate_user', wraps=main.authenticate_user) as check:
+    attacker = TestClient(app, client=('203.0.113.7', 40000))
+    codes = [attacker.post('/token', data={'username': 'student', 'password': f'guess{n}'}).status_code for n in range(6)]
+    print(f'Failed logins for one user: {codes}')
+    assert codes == [400] * 5 + [429] and check.call_count == 5
+    r = attacker.post('/token', data={'username': 'Student', 'password': 'studentpass'})
+    assert r.status_code == 429 and int(r.headers['retry-after']) >= 1 and check.call_count == 5
+    # other users from another address are unaffected; a success refills that user's bucket
+    other = TestClient(app, client=('198.51.100.2', 40000))
+    for _ in range(4):
+        assert other.post('/token', data={'username': 'admin', 'password': 'nope'}).status_code == 400
+    assert other.post('/token', data={'username': 'admin', 'password': 'adminpass'}).status_code == 200
+    assert other.post('/token', data={'username': 'admin', 'password': 'nope'}).status_code == 400
+    # the per-address bucket catches spraying across usernames
+    codes = [attacker.post('/token', data={'username': f'user{n}', 'password': 'x'}).status_code for n in range(20)]
+    assert codes.index(429) == 15 and set(codes[15:]) == {429}
+    assert attacker.post('/token/refresh', json={'refresh_token': 'forged'}).status_code == 429
+    # memory stays bounded under address rotation
+    store = ratelimit.MemoryStore(max_keys=100)
+    for n in range(1000):
+        store.consume(f'ip:10.0.{n // 256}.{n % 256}', ratelimit.IP_RULE, 0.0)
+    assert len(store) == 100 and store.retry_after('ip:10.0.3.231', ratelimit.IP_RULE, 0.0) == 0.0
+    # stores must implement the whole interface
+    class PartialStore(ratelimit.RateLimitStore):
+        def retry_after(self, key, rule, now):
+            return 0.0
+    try:
+        PartialStore()
+        raise AssertionError('incomplete RateLimitStore instantiated')
+    except TypeError:
+        pass
+    # an oversized body is refused after at most MAX_BODY_PARSE bytes, before the endpoint runs
+    chunks = [{'type': 'http.request', 'body': bytes([n]) * 1024, 'more_body': n < 63} for n in range(64)]
+    received, sent = [], []
+    async def receive():
+        received.append(1)
+        return chunks[len(received) - 1]
+    async def endpoint(scope, receive, send):
+        raise AssertionError('endpoint reached')
+    async def send(message):
+        sent.append(message)
+    middleware = ratelimit.RateLimitMiddleware(endpoint, store=ratelimit.MemoryStore())
+    scope = {'type': 'http', 'method': 'POST', 'path': '/token', 'headers': [], 'client': ('192.0.2.1', 1)}
+    asyncio.run(middleware(scope, receive, send))
+    assert sent[0]['status'] == 413 and len(received) <= ratelimit.MAX_BODY_PARSE // 1024 + 1
+    # padding a login form does not get around the per-user bucket
+    padded = TestClient(app, client=('192.0.2.9', 40000))
+    pad = 'x' * ratelimit.MAX_BODY_PARSE
+    checked = check.call_count
+    codes = [padded.post('/token', data={'username': 'admin', 'password': f'guess{n}', 'pad': pad}).status_code for n in range(3)]
+    assert codes == [413] * 3 and check.call_count == checked
+    assert padded.post('/token', data={'username': 'admin', 'password': 'adminpass', 'pad': pad}).status_code == 413
+    codes = [padded.post('/token', data={'username': 'teacher', 'password': f'guess{n}'}).status_code for n in range(6)]
+    assert codes == [400] * 5 + [429], codes
+
+print('\n7. Test verified access tokens are cached until they expire')
+cache = auth.TokenCache(size=2)
+with mock.patch.object(auth, 'TOKEN_CACHE', cache), mock.patch.object(auth.jwt, 'decode', wraps=auth.jwt.decode) as decode:
+    for _ in range(5):
+        assert client.get('/me', headers={'Authorization': f'Bearer {access_token}'}).json()['username'] == 'teacher'
+    assert decode.call_count == 1 and cache.stats()['hits'] == 4
+    expiring = auth.create_access_token({'sub': 'admin', 'role': 'admin'}, expires_delta=1)
+    assert client.get('/admin-only', headers={'Authorization': f'Bearer {expiring}'}).status_code == 200
+    with mock.patch.object(auth.time, 'time', return_value=time.time() + 5):
+        assert cache.get(expiring) is None and cache.stats()['expired'] == 1
+    for n in range(3):
+        token = auth.create_access_token({'sub': f'u{n}', 'role': 'student'})
+        assert client.get('/me', headers={'Authorization': f'Bearer {token}'}).status_code == 200
+    assert cache.stats()['size'] == 2 and cache.stats()['evicted'] >= 1
+    # cached or not, a bad token is still rejected and refresh tokens are never cached
+    assert client.get('/me', headers={'Authorization': f'Bearer {access_token}x'}).status_code == 401
+    refresh = auth.create_refresh_token({'sub': 'teacher', 'role': 'teacher'})
+    client.get('/me', headers={'Authorization': f'Bearer {refresh}'})
+    assert cache.get(refresh) is None
+print(f'Cache stats: {cache.stats()}')
+
 print('\n✓ Test Option A: All basic login flow tests passed!')
 sys.exit(0)
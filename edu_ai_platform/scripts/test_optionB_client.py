@@ -3,7 +3,15 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
+import gzip
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+
 from fastapi.testclient import TestClient
+from backend.app import auth_log, database, metrics
 from backend.app.main import app
 
 client = TestClient(app)
@@ -60,5 +68,133 @@ r = client.get('/admin-only', headers={'Authorization': f'Bearer {teacher_token}
 print(f'Teacher access to /admin-only: {r.status_code}')
 assert r.status_code == 403, f"Expected 403, got {r.status_code}"
 
+print('\n10. Test denials reach the buffered auth log')
+r = client.get('/admin/auth_logs', headers={'Authorization': f'Bearer {admin_token}'}, params={'limit': 5})
+assert r.status_code == 200
+logs, logger = r.json()['logs'], r.json()['logger']
+print(f'Logger: {logger}')
+assert logs[-1]['path'] == '/admin-only' and logs[-1]['status'] == 403 and logger['pending'] == 0
+
+print('\n11. Test a denial burst does not wait on the disk; rotation is gzipped')
+with tempfile.TemporaryDirectory() as tmp:
+    saved = auth_log.LOG_DIR, auth_log.LOG_FILE, auth_log.MAX_BYTES, auth_log.BACKUPS
+    auth_log.LOG_DIR, auth_log.LOG_FILE = Path(tmp), Path(tmp) / 'auth_events.jsonl'
+    auth_log.MAX_BYTES, auth_log.BACKUPS = 20_000, 2
+    try:
+        assert auth_log.flush(timeout=5)
+        before = auth_log.stats()
+        started = time.perf_counter()
+        for n in range(2000):
+            denied = n % 100 == 0
+            auth_log.record_event({'path': '/admin-only' if denied else '/token', 'method': 'POST', 'status': 403 if denied else 401, 'n': n})
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        assert auth_log.flush(timeout=10)
+        after = auth_log.stats()
+        print(f'2000 events queued in {elapsed_ms:.1f} ms; {after["rotations"] - before["rotations"]} rotations')
+        assert after['written'] - before['written'] == 2000 and after['dropped'] == before['dropped']
+        rotated = sorted(Path(tmp).glob('auth_events.*.jsonl.gz'))
+        assert after['rotations'] > 2 and len(rotated) == 2
+        kept = [json.loads(l)['n'] for f in rotated for l in gzip.open(f, 'rt')]
+        kept += [json.loads(l)['n'] for l in auth_log.LOG_FILE.open()]
+        assert kept == list(range(2000 - len(kept), 2000))
+        assert auth_log.LOG_FILE.stat().st_size <= 20_000
+
+        print('\n12. Test paging back through rotated files, filters and unindexed logs')
+        def walk(**filters):
+            pages, cursor = [], None
+            while True:
+                page = auth_log.query_events(150, cursor, **filters)
+                pages.append([e['n'] for e in page['logs']])
+                cursor = page['next_cursor']
+                if not cursor:
+                    return pages
+        pages = walk()
+        assert [n for page in reversed(pages) for n in page] == kept and all(len(p) == 150 for p in pages[:-1])
+        assert auth_log.recent_events(3) == [json.loads(l) for l in auth_log.LOG_FILE.read_text().splitlines()[-3:]]
+        assert walk(status=403) == [[n for n in kept if n % 100 == 0]]
+        assert walk(path='/admin-only', status=401) == [[]]
+        stamps = {e['n']: e['timestamp'] for e in auth_log.query_events(1000)['logs']}
+        lo, hi = min(stamps), max(stamps)
+        window = walk(since=stamps[lo + 10], until=stamps[lo + 20])
+        assert window == [[n for n in kept if stamps[lo + 10] <= stamps.get(n, '') < stamps[lo + 20]]]
+        # the cursor stays valid when its file rotates underneath it
+        first = auth_log.query_events(150)
+        auth_log.BACKUPS = 10
+        for n in range(2000, 2400):
+            denied = n % 100 == 0
+            auth_log.record_event({'path': '/admin-only' if denied else '/token', 'method': 'POST', 'status': 403 if denied else 401, 'n': n})
+        assert auth_log.flush(timeout=10)
+        rest = auth_log.query_events(150, first['next_cursor'])
+        assert rest['logs'][-1]['n'] == first['logs'][0]['n'] - 1
+        # without the sidecar index blocks are scanned, with the same answers
+        before_index = walk(status=403)
+        for idx in Path(tmp).glob('*.idx'):
+            idx.unlink()
+        assert walk(status=403) == before_index
+        r = client.get('/admin/auth_logs', headers={'Authorization': f'Bearer {admin_token}'}, params={'cursor': 'junk'})
+        assert r.status_code == 400
+        r = client.get('/admin/auth_logs', headers={'Authorization': f'Bearer {admin_token}'}, params={'status': 403, 'limit': 2})
+        assert r.status_code == 200 and [e['n'] for e in r.json()['logs']] == [2200, 2300]
+        # a full queue drops (and counts) instead of blocking
+        saved_queue, auth_log._queue = auth_log._queue, auth_log.queue.Queue(maxsize=1)
+        try:
+            auth_log._queue.put_nowait({})
+            auth_log.record_event({'path': '/token'})
+            assert auth_log.stats()['dropped'] == after['dropped'] + 1
+        finally:
+            auth_log._queue = saved_queue
+    finally:
+        auth_log.LOG_DIR, auth_log.LOG_FILE, auth_log.MAX_BYTES, auth_log.BACKUPS = saved
+
+print('\n13. Test /metrics: per-route latency and SQL query counts (opt-in)')
+teacher = {'Authorization': f'Bearer {teacher_token}'}
+assert client.get('/metrics').status_code == 404
+metrics.ENABLED = True
+metrics.instrument_engine(database.engine)
+try:
+    for _ in range(3):
+        r = client.get('/students/s1/progress', headers=teacher)
+        assert r.status_code == 200
+    timing = r.headers['server-timing']
+    print(f'Server-Timing: {timing}')
+    assert 'db;dur=' in timing and ' 0 queries' not in timing
+    assert client.get('/teacher/students', headers={'Authorization': f'Bearer {student_token}'}).status_code == 403
+    r = client.get('/metrics')
+    assert r.status_code == 200 and r.headers['content-type'].startswith('text/plain')
+    lines = {l.rsplit(' ', 1)[0]: float(l.rsplit(' ', 1)[1]) for l in r.text.splitlines() if not l.startswith('#')}
+    route = 'method="GET",route="/students/{student_id}/progress"'
+    assert lines[f'edu_http_request_duration_seconds_count{{{route}}}'] == 3
+    assert lines[f'edu_http_request_queries_count{{{route}}}'] == 3 and lines[f'edu_http_request_queries_max{{{route}}}'] >= 1
+    assert lines[f'edu_http_requests_total{{{route},status="200"}}'] == 3
+    assert lines['edu_http_requests_total{method="GET",route="/teacher/students",status="403"}'] == 1
+    assert any(k.startswith('edu_db_query_duration_seconds_count{operation="select",route="/students/{student_id}/progress"')
+               for k in lines)
+    assert 'edu_token_cache_hits' in lines and 'edu_auth_log_written' in lines
+    print(f'{len(lines)} samples exported')
+finally:
+    metrics.ENABLED = False
+
+print('\n14. Test the admin sampling profiler sees a busy thread')
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+stop = threading.Event()
+worker = threading.Thread(target=busy_loop, args=(stop,), name='busy')
+worker.start()
+try:
+    r = client.get('/admin/profile', headers={'Authorization': f'Bearer {admin_token}'}, params={'seconds': 0.5, 'interval_ms': 2})
+finally:
+    stop.set()
+    worker.join()
+assert r.status_code == 200
+prof = r.json()
+print(f"{prof['samples']} samples; top: {prof['top'][0]}")
+assert prof['samples'] > 10 and any(line.startswith('busy;') for line in prof['collapsed'].splitlines())
+assert any('busy_loop' in t['function'] or 'genexpr' in t['function'] for t in prof['top'][:3])
+r = client.get('/admin/profile', headers={'Authorization': f'Bearer {admin_token}'}, params={'seconds': 0.1, 'format': 'collapsed'})
+assert r.status_code == 200 and r.headers['content-type'].startswith('text/plain')
+assert client.get('/admin/profile', headers={'Authorization': f'Bearer {admin_token}'}, params={'format': 'svg'}).status_code == 400
+assert client.get('/admin/profile', headers=teacher).status_code == 403
+
 print('\n✓ Test Option B: All RBAC tests passed!')
 sys.exit(0)
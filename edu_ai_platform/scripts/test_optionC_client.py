@@ -3,10 +3,18 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
+import gzip
+import json
+import uuid
+from datetime import datetime
 from fastapi.testclient import TestClient
 from backend.app.main import app
 from backend.app.database import init_db, get_session
-from backend.app.models import Student, Lesson
+from backend.app.analytics import CUBE as ANALYTICS
+from backend.app.catalog import CATALOG
+from backend.app.export import iter_batches as export_iter_batches
+from backend.app.search import INDEX as LESSON_SEARCH
+from backend.app.models import Assignment, Classroom, Student, Lesson
 from sqlmodel import select
 
 init_db()
@@ -98,5 +106,200 @@ if len(students_data['students']) > 1 and len(lessons_data['lessons']) > 0:
     bulk_data = r.json()
     print(f'Bulk assignment created: {len(bulk_data["assigned_ids"])} assignments')
 
+    print('\n7. Test bulk assignment matrix (items x students) is deduped')
+    matrix = {
+        'student_ids': [s['id'] for s in students_data['students'][:2]],
+        'item_ids': [l['item_id'] for l in lessons_data['lessons'][:2]],
+    }
+    r = client.post('/teacher/assign_bulk', headers={'Authorization': f'Bearer {teacher_token}'}, json=matrix)
+    assert r.status_code == 200
+    first = r.json()
+    assert len(first['assigned_ids']) + first['skipped'] == len(matrix['student_ids']) * len(matrix['item_ids'])
+    print(f'Matrix assigned: {len(first["assigned_ids"])}, skipped: {first["skipped"]}, rows/sec: {first["rows_per_sec"]}')
+    r = client.post('/teacher/assign_bulk', headers={'Authorization': f'Bearer {teacher_token}'}, json=matrix)
+    assert r.status_code == 200
+    again = r.json()
+    assert again['assigned_ids'] == [], "Re-running the same matrix should not create duplicates"
+    print(f'Repeat matrix skipped: {again["skipped"]}')
+    # ids must be lists of non-empty strings; nothing is written otherwise
+    with get_session() as sess:
+        before = len(sess.exec(select(Assignment.id)).all())
+    for bad in ({'student_ids': matrix['student_ids'], 'item_ids': 'abc123'},
+                {'student_ids': matrix['student_ids'], 'item_ids': [1, 2]},
+                {'student_ids': 's1', 'item_id': matrix['item_ids'][0]},
+                {'student_ids': ['s1', ''], 'item_id': matrix['item_ids'][0]},
+                {'student_ids': ['s1'], 'item_ids': []},
+                {'student_ids': ['s1'], 'item_id': matrix['item_ids'][0], 'dedup': False}):
+        r = client.post('/teacher/assign_bulk', headers={'Authorization': f'Bearer {teacher_token}'}, json=bad)
+        assert r.status_code == 400, (bad, r.status_code, r.text)
+    with get_session() as sess:
+        assert len(sess.exec(select(Assignment.id)).all()) == before
+
+print('\n8. Test streaming assignment export')
+auth = {'Authorization': f'Bearer {teacher_token}'}
+r = client.get('/teacher/export_assignments', headers=auth)
+assert r.status_code == 200
+lines = r.text.strip().splitlines()
+assert lines[0] == 'student_id,student_name,item_id,subject,source,assigned_at', lines[0]
+print(f'CSV export rows: {len(lines) - 1}')
+r = client.get('/teacher/export_assignments', headers=auth, params={'student_id': first_student_id, 'format': 'ndjson'})
+assert r.status_code == 200
+rows = [json.loads(l) for l in r.text.splitlines() if l]
+assert rows and all(row['student_id'] == first_student_id for row in rows)
+print(f'NDJSON export rows for {first_student_id}: {len(rows)}')
+r = client.get('/teacher/export_assignments', headers=auth, params={'gzip': 'true', 'since': '2000-01-01'})
+assert r.status_code == 200
+assert gzip.decompress(r.content).decode('utf-8').splitlines()[0].startswith('student_id,')
+r = client.get('/teacher/export_assignments', headers=auth, params={'since': 'not-a-date'})
+assert r.status_code == 400
+print('\n9. Test cursor pagination and field projection')
+seen = []
+cursor = None
+while True:
+    params = {'limit': 1, 'fields': 'id,name'}
+    if cursor:
+        params['after'] = cursor
+    r = client.get('/teacher/students', headers=auth, params=params)
+    assert r.status_code == 200
+    page = r.json()
+    assert all(set(s) == {'id', 'name'} for s in page['students'])
+    seen.extend(s['id'] for s in page['students'])
+    cursor = page['next_cursor']
+    if not cursor:
+        break
+assert seen == [s['id'] for s in students_data['students']], "Paged students should match the first page"
+print(f'Paged through {len(seen)} students one at a time')
+r = client.get('/teacher/students', headers=auth, params={'fields': 'password'})
+assert r.status_code == 400
+r = client.get('/teacher/students', headers=auth, params={'after': 'garbage'})
+assert r.status_code == 400
+
+print('\n10. Test class analytics')
+with get_session() as sess:
+    classroom = sess.exec(select(Classroom)).first()
+    if classroom is None:
+        classroom = Classroom(name='Class 4A', teacher_id='t1')
+        sess.add(classroom)
+        sess.commit()
+        sess.refresh(classroom)
+    class_id = classroom.id
+    for student in sess.exec(select(Student).where(Student.student_id.in_(['s1', 's2']))).all():
+        student.class_id = class_id
+        sess.add(student)
+    sess.commit()
+ANALYTICS.reload()  # roster changes are picked up on reload
+r = client.get(f'/teacher/classes/{class_id}/analytics', headers=auth)
+assert r.status_code == 200
+before = r.json()
+print(f'Class {class_id}: {before["students"]} students, accuracy {before["accuracy"]}, completion {before["completion"]} ({before["elapsed_ms"]} ms)')
+assert before['students'] == 2
+item = f'analytics-{uuid.uuid4().hex[:8]}'
+assert client.post('/teacher/assign', json={'student_id': 's1', 'item_id': item}, headers=auth).status_code == 200
+assert client.post('/teacher/assign', json={'student_id': 's3', 'item_id': item}, headers=auth).status_code == 200
+mid = client.get(f'/teacher/classes/{class_id}/analytics', headers=auth).json()
+assert mid['completion']['assigned'] == before['completion']['assigned'] + 1  # s3 is not in the class
+assert mid['completion']['completed'] == before['completion']['completed']
+assert client.post('/students/s1/responses', json={'item_id': item, 'answer': 'x', 'correct': False}, headers=auth).status_code == 200
+after = client.get(f'/teacher/classes/{class_id}/analytics', headers=auth).json()
+assert after['completion']['completed'] == before['completion']['completed'] + 1
+assert after['accuracy']['attempts'] == before['accuracy']['attempts'] + 1
+assert after['hardest_items'][0]['p_correct'] == 0.0
+ANALYTICS.reload()
+reloaded = client.get(f'/teacher/classes/{class_id}/analytics', headers=auth).json()
+for key in ('students', 'accuracy', 'completion'):
+    assert reloaded[key] == after[key], key
+assert client.get('/teacher/classes/999999/analytics', headers=auth).status_code == 404
+
+print('\n11. Test cached lesson catalog: ETag, filters, invalidation')
+r = client.get('/teacher/lessons', headers=auth)
+etag = r.headers['etag']
+catalog = r.json()
+print(f'Catalog version {catalog["version"]}, facets {catalog["facets"]}, ETag {etag}')
+r = client.get('/teacher/lessons', headers={**auth, 'If-None-Match': etag})
+assert r.status_code == 304 and r.headers['etag'] == etag
+for subject in catalog['facets']['subjects']:
+    r = client.get('/teacher/lessons', headers=auth, params={'subject': subject, 'limit': 1000})
+    assert r.status_code == 200 and r.headers['etag'] != etag
+    assert r.json()['lessons'] and all(l['subject'] == subject for l in r.json()['lessons'])
+assert client.get('/teacher/lessons', headers=auth, params={'subject': 'no-such-subject'}).json()['lessons'] == []
+paged, cursor = [], None
+while True:
+    params = {'limit': 1, 'fields': 'item_id'}
+    if cursor:
+        params['after'] = cursor
+    page = client.get('/teacher/lessons', headers=auth, params=params).json()
+    assert all(set(l) == {'item_id'} for l in page['lessons'])
+    paged.extend(l['item_id'] for l in page['lessons'])
+    cursor = page['next_cursor']
+    if not cursor:
+        break
+assert paged[:len(catalog['lessons'])] == [l['item_id'] for l in catalog['lessons']]
+with get_session() as sess:
+    sess.add(Lesson(item_id=f'catalog-{uuid.uuid4().hex[:8]}', subject='numeracy', prompt='New item', source='test'))
+    sess.commit()
+CATALOG.invalidate()
+r = client.get('/teacher/lessons', headers={**auth, 'If-None-Match': etag}, params={'source': 'test'})
+assert r.status_code == 200 and r.json()['lessons'][-1]['prompt'] == 'New item'
+r = client.get('/teacher/lessons', headers={**auth, 'If-None-Match': etag})
+assert r.status_code == 200 and r.json()['version'] != catalog['version']
+
+print('\n12. Test lesson search: prefix, typo, subject filter, incremental sync')
+word = f'heliotrope{uuid.uuid4().hex[:6]}'
+with get_session() as sess:
+    sess.add(Lesson(item_id=f'search-{word}', subject='science', prompt=f'Which flower is {word}?', source='test',
+                    options=json.dumps(['Sunflower', 'Marigold']), updated_at=datetime.utcnow().isoformat()))
+    sess.commit()
+LESSON_SEARCH.sync()
+r = client.get('/teacher/lessons/search', headers=auth, params={'q': word})
+assert r.status_code == 200 and [l['item_id'] for l in r.json()['results']] == [f'search-{word}']
+print(f"'{word}': {r.json()['total']} hit(s) in {r.json()['elapsed_ms']} ms")
+found = client.get('/teacher/lessons/search', headers=auth, params={'q': f'{word[:8]} marig', 'subject': 'science'}).json()
+assert (f'search-{word}', 4) in [(l['item_id'], l['score']) for l in found['results']]
+typo = word[:3] + word[4] + word[3] + word[5:]
+assert client.get('/teacher/lessons/search', headers=auth, params={'q': typo}).json()['results'][0]['score'] == 1
+assert client.get('/teacher/lessons/search', headers=auth, params={'q': word, 'subject': 'literacy'}).json()['total'] == 0
+assert client.get('/teacher/lessons/search', headers=auth, params={'q': word, 'limit': 0}).status_code == 422
+student_auth = {'Authorization': f"Bearer {client.post('/token', data={'username': 'student', 'password': 'studentpass'}).json()['access_token']}"}
+assert client.get('/teacher/lessons/search', headers=student_auth, params={'q': word}).status_code == 403
+# postings held by a query in flight must not stop an edit from being indexed
+with LESSON_SEARCH._lock:
+    held = LESSON_SEARCH._expand(word)
+with get_session() as sess:
+    lesson = sess.exec(select(Lesson).where(Lesson.item_id == f'search-{word}')).one()
+    lesson.prompt = f'Which flower is {word} or foxglove{word[-6:]}?'
+    lesson.updated_at = datetime.utcnow().isoformat()
+    sess.commit()
+assert LESSON_SEARCH.sync() >= 1
+for q in (word, f'foxglove{word[-6:]}'):
+    assert [l['item_id'] for l in client.get('/teacher/lessons/search', headers=auth, params={'q': q}).json()['results']] == [f'search-{word}']
+assert len(held[0][0]) == 1
+
+print('\n13. Test export filters: date-only until, class export order')
+# a date-only until covers that whole day
+today = datetime.utcnow().date().isoformat()
+counts = [len(client.get('/teacher/export_assignments', headers=auth, params={'student_id': first_student_id, **extra}).text.splitlines())
+          for extra in ({}, {'until': today})]
+assert counts[0] > 1 and counts[0] == counts[1], counts
+# class exports page by (student_id, id); one row per batch exercises the cursor
+tag = uuid.uuid4().hex[:6]
+with get_session() as sess:
+    export_class = Classroom(name=f'Export {tag}', teacher_id='t9')
+    sess.add(export_class)
+    sess.commit()
+    sess.refresh(export_class)
+    export_class_id = export_class.id
+    sess.add_all([Student(student_id=f'exp-{tag}-{n}', name=f'Exporter {n}', grade=4, class_id=export_class_id) for n in (2, 1)])
+    sess.commit()
+items = [l['item_id'] for l in lessons_data['lessons'][:3]]
+r = client.post('/teacher/assign_bulk', headers=auth, json={'class_id': export_class_id, 'item_ids': items})
+assert r.status_code == 200 and len(r.json()['assigned_ids']) == 2 * len(items), r.text
+with get_session() as sess:
+    expected = [(a.student_id, a.item_id) for a in sess.exec(select(Assignment).where(
+        Assignment.student_id.in_([f'exp-{tag}-1', f'exp-{tag}-2'])).order_by(Assignment.student_id, Assignment.id)).all()]
+exported = [(row[0], row[2]) for batch in export_iter_batches(1, class_id=export_class_id) for row in batch]
+assert exported == expected, (exported, expected)
+r = client.get('/teacher/export_assignments', headers=auth, params={'class_id': export_class_id, 'format': 'ndjson'})
+assert [(row['student_id'], row['item_id']) for row in map(json.loads, r.text.splitlines())] == expected
+
 print('\n✓ Test Option C: All teacher assignment tests passed!')
 sys.exit(0)
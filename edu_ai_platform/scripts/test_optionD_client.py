@@ -3,8 +3,16 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
+import time
+from unittest import mock
+
 from fastapi.testclient import TestClient
+from sqlmodel import select
+from backend.app import token_store
+from backend.app.auth import token_digest
+from backend.app.database import get_session
 from backend.app.main import app
+from backend.app.models import RefreshToken
 
 client = TestClient(app)
 
@@ -35,3 +43,47 @@ print('\nUsing new refresh to get another access token')
 # Use the cookie-set refresh token (or provide it explicitly)
 r4 = client.post('/token/refresh', json={'refresh_token': new_refresh})
 print('new refresh reuse status', r4.status_code, r4.json())
+assert r3.status_code == 401, f"Expected revoked refresh token to be rejected, got {r3.status_code}"
+
+print('\nRevoked refresh token stays rejected after the revocation cache is rebuilt from the DB')
+from backend.app.revocation import warm_from_db
+print('revoked jtis loaded', warm_from_db())
+r5 = client.post('/token/refresh', json={'refresh_token': refresh})
+print('old refresh after warm status', r5.status_code)
+assert r5.status_code == 401, f"Expected 401, got {r5.status_code}"
+
+print('\nA failed refresh-token write is retried, and a revoked row is kept until it is written')
+def failing(times):
+    real, calls = token_store.write_sync, []
+    def write_sync(fn):
+        calls.append(1)
+        if len(calls) <= times:
+            raise RuntimeError('database unavailable')
+        return real(fn)
+    return write_sync
+def stored(token):
+    with get_session() as sess:
+        return sess.exec(select(RefreshToken.revoked).where(RefreshToken.token_hash == token_digest(token))).first()
+with mock.patch.object(token_store, 'RETRY_SECONDS', (0.01, 0.01)):
+    before = token_store.stats()
+    with mock.patch.object(token_store, 'write_sync', failing(2)):
+        r = client.post('/token', data={'username': 'teacher', 'password': 'teacherpass'})
+        token_store.flush()
+    flaky = client.cookies.get('edu_refresh')
+    assert stored(flaky) is False
+    after = token_store.stats()
+    print('writer stats', after)
+    assert after['failed_writes'] == before['failed_writes'] + 2 and after['dropped'] == before['dropped']
+# every attempt fails: the row is dropped unless its token was revoked meanwhile
+with mock.patch.object(token_store, 'RETRY_SECONDS', (0.3, 0.3)):
+    with mock.patch.object(token_store, 'write_sync', failing(4)):
+        r = client.post('/token', data={'username': 'teacher', 'password': 'teacherpass'})
+        revoked = client.cookies.get('edu_refresh')
+        client.post('/logout')
+        token_store.flush()
+        assert token_store.stats()['carried'] == 1 and stored(revoked) is None
+    for _ in range(100):
+        if token_store.stats()['carried'] == 0:
+            break
+        time.sleep(0.05)
+    assert stored(revoked) is True, 'revoked refresh token row was lost'
@@ -0,0 +1,230 @@
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import json
+import threading
+import time
+import uuid
+import jwt
+from datetime import datetime
+from fastapi.testclient import TestClient
+from backend.app.main import app
+from backend.app.database import get_session, init_db, write_sync
+from backend.app.progress import rebuild as rebuild_progress, record_corrections
+from backend.app import ability, auth, events, responses
+from backend.app.ability import MODEL as ABILITY
+from backend.app.scoring import normalize
+from backend.app.models import Lesson, StudentResponse
+from sqlmodel import select
+
+init_db()
+
+client = TestClient(app)
+
+print('Test Option E: Response Ingestion')
+print('=' * 50)
+
+print('\n1. Login as teacher and student')
+r = client.post('/token', data={'username': 'teacher', 'password': 'teacherpass'})
+assert r.status_code == 200
+teacher = {'Authorization': f'Bearer {r.json()["access_token"]}'}
+r = client.post('/token', data={'username': 'student', 'password': 'studentpass'})
+assert r.status_code == 200
+student = {'Authorization': f'Bearer {r.json()["access_token"]}'}
+
+print('\n2. Teacher posts a JSON-array batch for several students')
+batch = [
+    {'response_id': str(uuid.uuid4()), 'student_id': sid, 'item_id': 'g4-num-001', 'answer': '8', 'correct': True}
+    for sid in ('s1', 's2', 's3')
+]
+batch.append({'student_id': 's1'})  # missing item_id
+r = client.post('/students/responses:batch', json=batch, headers=teacher)
+print(f'POST /students/responses:batch status: {r.status_code} counts: {r.json()["counts"]}')
+assert r.status_code == 200
+results = r.json()['results']
+assert [x['status'] for x in results] == ['created', 'created', 'created', 'invalid']
+created_ids = [x['response_id'] for x in results[:3]]
+
+print('\n3. Re-sending the same batch is idempotent')
+r = client.post('/students/responses:batch', json=batch[:3], headers=teacher)
+assert r.status_code == 200
+again = r.json()['results']
+assert [x['status'] for x in again] == ['duplicate'] * 3
+assert [x['response_id'] for x in again] == created_ids
+print(f'Duplicates resolved to original ids: {created_ids}')
+
+print('\n4. Student NDJSON batch: own responses accepted, other students forbidden')
+own = str(uuid.uuid4())
+lines = [
+    {'response_id': own, 'student_id': 's1', 'item_id': 'g4-lit-001', 'answer': 'joyful'},
+    {'response_id': own, 'student_id': 's1', 'item_id': 'g4-lit-001', 'answer': 'joyful'},
+    {'response_id': str(uuid.uuid4()), 'student_id': 's2', 'item_id': 'g4-lit-001', 'answer': 'sad'},
+]
+body = '\n'.join(json.dumps(l) for l in lines) + '\n'
+r = client.post('/students/responses:batch', content=body, headers={**student, 'Content-Type': 'application/x-ndjson'})
+assert r.status_code == 200
+statuses = [x['status'] for x in r.json()['results']]
+print(f'NDJSON statuses: {statuses}')
+assert statuses == ['created', 'duplicate', 'forbidden']
+
+print('\n5. Malformed or oversized bodies and bad timestamps are rejected')
+r = client.post('/students/responses:batch', content='{not json', headers={**teacher, 'Content-Type': 'application/x-ndjson'})
+assert r.status_code == 400
+r = client.post('/students/responses:batch', content=b'[' + b' ' * responses.MAX_BATCH_BYTES + b']', headers=teacher)
+assert r.status_code == 413
+def chunks():
+    for _ in range(responses.MAX_BATCH_BYTES // 65536 + 2):
+        yield b' ' * 65536
+r = client.post('/students/responses:batch', content=chunks(), headers=teacher)  # no Content-Length
+assert r.status_code == 413
+stamps = ['banana', 123, '2026-03-01', '2026-03-01T10:00:00+02:00', '2026-03-01 09:00:00.5']
+r = client.post('/students/responses:batch', json=[{'student_id': 's3', 'item_id': 'g4-num-001', 'submitted_at': t} for t in stamps], headers=teacher)
+assert [x['status'] for x in r.json()['results']] == ['invalid'] * 3 + ['created'] * 2
+with get_session() as sess:
+    assert [sess.get(StudentResponse, x['response_id']).submitted_at for x in r.json()['results'][3:]] == \
+        ['2026-03-01T08:00:00', '2026-03-01T09:00:00.500000']
+
+print('\n6. Server scores answers against the item-bank key')
+r = client.post('/students/s1/responses', json={'item_id': 'g4-num-001', 'answer': '7', 'correct': True}, headers=teacher)
+assert r.status_code == 200 and r.json()['correct'] is False
+wrong_id = r.json()['response_id']
+r = client.post('/students/responses:batch', json=[
+    {'student_id': 's2', 'item_id': 'g4-num-001', 'answer': ' 8.0 ', 'correct': False},
+    {'student_id': 's2', 'item_id': 'g4-num-001', 'answer': 'C'},
+    {'student_id': 's2', 'item_id': 'no-such-item', 'answer': 'x', 'correct': True},
+], headers=teacher)
+assert r.status_code == 200
+stored = dict(zip(('8.0', 'C', 'no key'), [x['response_id'] for x in r.json()['results']]))
+with get_session() as sess:
+    flags = {label: sess.get(StudentResponse, rid).correct for label, rid in stored.items()}
+print(f'Stored results: {flags}')
+assert flags == {'8.0': True, 'C': True, 'no key': True}
+# out-of-range numbers are graded as text rather than failing the request
+for answer in ('1e999999999', '-1E-999999999', '9' * 5000, 'sNaN'):
+    assert client.post('/students/s1/responses', json={'item_id': 'g4-num-001', 'answer': answer}, headers=teacher).json()['correct'] is False
+r = client.post('/students/responses:batch', json=[{'student_id': 's2', 'item_id': 'g4-num-001', 'answer': '1e999999999'}], headers=teacher)
+assert r.status_code == 200
+assert normalize('-0') == normalize('0.00') == '0' and normalize('08.50') == '8.5'
+# leaving out the answer does not let the client grade itself
+r = client.post('/students/s1/responses', json={'item_id': 'g4-num-001', 'correct': True}, headers=teacher)
+assert r.status_code == 200 and r.json()['correct'] is False
+r = client.post('/students/responses:batch', json=[{'student_id': 's2', 'item_id': 'g4-num-001', 'correct': True}], headers=teacher)
+with get_session() as sess:
+    assert sess.get(StudentResponse, r.json()['results'][0]['response_id']).correct is False
+
+print('\n7. Admin rescore repairs stale results')
+with get_session() as sess:
+    row = sess.get(StudentResponse, wrong_id)
+    # simulate a response graded under an older key (summary included)
+    row.correct = True
+    sess.add(row)
+    record_corrections(sess, [{'student_id': row.student_id, 'item_id': row.item_id, 'correct': True, 'previous': False}])
+    sess.commit()
+r = client.post('/token', data={'username': 'admin', 'password': 'adminpass'})
+admin = {'Authorization': f'Bearer {r.json()["access_token"]}'}
+r = client.post('/admin/rescore', json={'item_ids': ['g4-num-001']}, headers=admin)
+print(f'POST /admin/rescore: {r.json()}')
+assert r.status_code == 200 and r.json()['changed'] >= 1
+with get_session() as sess:
+    assert sess.get(StudentResponse, wrong_id).correct is False
+assert client.post('/admin/rescore', json={}, headers=teacher).status_code == 403
+
+print('\n8. Progress summaries follow inserts and re-grades, and match a full rebuild')
+r = client.get('/students/s2/progress', headers=teacher)
+assert r.status_code == 200
+live = r.json()
+print(f'GET /students/s2/progress: {live["subjects"]}')
+numeracy = live['subjects']['numeracy']
+assert numeracy['attempts'] >= 3 and 0 < live['skill_scores']['numeracy'] <= 1
+assert live['recent_responses'] and live['recent_responses'][0]['submitted_at'] >= live['recent_responses'][-1]['submitted_at']
+before = {sid: client.get(f'/students/{sid}/progress', headers=teacher).json()['subjects'] for sid in ('s1', 's2', 's3')}
+write_sync(rebuild_progress)
+after = {sid: client.get(f'/students/{sid}/progress', headers=teacher).json()['subjects'] for sid in ('s1', 's2', 's3')}
+assert before == after, (before, after)
+assert client.get('/students/s2/progress', headers=student).status_code == 403
+
+print('\n9. Adaptive next item')
+r = client.get('/students/s3/next_item', headers=teacher)
+print(f'GET /students/s3/next_item: {r.status_code} {r.json()}')
+assert r.status_code == 200
+pick = r.json()
+with get_session() as sess:
+    assert sess.exec(select(Lesson).where(Lesson.item_id == pick['item_id'])).first() is not None
+    seen = set(sess.exec(select(StudentResponse.item_id).where(StudentResponse.student_id == 's3')).all())
+assert pick['item_id'] not in seen and 0 < pick['information'] <= 0.25
+ability_before = pick['ability']
+r = client.post('/students/s3/responses', json={'item_id': pick['item_id'], 'answer': 'definitely wrong'}, headers=teacher)
+assert r.status_code == 200
+assert ABILITY.ability('s3') < ability_before
+r = client.get('/students/s3/next_item', headers=teacher)
+assert r.status_code == 404 or r.json()['item_id'] != pick['item_id']
+r = client.post('/token', data={'username': 'admin', 'password': 'adminpass'})
+r = client.post('/admin/ability/refit', headers={'Authorization': f'Bearer {r.json()["access_token"]}'})
+assert r.status_code == 200 and r.json()['responses'] >= 1
+assert client.get('/students/s3/next_item', headers=student).status_code == 403
+assert client.get('/students/s3/next_item?subject=astronomy', headers=teacher).status_code == 404
+# a lesson ingested after the fit is selectable without waiting for the next refit
+ability.LESSON_SYNC_SECONDS = 0
+subject = f'astronomy-{uuid.uuid4().hex[:6]}'
+with get_session() as sess:
+    sess.add(Lesson(item_id=f'{subject}-001', subject=subject, prompt='Closest star?', source='test', updated_at=datetime.utcnow().isoformat()))
+    sess.commit()
+r = client.get(f'/students/s3/next_item?subject={subject}', headers=teacher)
+assert r.status_code == 200 and r.json()['item_id'] == f'{subject}-001', r.text
+
+print('\n10. Live updates over /events')
+def parse_sse(body):
+    return [dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+            for block in body.split('\n\n') if block.strip() and not block.startswith(('retry', ':'))]
+events.MAX_STREAM_SECONDS = 0.5  # end streams quickly so TestClient returns the body
+student_token = student['Authorization'][7:]
+assert client.get('/events').status_code == 401
+# access tokens are refused in the URL; a stream ticket opens /events and nothing else
+assert client.get(f'/events?token={student_token}').status_code == 401
+assert client.get(f'/events?ticket={student_token}').status_code == 401
+r = client.post('/events/ticket', headers=student)
+assert r.status_code == 200 and r.json()['expires_in'] == auth.STREAM_TICKET_SECONDS
+ticket = r.json()['ticket']
+assert client.get('/me', headers={'Authorization': f'Bearer {ticket}'}).status_code == 401
+assert client.get(f'/events?ticket={ticket}&student_id=s2').status_code == 403
+expired = jwt.encode({'sub': 'student', 'role': 'student', 'student_id': 's1', 'aud': auth.STREAM_AUDIENCE,
+                      'exp': int(time.time()) - 1}, auth.SECRET_KEY, algorithm=auth.ALGORITHM)
+assert client.get(f'/events?ticket={expired}').status_code == 401
+# missed events are replayed after Last-Event-ID, filtered to the subscriber's topics
+since = events.BUS.status()['last_event_id']
+for sid in ('s1', 's2'):
+    assert client.post(f'/students/{sid}/responses', json={'item_id': pick['item_id'], 'answer': 'x'}, headers=teacher).status_code == 200
+r = client.get(f'/events?ticket={ticket}', headers={'Last-Event-ID': str(since)})
+assert r.status_code == 200 and r.headers['content-type'].startswith('text/event-stream')
+replayed = parse_sse(r.text)
+print(f'Replayed to s1: {[(e["event"], json.loads(e["data"])["student_id"]) for e in replayed]}')
+assert [e['event'] for e in replayed] == ['response'] and json.loads(replayed[0]['data'])['student_id'] == 's1'
+r = client.get('/events', headers={**teacher, 'Last-Event-ID': str(since)})
+assert {json.loads(e['data'])['student_id'] for e in parse_sse(r.text)} == {'s1', 's2'}
+# a dashboard reopening with a new ticket passes the last id in the query string
+r = client.get(f'/events?ticket={ticket}&last_event_id={since}')
+assert [e['event'] for e in parse_sse(r.text)] == ['response']
+# a commit while the stream is open is pushed live
+events.MAX_STREAM_SECONDS = 2.0
+def assign_later():
+    time.sleep(0.5)
+    client.post('/teacher/assign', json={'student_id': 's1', 'item_id': pick['item_id']}, headers=teacher)
+threading.Thread(target=assign_later).start()
+live = parse_sse(client.get(f'/events?ticket={ticket}').text)
+print(f'Pushed to s1: {[e["event"] for e in live]}')
+assert [e['event'] for e in live] == ['assignment']
+assert json.loads(live[0]['data'])['assignments'][0]['item_id'] == pick['item_id']
+# a subscriber that falls behind gets one resync instead of an unbounded queue
+sub = events.Subscriber(['student:s1'], None)
+for n in range(events.QUEUE_SIZE + 5):
+    sub.deliver(b'x')
+assert sub.buffer is None and sub.lagged
+r = client.post('/token', data={'username': 'admin', 'password': 'adminpass'})
+status = client.get('/admin/events', headers={'Authorization': f'Bearer {r.json()["access_token"]}'}).json()
+print(f'GET /admin/events: {status}')
+assert status['subscribers'] == 0 and status['resyncs'] >= 1
+
+print('\n✓ Test Option E: All response ingestion tests passed!')
+sys.exit(0)
@@ -0,0 +1,175 @@
+"""
+Query-budget regression test: replay each endpoint against a SQLite database
+at two data scales and fail if it runs more SQL statements, or fetches more
+rows, than its declared budget. Budgets are fixed numbers, so an endpoint
+whose statement count grows with its cohort or table size (an N+1 loop, a
+row-at-a-time insert) passes at the small scale and fails at the large one.
+Run: python scripts/test_query_budgets.py  (QUERY_BUDGET_SCALE=4 grows the large scale)
+"""
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import tempfile
+import threading
+import uuid
+
+# the app binds its engine on import; point it at a scratch database first
+TMP = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(TMP, 'budgets.db')}"
+
+from sqlalchemy import event
+from fastapi.testclient import TestClient
+
+from backend.app.database import engine, ensure_schema, get_session
+from backend.app.main import app
+from backend.app.progress import rebuild as rebuild_progress
+
+GROW = int(os.environ.get('QUERY_BUDGET_SCALE', 1))
+# students per class, assignments and responses per student; lessons
+SCALES = [
+    ('small', {'class_size': 30, 'per_student': 10, 'lessons': 200}),
+    ('large', {'class_size': 1500 * GROW, 'per_student': 40, 'lessons': 5000 * GROW}),
+]
+SUBJECTS = ('numeracy', 'literacy', 'science')
+
+
+class QueryCounter:
+    """Count SQL statements run on an engine, and rows fetched from their cursors, while active.
+
+    Hooks after_cursor_execute and swaps the execution context's DBAPI cursor
+    for a proxy that tallies fetchone/fetchmany/fetchall, so rows are counted
+    when the ORM actually pulls them (RETURNING rows that SQLAlchemy collects
+    inside a batched insert are not). Statements from any thread are counted,
+    since writes run on the single-writer thread.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+        self.rows = 0
+        self._lock = threading.Lock()
+        self._listener = self._after_cursor_execute
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.statements.append(' '.join(statement.split())[:120])
+        if context is not None and context.cursor is cursor:
+            context.cursor = _CountingCursor(cursor, self)
+
+    def _fetched(self, n):
+        with self._lock:
+            self.rows += n
+
+    def __enter__(self):
+        event.listen(self.engine, 'after_cursor_execute', self._listener)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'after_cursor_execute', self._listener)
+
+
+class _CountingCursor:
+    def __init__(self, cursor, counter):
+        self._cursor = cursor
+        self._counter = counter
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        self._counter._fetched(row is not None)
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        self._counter._fetched(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._counter._fetched(len(rows))
+        return rows
+
+
+def seed(scale, spec, class_id):
+    """Add one class of spec['class_size'] students (ids <scale>-s<n>) with their history."""
+    size, per_student, lessons = spec['class_size'], spec['per_student'], spec['lessons']
+    students = [f'{scale}-s{i}' for i in range(size)]
+    items = [f'{scale}-item-{i}' for i in range(lessons)]
+    with engine.begin() as conn:
+        conn.exec_driver_sql('INSERT INTO classroom (id, name, teacher_id) VALUES (?, ?, ?)', (class_id, f'Class {scale}', 't1'))
+        conn.exec_driver_sql('INSERT INTO student (student_id, name, grade, class_id) VALUES (?, ?, 4, ?)',
+                             [(sid, f'Student {sid}', class_id) for sid in students])
+        conn.exec_driver_sql('INSERT INTO lesson (item_id, subject, prompt, source) VALUES (?, ?, ?, ?)',
+                             [(iid, SUBJECTS[n % 3], f'Prompt {iid}', 'budget') for n, iid in enumerate(items)])
+        conn.exec_driver_sql('INSERT INTO assignment (student_id, item_id, assigned_at) VALUES (?, ?, ?)',
+                             [(sid, items[(n * 7 + k) % lessons], f'2026-02-{1 + k % 28:02d}T09:00:00')
+                              for n, sid in enumerate(students) for k in range(per_student)])
+        conn.exec_driver_sql('INSERT INTO studentresponse (student_id, item_id, answer, correct, submitted_at) VALUES (?, ?, ?, ?, ?)',
+                             [(sid, items[(n * 7 + k) % lessons], 'a', (n + k) % 3 == 0, f'2026-02-{1 + k % 28:02d}T10:00:00')
+                              for n, sid in enumerate(students) for k in range(per_student)])
+    with get_session() as sess:
+        rebuild_progress(sess)
+    return {'class_id': class_id, 'student': students[size // 2], 'items': items}
+
+
+def requests(data, k):
+    """label -> (method, path, kwargs, max statements, max rows fetched or None) for round k.
+    Writes use different items each round, so the measured round inserts new rows too."""
+    sid, cid, items = data['student'], data['class_id'], data['items']
+    fresh = items[-10 * (k + 1):][:10]
+    batch = [{'student_id': sid, 'item_id': items[n], 'answer': 'a', 'response_id': str(uuid.uuid4())} for n in range(50)]
+    return {
+        'POST /teacher/assign_bulk (class)': ('POST', '/teacher/assign_bulk', {'json': {'class_id': cid, 'item_ids': fresh[:3]}}, 3, None),
+        'POST /teacher/assign': ('POST', '/teacher/assign', {'json': {'student_id': sid, 'item_id': fresh[3]}}, 2, 1),
+        'POST /students/{id}/responses': ('POST', f'/students/{sid}/responses', {'json': {'item_id': fresh[4], 'answer': 'a'}}, 4, 5),
+        'POST /students/responses:batch': ('POST', '/students/responses:batch', {'json': batch}, 4, 100),
+        'GET /students/{id}/progress': ('GET', f'/students/{sid}/progress', {}, 2, 20),
+        'GET /students/{id}/assignments': ('GET', f'/students/{sid}/assignments', {'params': {'limit': 20}}, 1, 21),
+        'GET /students/{id}/responses': ('GET', f'/students/{sid}/responses', {'params': {'limit': 20}}, 1, 21),
+        'GET /teacher/students': ('GET', '/teacher/students', {'params': {'limit': 100}}, 1, 101),
+        'GET /teacher/lessons': ('GET', '/teacher/lessons', {'params': {'limit': 100}}, 1, 1),
+        'GET /teacher/classes/{id}/analytics': ('GET', f'/teacher/classes/{cid}/analytics', {}, 1, 1),
+        'GET /teacher/export_assignments?student_id': ('GET', '/teacher/export_assignments', {'params': {'student_id': sid}}, 2, 200),
+        'GET /students/{id}/next_item': ('GET', f'/students/{sid}/next_item', {}, 2, 400),
+    }
+
+
+def measure(client, headers, method, path, kwargs):
+    with QueryCounter(engine) as counter:
+        r = client.request(method, path, headers=headers, **kwargs)
+        r.read()
+    assert r.status_code == 200, f'{method} {path}: {r.status_code} {r.text[:200]}'
+    return counter
+
+
+if __name__ == '__main__':
+    print('Test: per-endpoint query budgets')
+    print('=' * 50)
+    ensure_schema()
+    client = TestClient(app)
+    r = client.post('/token', data={'username': 'teacher', 'password': 'teacherpass'})
+    headers = {'Authorization': f"Bearer {r.json()['access_token']}"}
+    failures = []
+    for n, (scale, spec) in enumerate(SCALES, start=1):
+        data = seed(scale, spec, class_id=1000 + n)
+        print(f"\n{scale}: class of {spec['class_size']}, {spec['class_size'] * spec['per_student']} assignments, "
+              f"{spec['lessons']} lessons")
+        warmup, measured = requests(data, 0), requests(data, 1)
+        for label, (method, path, kwargs, max_statements, max_rows) in measured.items():
+            # one warm-up call so lazily built caches (catalog, analytics cube, ability fit) are excluded
+            measure(client, headers, *warmup[label][:3])
+            counter = measure(client, headers, method, path, kwargs)
+            over = len(counter.statements) > max_statements or (max_rows is not None and counter.rows > max_rows)
+            budget = f'<= {max_statements} q' + (f', {max_rows} rows' if max_rows is not None else '')
+            print(f"  {label:42s} {len(counter.statements):4d} q {counter.rows:6d} rows  ({budget})  {'OVER' if over else 'ok'}")
+            if over:
+                failures.append(f'{scale} {label}: {len(counter.statements)} statements, {counter.rows} rows ({budget})')
+                for statement in counter.statements[:5]:
+                    print(f'      {statement}')
+    assert not failures, 'Over query budget:\n  ' + '\n  '.join(failures)
+    print('\n✓ Query budgets: every endpoint stays within its budget at both scales')
+    sys.exit(0)
@@ -0,0 +1,128 @@
+"""
+Query-plan regression test: seed a large SQLite database (1M rows by default)
+and fail if any per-student / per-key endpoint query falls back to a full
+table scan. List endpoints are checked in their paginated (keyset) form, and
+keyset batches must also come back in index order: a temp B-tree sort there
+re-sorts every remaining matching row on every batch.
+Run: python scripts/test_query_plans.py  (QUERY_PLAN_ROWS=50000 for a quick run)
+"""
+import sys, os
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import re
+import sqlite3
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import sqlite as sqlite_dialect
+from sqlmodel import Session, SQLModel, select
+
+from backend.app.models import Student, Lesson, Assignment, StudentResponse, RefreshToken, SubjectProgress
+from backend.app.export import export_batch_statement
+from backend.app.main import ASSIGNMENT_FIELDS, RESPONSE_FIELDS, STUDENT_FIELDS
+from backend.app.progress import rebuild as rebuild_progress
+
+
+def page_statement(model, columns, where=None, after=0, limit=100):
+    # same shape as pagination.fetch_page
+    stmt = select(model.id, *columns.values()).where(model.id > after)
+    if where is not None:
+        stmt = stmt.where(where)
+    return stmt.order_by(model.id).limit(limit + 1)
+
+TOTAL_ROWS = int(os.environ.get('QUERY_PLAN_ROWS', 1_000_000))
+# share of TOTAL_ROWS per table
+MIX = {'student': 0.05, 'lesson': 0.01, 'assignment': 0.40, 'studentresponse': 0.50, 'refreshtoken': 0.04}
+TABLES = set(MIX) | {'subjectprogress'}
+FULL_SCAN = re.compile(r'^SCAN (\w+)')
+SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def seed(path):
+    SQLModel.metadata.create_all(create_engine(f'sqlite:///{path}'))
+    n = {t: max(10, int(TOTAL_ROWS * share)) for t, share in MIX.items()}
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    with conn:
+        conn.executemany('INSERT INTO student (student_id, name, grade, class_id) VALUES (?, ?, 4, ?)',
+                         ((f's{i}', f'Student {i}', i % 500) for i in range(n['student'])))
+        conn.executemany('INSERT INTO lesson (item_id, subject, prompt, source) VALUES (?, ?, ?, ?)',
+                         ((f'item-{i}', ('numeracy', 'literacy')[i % 2], f'Prompt {i}', 'bench') for i in range(n['lesson'])))
+        conn.executemany('INSERT INTO assignment (student_id, item_id, assigned_at) VALUES (?, ?, ?)',
+                         ((f's{i % n["student"]}', f'item-{i % n["lesson"]}', f'2026-01-01T00:{i % 60:02d}:00') for i in range(n['assignment'])))
+        conn.executemany('INSERT INTO studentresponse (student_id, item_id, answer, correct, submitted_at) VALUES (?, ?, ?, ?, ?)',
+                         ((f's{i % n["student"]}', f'item-{i % n["lesson"]}', 'a', i % 3 == 0, f'2026-01-02T00:{i % 60:02d}:00') for i in range(n['studentresponse'])))
+        conn.executemany('INSERT INTO refreshtoken (token, token_hash, jti, username, expires_at, revoked) VALUES (?, ?, ?, ?, ?, 0)',
+                         ((f'tok{i}', f'{i:064x}', f'jti-{i}', 'teacher', str(1_800_000_000 + i)) for i in range(n['refreshtoken'])))
+    conn.close()
+    engine = create_engine(f'sqlite:///{path}')
+    t0 = time.perf_counter()
+    with Session(engine) as sess:
+        summaries = rebuild_progress(sess)
+    print(f'Rebuilt {summaries} progress summaries in {time.perf_counter() - t0:.1f}s')
+    engine.dispose()
+    conn = sqlite3.connect(path)
+    conn.execute('ANALYZE')
+    conn.close()
+    return sum(n.values())
+
+
+def endpoint_queries():
+    """(label, statement) for every keyed lookup issued by the API."""
+    return [
+        ('verify_refresh_token (bloom hit)', select(RefreshToken.revoked).where(RefreshToken.jti == 'jti-42')),
+        ('verify_refresh_token (legacy)', select(RefreshToken).where((RefreshToken.token_hash == 'ab' * 32) & (RefreshToken.revoked == False))),
+        ('revoke_refresh_token', select(RefreshToken).where(RefreshToken.jti == 'jti-42')),
+        ('GET /students/{id}/assignments', page_statement(Assignment, ASSIGNMENT_FIELDS, Assignment.student_id == 's42')),
+        ('GET /students/{id}/assignments?after', page_statement(Assignment, ASSIGNMENT_FIELDS, Assignment.student_id == 's42', after=5000)),
+        ('GET /students/{id}/responses', page_statement(StudentResponse, RESPONSE_FIELDS, StudentResponse.student_id == 's42')),
+        ('GET /teacher/students?after', page_statement(Student, STUDENT_FIELDS, after=5000)),
+        ('POST /teacher/assign_bulk class cohort', select(Student.student_id).where(Student.class_id == 7)),
+        ('POST /teacher/assign_bulk dedupe', select(Assignment.student_id, Assignment.item_id).where(
+            Assignment.student_id.in_(['s1', 's2', 's3']), Assignment.item_id.in_(['item-1', 'item-2']))),
+        ('lesson by item_id', select(Lesson).where(Lesson.item_id == 'item-7')),
+        ('student by student_id', select(Student).where(Student.student_id == 's42')),
+        ('GET /teacher/export_assignments?student_id', export_batch_statement(0, 5000, student_id='s42')),
+        ('GET /teacher/export_assignments?student_id&since', export_batch_statement(5000, 5000, student_id='s42', since='2026-01-01T00:10:00')),
+        ('GET /teacher/export_assignments?class_id', export_batch_statement(None, 5000, class_id=7)),
+        ('GET /teacher/export_assignments?class_id (next batch)', export_batch_statement(('s1007', 5000), 5000, class_id=7)),
+        ('GET /students/{id}/progress summaries', select(SubjectProgress).where(SubjectProgress.student_id == 's42')),
+        ('GET /students/{id}/progress recent', select(StudentResponse.item_id).where(StudentResponse.student_id == 's42')
+            .order_by(StudentResponse.submitted_at.desc()).limit(10)),
+        ('POST responses progress upsert subjects', select(Lesson.item_id, Lesson.subject).where(Lesson.item_id.in_(['item-1', 'item-2']))),
+        ('POST /admin/rescore item_ids', select(StudentResponse.id, StudentResponse.answer).where(
+            StudentResponse.id > 5000, StudentResponse.item_id == 'item-1').order_by(StudentResponse.id).limit(5000)),
+    ]
+
+
+def plan(conn, stmt):
+    sql = str(stmt.compile(dialect=sqlite_dialect.dialect(), compile_kwargs={'literal_binds': True}))
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql)]
+
+
+if __name__ == '__main__':
+    print('Test: endpoint query plans')
+    print('=' * 50)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'plans.db')
+        t0 = time.perf_counter()
+        rows = seed(path)
+        print(f'Seeded {rows} rows in {time.perf_counter() - t0:.1f}s')
+        conn = sqlite3.connect(path)
+        failures = []
+        for label, stmt in endpoint_queries():
+            details = plan(conn, stmt)
+            scans = [d for d in details if (m := FULL_SCAN.match(d)) and m.group(1) in TABLES]
+            sorts = SORT in details
+            status = 'FULL SCAN' if scans else 'SORT' if sorts else 'ok'
+            print(f'{label:52s} {status:10s} {" | ".join(details)}')
+            if scans or sorts:
+                failures.append(label)
+        conn.close()
+    assert not failures, f'Full table scans or per-batch sorts in: {failures}'
+    print('\n✓ Query plans: no endpoint query falls back to a full table scan or a per-batch sort')
+    sys.exit(0)